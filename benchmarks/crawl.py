@@ -0,0 +1,178 @@
+"""
+クロールのベンチマーク
+
+benchmarks.netkeiba_server をスレッドで立て、Client のキャッシュの使い方・
+スレッド数・リクエストの間隔を変えてテスト用のページを取得し、
+1秒あたりのリクエスト数・レイテンシのp50/p99・キャッシュのヒット率を測る。
+
+    python -m benchmarks.crawl --workers 1 4 16 --latency 0.02 --scale 5
+
+モードは次のとおり。
+    no_cache: キャッシュを使わない
+    cold_cache: 空のキャッシュから取得する
+    warm_cache: cold_cache で取得したキャッシュから取得する
+    update_cache: キャッシュがあっても取得し直す
+"""
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from benchmarks.netkeiba_server import NetkeibaServer, ServerConfig
+from scraping_netkeiba import url
+from scraping_netkeiba.client import Cache, Client, ICache, NullCache, RateLimiter
+
+MODES = ["no_cache", "cold_cache", "warm_cache", "update_cache"]
+
+
+class CrawlResult(NamedTuple):
+    mode: str
+    workers: int
+    requests: int
+    # Client の呼び出しが例外を投げた数。再試行しても 200 以外が返ったものを含む
+    failures: int
+    requests_per_sec: float
+    p50_ms: float
+    p99_ms: float
+    # サーバーまで届かずにキャッシュから返した割合
+    cache_hit_ratio: float
+    # サーバーが返したステータスコードごとの数。再試行した分も数える
+    server_statuses: dict[int, int]
+
+
+def _crawl(
+    server: NetkeibaServer,
+    mode: str,
+    cache: ICache,
+    paths: list[str],
+    workers: int,
+    interval: float,
+) -> CrawlResult:
+    client = Client(
+        cache, RateLimiter(interval), pool_size=workers, base_url=server.base_url()
+    )
+    update_cache = mode == "update_cache"
+
+    def get(path: str) -> tuple[Optional[float], bool]:
+        # Client と同じ条件でキャッシュから返すかを判定する
+        hit = not update_cache and bool(cache.exists(url.parse(path)))
+        start = time.perf_counter()
+        try:
+            client.get_by_path(path, update_cache)
+        except Exception:
+            return None, hit
+        return time.perf_counter() - start, hit
+
+    server.reset_stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outcomes: list[tuple[Optional[float], bool]] = list(executor.map(get, paths))
+    total_seconds = time.perf_counter() - start
+
+    latencies = sorted(v for v, _ in outcomes if v is not None)
+    # quantiles は2件以上必要
+    quantiles = (
+        statistics.quantiles(latencies, n=100, method="inclusive")
+        if len(latencies) >= 2
+        else latencies * 99
+    )
+    statuses = server.stats()
+    return CrawlResult(
+        mode,
+        workers,
+        len(paths),
+        len(paths) - len(latencies),
+        len(paths) / total_seconds,
+        quantiles[49] * 1000 if quantiles else 0.0,
+        quantiles[98] * 1000 if quantiles else 0.0,
+        sum(hit for _, hit in outcomes) / len(paths),
+        statuses,
+    )
+
+
+def run(
+    config: ServerConfig,
+    modes: list[str],
+    workers: list[int],
+    interval: float = 0.0,
+    scale: int = 1,
+    seed: int = 0,
+) -> list[CrawlResult]:
+    """モードとスレッド数の組み合わせごとにクロールする
+
+    Args:
+        config (ServerConfig): サーバーの遅延などの設定
+        modes (list[str]): MODES のうち測るもの
+        workers (list[int]): スレッド数
+        interval (float): RateLimiter の間隔（秒）
+        scale (int): 全てのページを取得する回数
+        seed (int): ページの順番を混ぜる乱数のシード
+
+    Returns:
+        list[CrawlResult]: 結果
+    """
+    results: list[CrawlResult] = []
+    with NetkeibaServer(config) as server:
+        paths = server.paths() * scale
+        random.Random(seed).shuffle(paths)
+        for n in workers:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                for mode in modes:
+                    # warm_cache と update_cache は cold_cache のキャッシュを使う
+                    cache = NullCache() if mode == "no_cache" else Cache(cache_dir)
+                    if mode in ["warm_cache", "update_cache"] and not any(
+                        Path(cache_dir).iterdir()
+                    ):
+                        _crawl(server, "cold_cache", cache, paths, n, interval)
+                    results.append(_crawl(server, mode, cache, paths, n, interval))
+    return results
+
+
+def _print(results: list[CrawlResult]) -> None:
+    print(
+        f"{'mode':<13}{'workers':>8}{'requests':>10}{'failures':>10}"
+        f"{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'hit':>7}  statuses"
+    )
+    for v in results:
+        print(
+            f"{v.mode:<13}{v.workers:>8}{v.requests:>10}{v.failures:>10}"
+            f"{v.requests_per_sec:>10.1f}{v.p50_ms:>9.2f}{v.p99_ms:>9.2f}"
+            f"{v.cache_hit_ratio:>7.2f}  {v.server_statuses}"
+        )
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modes", nargs="*", default=MODES, choices=MODES)
+    parser.add_argument("--workers", nargs="*", type=int, default=[1, 4, 16])
+    parser.add_argument("--interval", type=float, default=0.0, help="リクエストの間隔")
+    parser.add_argument("--scale", type=int, default=1, help="全てのページを取得する回数")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rps", type=float)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="結果をJSONで書き出す")
+    args = parser.parse_args(argv)
+
+    config = ServerConfig(
+        args.latency, args.jitter, args.error_rate, args.throttle_rps, args.seed
+    )
+    results = run(
+        config, args.modes, args.workers, args.interval, args.scale, args.seed
+    )
+    _print(results)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(
+            json.dumps([v._asdict() for v in results], indent=2, default=str)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+netkeiba.com の代わりのローカルHTTPサーバー
+
+tests/scraping_netkeiba/data のHTMLを url.py の実際のURLパスで、EUC-JPで返す。
+応答の遅延・エラーの割合・1秒あたりのリクエスト数の上限を設定できるため、
+netkeiba.com にアクセスせずに Client の設定を比べられる。
+
+    python -m benchmarks.netkeiba_server --port 8000 --latency 0.05
+
+Client(base_url="http://127.0.0.1:8000") でこのサーバーに接続する。
+"""
+import argparse
+import datetime
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+from urllib.parse import urlparse
+
+from scraping_netkeiba import race_list, url
+from scraping_netkeiba.client import ENCODING
+from scraping_netkeiba.race_sum import RaceSum
+
+DATA_DIR = Path(__file__).parent.parent / "tests/scraping_netkeiba/data"
+
+
+class ServerConfig(NamedTuple):
+    # 応答までの遅延（秒）
+    latency: float = 0.0
+    # 遅延のばらつき（秒）。0 から jitter までの一様乱数を latency に足す
+    jitter: float = 0.0
+    # 500 を返す割合
+    error_rate: float = 0.0
+    # 1秒あたりのリクエスト数の上限。超えた分は 429 を返す。None は上限なし
+    throttle_rps: Optional[float] = None
+    # 遅延とエラーの乱数のシード
+    seed: int = 0
+
+
+def _page_date(html: str) -> datetime.date:
+    title: str = race_list.TITLE_TAG_PATTERN.search(html).group(1).strip()
+    return datetime.datetime.strptime(
+        race_list.TITLE_PATTERN.match(title).group(1), "%Y年%m月%d日"
+    ).date()
+
+
+def _race_list_url(_: str, html: str) -> str:
+    return url.race_list(_page_date(html))
+
+
+def _race_sum_url(_: str, html: str) -> str:
+    # ページの日付と、レースIDの競馬場から作る
+    track_id: str = RaceSum(html).race_params()[0].race_id[4:6]
+    return url.race_sum(track_id, _page_date(html))
+
+
+# テスト用のHTMLのディレクトリと、ファイル名とHTMLからURLを作る関数
+_PAGES: list[tuple[str, Callable[[str, str], str]]] = [
+    ("race", lambda v, _: url.race(v)),
+    ("race_list", _race_list_url),
+    ("race_sum", _race_sum_url),
+    ("horse", lambda v, _: url.horse(v)),
+    ("horse_ped", lambda v, _: url.horse_ped(v)),
+    ("horse_result_synthetic", lambda v, _: url.horse_result(v)),
+    ("entity_synthetic/jockey", lambda v, _: url.recent_jockey_result(v)),
+    ("entity_synthetic/trainer", lambda v, _: url.trainer(v)),
+    ("entity_synthetic/owner", lambda v, _: url.owner(v)),
+    ("entity_synthetic/breeder", lambda v, _: url.breeder(v)),
+]
+
+
+def fixture_pages(data_dir: Path = DATA_DIR) -> dict[str, bytes]:
+    """テスト用のHTMLを、URLパスからEUC-JPのHTMLへの辞書にする
+
+    異常系のテスト用のファイルのようにURLを作れないものは除く。
+
+    Args:
+        data_dir (Path): テスト用のHTMLのディレクトリ
+
+    Returns:
+        dict[str, bytes]: URLパスからHTMLへの辞書
+    """
+    pages: dict[str, bytes] = {}
+    for dir_name, to_url in _PAGES:
+        for path in sorted((data_dir / dir_name).glob("*.html")):
+            html = path.read_text()
+            try:
+                page_url = to_url(path.stem, html)
+            except Exception:
+                continue
+            # EUC-JPに無い文字は文字参照にする
+            pages[urlparse(page_url).path] = html.encode(
+                ENCODING, errors="xmlcharrefreplace"
+            )
+    return pages
+
+
+class _Throttle:
+    # 直近1秒間のリクエスト数を数える
+    def __init__(self, rps: float):
+        self.__rps = rps
+        self.__lock = threading.Lock()
+        self.__window_start = 0.0
+        self.__count = 0
+
+    def allow(self) -> bool:
+        with self.__lock:
+            now = time.monotonic()
+            if now - self.__window_start >= 1:
+                self.__window_start = now
+                self.__count = 0
+            self.__count += 1
+            return self.__count <= self.__rps
+
+
+class NetkeibaServer:
+    """
+    テスト用のHTMLを返すHTTPサーバー
+
+    別スレッドで動く。with 文で使うと抜けるときに止まる。
+    """
+
+    def __init__(
+        self,
+        config: ServerConfig = ServerConfig(),
+        pages: Optional[dict[str, bytes]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.__config = config
+        self.__pages = fixture_pages() if pages is None else pages
+        self.__random = random.Random(config.seed)
+        self.__random_lock = threading.Lock()
+        self.__throttle = (
+            None if config.throttle_rps is None else _Throttle(config.throttle_rps)
+        )
+        self.__stats: Counter[int] = Counter()
+        self.__stats_lock = threading.Lock()
+        self.__server = ThreadingHTTPServer((host, port), self.__handler_class())
+        self.__server.daemon_threads = True
+        self.__thread: Optional[threading.Thread] = None
+
+    def __handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # 接続を使い回せるようにする。ヘッダーと本文を別々に書くため、
+            # Nagle アルゴリズムを切らないと遅延ACKの分だけ待たされる
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                self._reply(send_body=True)
+
+            def do_HEAD(self):
+                # Client.exists が使う。ステータスとヘッダーは GET と同じ
+                self._reply(send_body=False)
+
+            def _reply(self, send_body: bool):
+                status, body = server._respond(urlparse(self.path).path)
+                self.send_response(status)
+                self.send_header("Content-Type", f"text/html; charset={ENCODING}")
+                self.send_header("Content-Length", str(len(body)))
+                if status == 429:
+                    # 上限は1秒ごとに数え直す
+                    self.send_header("Retry-After", "1")
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _respond(self, path: str) -> tuple[int, bytes]:
+        status, body = self.__status(path)
+        with self.__stats_lock:
+            self.__stats[status] += 1
+        return status, body
+
+    def __status(self, path: str) -> tuple[int, bytes]:
+        if self.__throttle is not None and not self.__throttle.allow():
+            return 429, b"Too Many Requests"
+        with self.__random_lock:
+            delay = self.__config.latency + self.__random.uniform(
+                0, self.__config.jitter
+            )
+            error = self.__random.random() < self.__config.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if error:
+            return 500, b"Internal Server Error"
+        if (body := self.__pages.get(path)) is None:
+            return 404, b"Not Found"
+        return 200, body
+
+    def base_url(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def paths(self) -> list[str]:
+        """返すことのできるURLパス"""
+        return list(self.__pages)
+
+    def stats(self) -> dict[int, int]:
+        """ステータスコードごとのリクエスト数"""
+        with self.__stats_lock:
+            return dict(self.__stats)
+
+    def reset_stats(self) -> None:
+        with self.__stats_lock:
+            self.__stats.clear()
+
+    def start(self) -> None:
+        self.__thread = threading.Thread(
+            target=self.__server.serve_forever, daemon=True
+        )
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rps", type=float)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    config = ServerConfig(
+        args.latency, args.jitter, args.error_rate, args.throttle_rps, args.seed
+    )
+    with NetkeibaServer(config, host=args.host, port=args.port) as server:
+        print(f"Serving {len(server.paths())} pages at {server.base_url()}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+パーサーのベンチマーク
+
+tests/scraping_netkeiba/data のHTMLを各パーサーで読み、1秒あたりのページ数・
+アクセサ1回あたりの時間（µs）・最大RSSを測る。--scale で同じページを繰り返した
+コーパスにできる。
+
+結果をベースラインとして保存し、次回以降はベースラインより threshold 以上
+遅くなったら終了コード1で終わる。ベースラインは実行したマシンの値なので
+リポジトリには含めず、--check でベースラインが無い場合は結果を保存して終わる。
+
+    python -m benchmarks.parsers --save-baseline
+    python -m benchmarks.parsers --check --threshold 0.2
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional
+
+from bs4 import BeautifulSoup
+
+from scraping_netkeiba import race_list
+from scraping_netkeiba.horse import Horse
+from scraping_netkeiba.horse_ped import HorsePed
+from scraping_netkeiba.horse_result import HorseResult
+from scraping_netkeiba.profiler import Profiler
+from scraping_netkeiba.race import Payoff, Race
+from scraping_netkeiba.race_list import RaceList
+from scraping_netkeiba.race_sum import RaceSum
+
+DATA_DIR = Path(__file__).parent.parent / "tests/scraping_netkeiba/data"
+DEFAULT_BASELINE = Path(__file__).parent / "results/parsers_baseline.json"
+
+
+class Target(NamedTuple):
+    name: str
+    data_dir: str
+    construct: Callable[[str, str], Any]
+    accessors: list[str]
+
+
+def _race_list(_: str, html: str) -> RaceList:
+    # テスト用のページはファイル名と日付が一致しないため、タイトルから読む
+    return RaceList(race_list.title_date(html), html)
+
+
+TARGETS: list[Target] = [
+    Target(
+        "race",
+        "race",
+        Race,
+        [
+            "race_date",
+            "post_time",
+            "weather",
+            "racecourse",
+            "track_name",
+            "track_surface",
+            "track_distance",
+            "track_condition",
+            "horse_count",
+            "horse_id",
+            "jockey_id",
+            "bracket_number",
+            "horse_number",
+            "corner_orders",
+            "arrival_order",
+            "pop_order",
+            "horse_weight",
+            "load_weight",
+            "total_time",
+            "final_push_time",
+            "win_odds",
+            "prize",
+            "race_info_as_dataframe",
+            "race_result_as_dataframe",
+        ],
+    ),
+    Target(
+        "payoff",
+        "race",
+        lambda _, html: Payoff(BeautifulSoup(html, "html.parser")),
+        [
+            "win",
+            "show",
+            "bracket_quinella",
+            "quinella",
+            "quinella_place",
+            "exacta",
+            "trio",
+            "trifecta",
+        ],
+    ),
+    Target(
+        "horse",
+        "horse",
+        Horse,
+        [
+            "name",
+            "eng_name",
+            "gender",
+            "birth_date",
+            "trainer_id",
+            "owner_id",
+            "breeder_id",
+            "as_dataframe",
+        ],
+    ),
+    Target(
+        "horse_ped",
+        "horse_ped",
+        HorsePed,
+        ["ped_horse_ids", "sire", "dam_dam_dam", "as_dataframe"],
+    ),
+    Target(
+        "horse_result",
+        "horse_result_synthetic",
+        HorseResult,
+        ["race_date", "race_id", "total_time", "horse_weight", "as_dataframe"],
+    ),
+    Target("race_list", "race_list", _race_list, ["race_sum_params"]),
+    Target("race_sum", "race_sum", lambda _, html: RaceSum(html), ["race_params"]),
+]
+
+
+def _load_pages(target: Target) -> list[tuple[str, str]]:
+    # パースできないページ（異常系のテスト用）は除く
+    pages: list[tuple[str, str]] = []
+    for path in sorted((DATA_DIR / target.data_dir).glob("*.html")):
+        html = path.read_text()
+        try:
+            obj = target.construct(path.stem, html)
+            for accessor in target.accessors:
+                getattr(obj, accessor)()
+        except Exception:
+            continue
+        pages.append((path.stem, html))
+    return pages
+
+
+def _measure(target: Target, pages: list[tuple[str, str]]) -> dict[str, Any]:
+    construct_seconds = 0.0
+    accessor_seconds: dict[str, float] = {v: 0.0 for v in target.accessors}
+    for page_id, html in pages:
+        start = time.perf_counter()
+        obj = target.construct(page_id, html)
+        construct_seconds += time.perf_counter() - start
+        for accessor in target.accessors:
+            method = getattr(obj, accessor)
+            start = time.perf_counter()
+            method()
+            accessor_seconds[accessor] += time.perf_counter() - start
+    total_seconds = construct_seconds + sum(accessor_seconds.values())
+    return {
+        "pages": len(pages),
+        "pages_per_sec": len(pages) / total_seconds,
+        "construct_us": construct_seconds / len(pages) * 1e6,
+        "accessors_us": {k: v / len(pages) * 1e6 for k, v in accessor_seconds.items()},
+    }
+
+
+def _profile(target: Target, pages: list[tuple[str, str]], profile_dir: Path) -> None:
+    # 計測用の関数に差し替えると遅くなるため、時間の計測とは別に1回だけ実行する
+    with Profiler() as profiler:
+        for page_id, html in pages:
+            obj = target.construct(page_id, html)
+            for accessor in target.accessors:
+                getattr(obj, accessor)()
+    profiler.write_collapsed(str(profile_dir / f"{target.name}.folded"))
+    (profile_dir / f"{target.name}.txt").write_text(profiler.format_report() + "\n")
+
+
+def _run_target(
+    name: str, scale: int, repeat: int, profile_dir: Optional[Path] = None
+) -> dict[str, Any]:
+    target = next(v for v in TARGETS if v.name == name)
+    pages = _load_pages(target) * scale
+    if not pages:
+        raise Exception(f"No page for {name}")
+    if profile_dir is not None:
+        _profile(target, pages, profile_dir)
+    # 最も速かった回の値を使う
+    results = [_measure(target, pages) for _ in range(repeat)]
+    best = max(results, key=lambda v: v["pages_per_sec"])
+    best["accessors_us"] = {
+        k: min(v["accessors_us"][k] for v in results) for k in target.accessors
+    }
+    # Linux では KiB 単位
+    best["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return best
+
+
+def run(
+    names: list[str],
+    scale: int = 1,
+    repeat: int = 3,
+    profile_dir: Optional[Path] = None,
+) -> dict[str, Any]:
+    """パーサーごとに新しいプロセスで計測する
+
+    プロセスを分けることで、最大RSSがパーサーごとの値になる。
+    profile_dir を指定すると、パーサーごとのフレームグラフ用のファイル（.folded）と
+    関数ごとの時間の表（.txt）を書き出す。
+    """
+    if profile_dir is not None:
+        profile_dir.mkdir(parents=True, exist_ok=True)
+    context = multiprocessing.get_context("spawn")
+    results: dict[str, Any] = {}
+    for name in names:
+        with context.Pool(1) as pool:
+            results[name] = pool.apply(_run_target, (name, scale, repeat, profile_dir))
+    return results
+
+
+def compare(
+    results: dict[str, Any], baseline: dict[str, Any], threshold: float
+) -> list[str]:
+    """ベースラインより threshold の割合以上遅くなった項目を返す
+
+    1µs 未満の差は計測の誤差として無視する。
+    """
+    regressions: list[str] = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        if result["pages_per_sec"] < base["pages_per_sec"] * (1 - threshold):
+            regressions.append(
+                f"{name}: {result['pages_per_sec']:.1f} pages/sec"
+                f" (baseline {base['pages_per_sec']:.1f})"
+            )
+        for accessor, us in result["accessors_us"].items():
+            base_us: Optional[float] = base["accessors_us"].get(accessor)
+            if base_us is None:
+                continue
+            if us > base_us * (1 + threshold) and us - base_us >= 1:
+                regressions.append(
+                    f"{name}.{accessor}: {us:.1f} µs (baseline {base_us:.1f})"
+                )
+    return regressions
+
+
+def _print(results: dict[str, Any]) -> None:
+    for name, result in results.items():
+        print(
+            f"{name}: {result['pages']} pages, {result['pages_per_sec']:.1f} pages/sec,"
+            f" construct {result['construct_us']:.1f} µs,"
+            f" peak RSS {result['peak_rss_mb']:.1f} MiB"
+        )
+        for accessor, us in result["accessors_us"].items():
+            print(f"    {accessor}: {us:.1f} µs")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--targets",
+        nargs="*",
+        default=[v.name for v in TARGETS],
+        choices=[v.name for v in TARGETS],
+    )
+    parser.add_argument("--scale", type=int, default=1, help="ページを繰り返す回数")
+    parser.add_argument("--repeat", type=int, default=3, help="計測する回数")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--output", type=Path, help="結果をJSONで書き出す")
+    parser.add_argument("--profile", type=Path, help="メソッドごとの時間を書き出すディレクトリ")
+    args = parser.parse_args(argv)
+
+    results = run(args.targets, args.scale, args.repeat, args.profile)
+    _print(results)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f"Saved baseline to {args.baseline}")
+    if args.check:
+        if not args.baseline.exists():
+            args.baseline.parent.mkdir(parents=True, exist_ok=True)
+            args.baseline.write_text(json.dumps(results, indent=2))
+            print(f"Baseline is not found, saved to {args.baseline}")
+            return 0
+        regressions = compare(
+            results, json.loads(args.baseline.read_text()), args.threshold
+        )
+        for v in regressions:
+            print(f"Regression: {v}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
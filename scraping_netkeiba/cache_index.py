@@ -0,0 +1,166 @@
+import hashlib
+import math
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Iterable, Optional, Self
+from urllib.parse import urlparse
+
+from scraping_netkeiba.client import Cache, ICache
+
+
+def _key(url: str) -> bytes:
+    # Cache と同じく、URLのパスでページを区別する
+    return urlparse(url).path.strip("/").encode()
+
+
+class BloomFilter:
+    """
+    文字列の集合を固定長のビット列で表す Bloom filter
+
+    含まれない要素を含まれると判定すること（偽陽性）はあるが、その逆はない。
+    """
+
+    __header = struct.Struct("<QQQ")
+
+    def __init__(self, capacity: int = 10_000_000, error_rate: float = 0.001):
+        self.__size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.__hash_count = max(1, round(self.__size / capacity * math.log(2)))
+        self.__bits = bytearray((self.__size + 7) // 8)
+        self.__count = 0
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def __positions(self, key: bytes) -> Iterable[int]:
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        return ((h1 + i * h2) % self.__size for i in range(self.__hash_count))
+
+    def add(self, key: bytes) -> None:
+        for p in self.__positions(key):
+            self.__bits[p >> 3] |= 1 << (p & 7)
+        self.__count += 1
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(self.__bits[p >> 3] & (1 << (p & 7)) for p in self.__positions(key))
+
+    def to_bytes(self) -> bytes:
+        return (
+            self.__header.pack(self.__size, self.__hash_count, self.__count)
+            + self.__bits
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Self:
+        bloom = cls.__new__(cls)
+        size, hash_count, count = cls.__header.unpack_from(data)
+        bloom.__size = size
+        bloom.__hash_count = hash_count
+        bloom.__count = count
+        bloom.__bits = bytearray(data[cls.__header.size :])
+        return bloom
+
+
+class IndexedCache(ICache):
+    """
+    キャッシュ済みのURLを Bloom filter で索引するキャッシュ
+
+    might_exist はファイルシステムを見ずにメモリ上で判定するため、
+    大量のURLから未取得のものを選ぶのに向く。exists は Bloom filter で
+    含まれないと分かったURLについてはファイルを確認しない。
+
+    索引は index_dir に保存する。write のたびにURLを追記ログに書き、
+    save でビット列にまとめる。開くときはビット列を読み込み、追記ログを
+    反映する。
+
+    索引が無い状態で開いた場合、cache が Cache ならキャッシュ済みのURLを
+    走査して索引を作る。それ以外のキャッシュでは rebuild するまで索引を
+    使わず、全てのURLをキャッシュにある可能性があるものとして扱う。
+    """
+
+    def __init__(
+        self,
+        cache: ICache,
+        index_dir: str,
+        capacity: int = 10_000_000,
+        error_rate: float = 0.001,
+    ):
+        self.__cache = cache
+        self.__index_dir = Path(index_dir)
+        self.__index_dir.mkdir(parents=True, exist_ok=True)
+        self.__lock = threading.Lock()
+        # 索引にキャッシュ済みの全てのURLが入っているか
+        self.__complete = self.__snapshot_path().exists()
+        if self.__complete:
+            self.__bloom = BloomFilter.from_bytes(self.__snapshot_path().read_bytes())
+        else:
+            self.__bloom = BloomFilter(capacity, error_rate)
+        if self.__journal_path().exists():
+            with self.__journal_path().open("rb") as f:
+                for line in f:
+                    self.__bloom.add(line.rstrip(b"\n"))
+        self.__journal = self.__journal_path().open("ab")
+        if not self.__complete and isinstance(cache, Cache):
+            self.rebuild()
+
+    def __snapshot_path(self) -> Path:
+        return self.__index_dir / "bloom.bin"
+
+    def __journal_path(self) -> Path:
+        return self.__index_dir / "journal.log"
+
+    def close(self) -> None:
+        self.__journal.close()
+
+    def might_exist(self, url: str) -> bool:
+        """キャッシュにある可能性があるか。False の場合は確実に無い"""
+        return not self.__complete or _key(url) in self.__bloom
+
+    def missing(self, urls: Iterable[str]) -> list[str]:
+        """確実にキャッシュに無いURLを返す"""
+        return [v for v in urls if not self.might_exist(v)]
+
+    def exists(self, url: str) -> bool:
+        return self.might_exist(url) and bool(self.__cache.exists(url))
+
+    def write(self, url: str, html: str) -> None:
+        self.__cache.write(url, html)
+        self.__add(_key(url))
+        self.__journal.flush()
+
+    def read(self, url: str) -> str:
+        return self.__cache.read(url)
+
+    def stat(self, url: str) -> Optional[tuple[int, int]]:
+        return self.__cache.stat(url)
+
+    def __add(self, key: bytes) -> None:
+        with self.__lock:
+            self.__bloom.add(key)
+            self.__journal.write(key + b"\n")
+
+    def rebuild(self, urls: Optional[Iterable[str]] = None) -> None:
+        """キャッシュ済みの全てのURLを索引に登録して保存する
+
+        Args:
+            urls (Optional[Iterable[str]]): 登録するURL。省略時は Cache を走査する
+        """
+        if urls is None:
+            if not isinstance(self.__cache, Cache):
+                raise TypeError("urls is required unless the cache is a Cache")
+            urls = self.__cache.urls()
+        for v in urls:
+            self.__add(_key(v))
+        self.save()
+        self.__complete = True
+
+    def save(self) -> None:
+        """索引をビット列に書き出し、追記ログを空にする"""
+        with self.__lock:
+            tmp_path = self.__snapshot_path().with_suffix(".tmp")
+            tmp_path.write_bytes(self.__bloom.to_bytes())
+            os.replace(tmp_path, self.__snapshot_path())
+            self.__journal.close()
+            self.__journal = self.__journal_path().open("wb")
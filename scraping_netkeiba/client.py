@@ -1,13 +1,26 @@
 import abc
 import datetime
+import email.utils
+import threading
 import time
 from pathlib import Path
-from typing import NamedTuple, Optional
+from typing import Generator, NamedTuple, Optional
 from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from scraping_netkeiba import url
+from scraping_netkeiba import metrics, url
+
+# netkeiba.com のHTMLの文字コード
+ENCODING = "EUC-JP"
+
+# 待ってから再試行するステータスコード
+RETRY_STATUSES = [429, 503]
+# Retry-After が無い場合に待つ秒数
+DEFAULT_RETRY_AFTER = 1.0
+# ページが無いことを表すステータスコード
+MISSING_STATUSES = [404, 410]
 
 
 class ICache(metaclass=abc.ABCMeta):
@@ -23,6 +36,13 @@ class ICache(metaclass=abc.ABCMeta):
     def read(self, url: str) -> str:
         raise NotImplementedError()
 
+    def stat(self, url: str) -> Optional[tuple[int, int]]:
+        """ページの (更新日時のナノ秒, バイト数)。分からない場合は None
+
+        内容を読まずに変更を検出するために使う。
+        """
+        return None
+
 
 class NullCache(ICache):
     def exists(self, url: str) -> bool:
@@ -47,11 +67,35 @@ class Cache(ICache):
 
     def write(self, url: str, html: str) -> None:
         path = self.__cache_path(url)
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(html)
+        with metrics.timer("cache_write") as t:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(html)
+            if metrics.enabled():
+                t.add_bytes(path.stat().st_size)
 
     def read(self, url: str) -> str:
-        return self.__cache_path(url).read_text()
+        path = self.__cache_path(url)
+        with metrics.timer("cache_read") as t:
+            html = path.read_text()
+            if metrics.enabled():
+                t.add_bytes(path.stat().st_size)
+        return html
+
+    def stat(self, url: str) -> Optional[tuple[int, int]]:
+        try:
+            stat = self.__cache_path(url).stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def urls(self) -> Generator[str, None, None]:
+        """キャッシュ済みの全てのURLを返す
+
+        ディレクトリを全て辿るため、件数が多いと時間がかかる。
+        """
+        root = Path(self.__cache_dir)
+        for path in root.rglob("*.html"):
+            yield f"{url.BASE_URL}/{path.relative_to(root).with_suffix('').as_posix()}/"
 
 
 class HorseParam(NamedTuple):
@@ -62,6 +106,26 @@ class HorsePedParam(NamedTuple):
     horse_id: str
 
 
+class HorseResultParam(NamedTuple):
+    horse_id: str
+
+
+class JockeyParam(NamedTuple):
+    jockey_id: str
+
+
+class TrainerParam(NamedTuple):
+    trainer_id: str
+
+
+class OwnerParam(NamedTuple):
+    owner_id: str
+
+
+class BreederParam(NamedTuple):
+    breeder_id: str
+
+
 class RaceParam(NamedTuple):
     race_id: str
 
@@ -75,13 +139,81 @@ class RaceSumParam(NamedTuple):
     date: datetime.date
 
 
+class RateLimiter:
+    """
+    リクエストの間隔を一定以上に保つ
+
+    複数のスレッドや Client で共有すると、全体のリクエスト頻度を制御できる。
+    """
+
+    def __init__(self, interval: float = 0.2):
+        self.__interval = interval
+        self.__lock = threading.Lock()
+        self.__next_time = 0.0
+
+    def wait(self) -> None:
+        """前回のリクエストから interval 秒以上経つまで待つ"""
+        with self.__lock:
+            now = time.monotonic()
+            scheduled = max(now, self.__next_time)
+            self.__next_time = scheduled + self.__interval
+        if scheduled > now:
+            time.sleep(scheduled - now)
+
+    def pause(self, seconds: float) -> None:
+        """今から seconds 秒の間、どのリクエストも送らないようにする"""
+        with self.__lock:
+            self.__next_time = max(self.__next_time, time.monotonic() + seconds)
+
+
+def _retry_after(response: requests.Response) -> float:
+    # 秒数と日時のどちらでも指定できる
+    value: Optional[str] = response.headers.get("Retry-After")
+    if value is None:
+        return DEFAULT_RETRY_AFTER
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(
+        0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+    )
+
+
 class Client:
     """
     netkeiba.comのHTMLを取得するクライアント
     """
 
-    def __init__(self, cache: Optional[ICache] = None):
+    def __init__(
+        self,
+        cache: Optional[ICache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        pool_size: int = 10,
+        base_url: Optional[str] = None,
+        max_retries: int = 3,
+    ):
         self.__cache = cache or NullCache()
+        self.__rate_limiter = rate_limiter or RateLimiter()
+        # 429 などが返ったときに、Retry-After だけ待って再試行する回数
+        self.__max_retries = max_retries
+        # ベンチマーク用のサーバーなどに接続する場合に、リクエスト先だけを差し替える。
+        # キャッシュのキーは netkeiba.com のURLのまま
+        self.__base_url: Optional[str] = (
+            None if base_url is None else base_url.rstrip("/")
+        )
+        # 複数スレッドから呼ばれても接続を使い回せるよう、プールの大きさを揃える
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.__session.mount("https://", adapter)
+        self.__session.mount("http://", adapter)
+        # exists で確かめたURLの結果
+        self.__exists: dict[str, bool] = {}
+        self.__exists_lock = threading.Lock()
 
     def get_by_path(self, path: str, update_cache: bool = False) -> str:
         """指定されたURLパスのHTMLを取得する
@@ -119,6 +251,66 @@ class Client:
         """
         return self.__get(url.horse_ped(param.horse_id), update_cache)
 
+    def horse_result(self, param: HorseResultParam, update_cache: bool = False) -> str:
+        """競走馬の戦績ページのHTMLを取得する
+
+        Args:
+            param (HorseResultParam): パラメータ
+            update_cache (bool): キャッシュを更新するか
+
+        Returns:
+            str: HTML文字列
+        """
+        return self.__get(url.horse_result(param.horse_id), update_cache)
+
+    def jockey(self, param: JockeyParam, update_cache: bool = False) -> str:
+        """騎手の最近の成績ページのHTMLを取得する
+
+        Args:
+            param (JockeyParam): パラメータ
+            update_cache (bool): キャッシュを更新するか
+
+        Returns:
+            str: HTML文字列
+        """
+        return self.__get(url.recent_jockey_result(param.jockey_id), update_cache)
+
+    def trainer(self, param: TrainerParam, update_cache: bool = False) -> str:
+        """調教師のページのHTMLを取得する
+
+        Args:
+            param (TrainerParam): パラメータ
+            update_cache (bool): キャッシュを更新するか
+
+        Returns:
+            str: HTML文字列
+        """
+        return self.__get(url.trainer(param.trainer_id), update_cache)
+
+    def owner(self, param: OwnerParam, update_cache: bool = False) -> str:
+        """馬主のページのHTMLを取得する
+
+        Args:
+            param (OwnerParam): パラメータ
+            update_cache (bool): キャッシュを更新するか
+
+        Returns:
+            str: HTML文字列
+        """
+        return self.__get(url.owner(param.owner_id), update_cache)
+
+    def breeder(self, param: BreederParam, update_cache: bool = False) -> str:
+        """生産者のページのHTMLを取得する
+
+        Args:
+            param (BreederParam): パラメータ
+            update_cache (bool): キャッシュを更新するか
+
+        Returns:
+            str: HTML文字列
+        """
+        return self.__get(url.breeder(param.breeder_id), update_cache)
+
     def race(self, param: RaceParam, update_cache: bool = False) -> str:
         """レース結果ページのHTMLを取得する
 
@@ -155,12 +347,72 @@ class Client:
         """
         return self.__get(url.race_sum(param.track_id, param.date), update_cache)
 
+    def exists(self, page_url: str) -> bool:
+        """ページが存在するかを、本文を取得せずに確かめる
+
+        キャッシュにあれば True を返す。無ければ RateLimiter の間隔を守って
+        HEAD リクエストを送り、200 なら True、404 か 410 なら False を返す。
+        結果は覚えておき、同じURLには送り直さない。
+
+        Args:
+            page_url (str): netkeiba.comのURL
+
+        Returns:
+            bool: 存在するか
+        """
+        if self.__cache.exists(page_url):
+            return True
+        with self.__exists_lock:
+            if (exists := self.__exists.get(page_url)) is not None:
+                return exists
+        response = self.__request("HEAD", page_url)
+        if response.status_code != 200 and response.status_code not in MISSING_STATUSES:
+            raise requests.HTTPError(
+                f"{response.status_code} Error for url: {page_url}", response=response
+            )
+        exists = response.status_code == 200
+        with self.__exists_lock:
+            self.__exists[page_url] = exists
+        return exists
+
+    def __request_url(self, page_url: str) -> str:
+        if self.__base_url is None:
+            return page_url
+        return self.__base_url + page_url.removeprefix(url.BASE_URL)
+
+    def __request(self, method: str, url: str) -> requests.Response:
+        for retry in range(self.__max_retries + 1):
+            with metrics.timer("throttle"):
+                self.__rate_limiter.wait()
+            with metrics.timer("fetch") as t:
+                if method == "HEAD":
+                    response = self.__session.head(self.__request_url(url))
+                else:
+                    response = self.__session.get(self.__request_url(url))
+                if metrics.enabled():
+                    t.add_bytes(len(response.content))
+            if (
+                response.status_code not in RETRY_STATUSES
+                or retry == self.__max_retries
+            ):
+                return response
+            # 他のスレッドのリクエストも止める
+            metrics.count("retry")
+            self.__rate_limiter.pause(_retry_after(response))
+
     def __get(self, url: str, update_cache: bool = False) -> str:
         if not update_cache and self.__cache.exists(url):
+            metrics.count("cache_hit")
             return self.__cache.read(url)
-        response = requests.get(url)
-        time.sleep(0.2)
-        response.encoding = "EUC-JP"
-        html = response.text
+        metrics.count("cache_miss")
+        response = self.__request("GET", url)
+        # エラーのページはキャッシュしない
+        if response.status_code != 200:
+            raise requests.HTTPError(
+                f"{response.status_code} Error for url: {url}", response=response
+            )
+        with metrics.timer("decode"):
+            response.encoding = ENCODING
+            html = response.text
         self.__cache.write(url, html)
         return html
@@ -0,0 +1,193 @@
+import html as html_lib
+import logging
+import re
+from datetime import date, datetime
+from typing import Callable, Iterable, NamedTuple, Optional
+
+import pandas as pd
+
+from scraping_netkeiba import url
+
+HEAD_NAME_PATTERN = re.compile(
+    r"""<div\s[^>]*\bclass=["']?db_head_name\b.*?<h1[^>]*>(.*?)</h1>""", re.I | re.S
+)
+TITLE_PATTERN = re.compile(r"<title>([^<|]*)", re.I)
+KANA_PATTERN = re.compile(r"[(（]([^)）]*)[)）]\s*$")
+TAG_PATTERN = re.compile(r"<[^>]*>")
+A_TAG_PATTERN = re.compile(r"<a\s[^>]*>", re.I)
+ACTIVE_CLASS_PATTERN = re.compile(
+    r'\bclass=(?:"[^"]*\bactive\b[^"]*"' r"|'[^']*\bactive\b[^']*'|active\b)", re.I
+)
+HREF_PATTERN = re.compile(r"""\bhref=["']?([^"'\s>]+)""", re.I)
+PROFILE_PATTERN = re.compile(
+    r"""<div\s[^>]*\bclass=["']?db_head_name\b(?:(?!</div>).)*?"""
+    r"""<p\s[^>]*\bclass=["']?txt_01\b[^>]*>(.*?)</p>""",
+    re.I | re.S,
+)
+BR_PATTERN = re.compile(r"<br\s*/?>", re.I)
+BIRTH_DATE_PATTERN = re.compile(r"^\d{4}/\d{2}/\d{2}$")
+DEBUT_PATTERN = re.compile(
+    r"<th[^>]*>\s*(?:デビュー|初騎乗|開業)[^<]*</th>\s*<td[^>]*>\D*(\d{4})", re.I
+)
+SPACES_PATTERN = re.compile(r"\s+")
+
+
+class EntityKind(NamedTuple):
+    """
+    騎手・調教師・馬主・生産者のページの種類
+    """
+
+    name: str
+    to_url: Callable[[str], str]
+    id_pattern: Callable[[], re.Pattern]
+
+
+JOCKEY = EntityKind(
+    "jockey", url.recent_jockey_result, url.recent_jockey_result_pattern
+)
+TRAINER = EntityKind("trainer", url.trainer, url.trainer_pattern)
+OWNER = EntityKind("owner", url.owner, url.owner_pattern)
+BREEDER = EntityKind("breeder", url.breeder, url.breeder_pattern)
+
+ENTITY_KINDS: list[EntityKind] = [JOCKEY, TRAINER, OWNER, BREEDER]
+
+# 種類ごとの表の、IDの列以外の列
+COLUMNS = ["name", "name_kana", "affiliation", "birth_date", "debut_year"]
+
+
+def _text(value: str) -> str:
+    return SPACES_PATTERN.sub(
+        " ", html_lib.unescape(TAG_PATTERN.sub("", value))
+    ).strip()
+
+
+class Entity:
+    """
+    騎手・調教師・馬主・生産者のページ
+
+    ページの見出しから名前を取り出す。見出しが無い場合は title を使う。
+    見出しの下のプロフィール（生年月日・所属など）と、プロフィールの表の
+    デビュー年も読む。ページに無い項目は None になる。
+    HTMLは正規表現で読み、BeautifulSoup は使わない。
+    メニューの選択中のリンクのIDが指定したIDと違う場合は例外を投げる。
+
+    テストのページは競走馬ページから作ったもので、実際の騎手・調教師・
+    馬主・生産者のページではまだ確かめていない。
+    """
+
+    # パース結果が変わる修正をしたら上げる。上がると増分パースでパースし直す
+    PARSER_VERSION = 2
+
+    def __init__(self, kind: EntityKind, entity_id: str, html: str):
+        self.__kind = kind
+        self.__entity_id = entity_id
+        self.__html = html
+        self.validate()
+        self.__name, self.__name_kana = self.__parse_name(html)
+        self.__profile: list[str] = self.__parse_profile(html)
+
+    @staticmethod
+    def __parse_name(html: str) -> tuple[str, Optional[str]]:
+        if m := HEAD_NAME_PATTERN.search(html):
+            # 見出しは「名前 (読み)」の形になっている。名前の途中の括弧は読みではない
+            heading: str = TAG_PATTERN.sub("", m.group(1))
+            name: str = _text(KANA_PATTERN.sub("", heading))
+            kana: Optional[str] = (
+                _text(k.group(1)) if (k := KANA_PATTERN.search(heading)) else None
+            )
+            if name:
+                return name, kana
+        if (m := TITLE_PATTERN.search(html)) and (name := _text(m.group(1))):
+            return name, None
+        raise Exception("Entity name is not found")
+
+    @staticmethod
+    def __parse_profile(html: str) -> list[str]:
+        # 見出しの下に「生年月日<br>所属」のように改行で区切って書かれている
+        if m := PROFILE_PATTERN.search(html):
+            return [v for v in map(_text, BR_PATTERN.split(m.group(1))) if v]
+        return []
+
+    def kind(self) -> EntityKind:
+        return self.__kind
+
+    def entity_id(self) -> str:
+        return self.__entity_id
+
+    def name(self) -> str:
+        """名前"""
+        return self.__name
+
+    def name_kana(self) -> Optional[str]:
+        """名前の読み。ページに無い場合は None"""
+        return self.__name_kana
+
+    def affiliation(self) -> Optional[str]:
+        """騎手・調教師は所属（美浦・栗東など）、生産者は所在地。ページに無い場合は None"""
+        return next(
+            (v for v in self.__profile if not BIRTH_DATE_PATTERN.match(v)), None
+        )
+
+    def birth_date(self) -> Optional[date]:
+        """生年月日。ページに無い場合は None"""
+        for v in self.__profile:
+            if BIRTH_DATE_PATTERN.match(v):
+                return datetime.strptime(v, "%Y/%m/%d").date()
+        return None
+
+    def debut_year(self) -> Optional[int]:
+        """デビュー（調教師は開業）の年。ページに無い場合は None"""
+        if m := DEBUT_PATTERN.search(self.__html):
+            return int(m.group(1))
+        return None
+
+    def as_columns(self) -> dict[str, list]:
+        """列名から値のリストへの辞書"""
+        return {
+            f"{self.__kind.name}_id": [self.__entity_id],
+            "name": [self.name()],
+            "name_kana": [self.name_kana()],
+            "affiliation": [self.affiliation()],
+            "birth_date": [self.birth_date()],
+            "debut_year": [self.debut_year()],
+        }
+
+    def as_dataframe(self) -> pd.DataFrame:
+        try:
+            return pd.DataFrame.from_dict(self.as_columns())
+        except Exception as e:
+            logging.warning(f"An error occurred while scraping Entity: {e}")
+
+    def validate(self):
+        entity_id: Optional[str] = None
+        for tag in A_TAG_PATTERN.finditer(self.__html):
+            if not ACTIVE_CLASS_PATTERN.search(tag.group(0)):
+                continue
+            href: Optional[re.Match] = HREF_PATTERN.search(tag.group(0))
+            if href and (m := self.__kind.id_pattern().match(href.group(1))):
+                entity_id = m.group(1)
+                break
+        if entity_id is None:
+            raise Exception(f"Active {self.__kind.name} url is not found")
+        if self.__entity_id != entity_id:
+            raise Exception(
+                f'Invalid {self.__kind.name} id: expected "{self.__entity_id}",'
+                f' got "{entity_id}"'
+            )
+
+
+def entities_as_dataframe(kind: EntityKind, entities: Iterable[Entity]) -> pd.DataFrame:
+    """同じ種類のページをまとめて1つのDataFrameにする
+
+    Args:
+        kind (EntityKind): ページの種類
+        entities (Iterable[Entity]): ページ
+
+    Returns:
+        pd.DataFrame: 1行1人（1団体）のDataFrame
+    """
+    columns: dict[str, list] = {v: [] for v in [f"{kind.name}_id", *COLUMNS]}
+    for entity in entities:
+        for name, values in entity.as_columns().items():
+            columns[name].extend(values)
+    return pd.DataFrame.from_dict(columns)
@@ -0,0 +1,155 @@
+import logging
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+import pandas as pd
+
+from scraping_netkeiba import url
+from scraping_netkeiba.client import (
+    BreederParam,
+    Client,
+    JockeyParam,
+    OwnerParam,
+    TrainerParam,
+)
+from scraping_netkeiba.entity import (
+    BREEDER,
+    ENTITY_KINDS,
+    JOCKEY,
+    OWNER,
+    TRAINER,
+    Entity,
+    EntityKind,
+    entities_as_dataframe,
+)
+from scraping_netkeiba.fetcher import Fetcher
+from scraping_netkeiba.frontier import Frontier, State
+from scraping_netkeiba.manifest import Manifest
+
+# ページ種別から、ページを取得するパラメータへの辞書
+_PARAMS: dict[str, type] = {
+    "recent_jockey_result": JockeyParam,
+    "trainer": TrainerParam,
+    "owner": OwnerParam,
+    "breeder": BreederParam,
+}
+_KINDS: dict[type, EntityKind] = {
+    JockeyParam: JOCKEY,
+    TrainerParam: TRAINER,
+    OwnerParam: OWNER,
+    BreederParam: BREEDER,
+}
+_KINDS_BY_NAME: dict[str, EntityKind] = {v.name: v for v in ENTITY_KINDS}
+
+
+def referenced_entity_ids(frames: Iterable[pd.DataFrame]) -> dict[str, list[str]]:
+    """表に含まれる騎手・調教師・馬主・生産者のIDを重複なく集める
+
+    race_result の jockey_id や horse の trainer_id などの列を見る。
+
+    Args:
+        frames (Iterable[pd.DataFrame]): race_result・horse・horse_result などの表
+
+    Returns:
+        dict[str, list[str]]: 種類の名前からIDへの辞書
+    """
+    ids: dict[str, set[str]] = {v.name: set() for v in ENTITY_KINDS}
+    for df in frames:
+        for kind in ENTITY_KINDS:
+            if (column := f"{kind.name}_id") in df.columns:
+                ids[kind.name].update(df[column].dropna())
+    return {k: sorted(v) for k, v in ids.items()}
+
+
+class EntityCrawler:
+    """
+    騎手・調教師・馬主・生産者のページを取得し、種類ごとの表にする
+
+    取得するページのURLは Frontier に登録し、同じIDのページは一度しか
+    取得・パースしない。crawl を繰り返し呼んでも、パースできたIDは取得し直さない。
+    取得やパースに失敗したIDは、max_attempts 回に達するまで次の crawl で取得し直す。
+    state_dir を指定すると Frontier をファイルに保存し、次回もパースできたIDは
+    取得せず、中断したときに残っていたIDから取得する。
+    manifest を指定すると、パースできたページを記録する。
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        max_workers: int = 4,
+        manifest: Optional[Manifest] = None,
+        state_dir: Optional[str] = None,
+        max_attempts: int = 3,
+    ):
+        self.__client = client
+        self.__max_workers = max_workers
+        self.__manifest = manifest
+        self.__frontier = Frontier(
+            str(Path(state_dir) / "frontier.sqlite") if state_dir else ":memory:",
+            max_attempts=max_attempts,
+        )
+
+    def close(self) -> None:
+        self.__frontier.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def crawl(
+        self, ids: dict[str, Iterable[str]], update_cache: bool = False
+    ) -> dict[str, pd.DataFrame]:
+        """ページを取得してパースする
+
+        引数のIDに加え、前回の crawl で取得できなかったIDも取得する。
+
+        Args:
+            ids (dict[str, Iterable[str]]): 種類の名前からIDへの辞書。
+                referenced_entity_ids の結果を渡せる
+            update_cache (bool): キャッシュを更新するか
+
+        Returns:
+            dict[str, pd.DataFrame]: 種類の名前から、今回取得したページの表への辞書
+        """
+        self.__frontier.add(
+            _KINDS_BY_NAME[name].to_url(v)
+            for name, entity_ids in ids.items()
+            for v in entity_ids
+        )
+        entries = self.__frontier.claim(self.__frontier.counts()[State.Pending])
+        params: list[NamedTuple] = []
+        for entry in entries:
+            route = url.route(entry.url)
+            params.append(_PARAMS[route.page_type](route.ids[0]))
+
+        entities: dict[str, list[Entity]] = {v.name: [] for v in ENTITY_KINDS}
+        remaining = {v.url for v in entries}
+        fetcher = Fetcher(self.__client, self.__max_workers)
+        try:
+            for param, html in fetcher.fetch(params, update_cache, "entity"):
+                kind = _KINDS[type(param)]
+                page_url = kind.to_url(param[0])
+                remaining.discard(page_url)
+                if (entity := self.__parse(kind, param[0], html)) is None:
+                    self.__frontier.failed(page_url, "parse error")
+                    continue
+                self.__frontier.done(page_url)
+                entities[kind.name].append(entity)
+                if self.__manifest is not None:
+                    self.__manifest.mark_parsed([page_url])
+        finally:
+            for page_url in remaining:
+                self.__frontier.failed(page_url, "fetch error")
+        return {
+            kind.name: entities_as_dataframe(kind, entities[kind.name])
+            for kind in ENTITY_KINDS
+        }
+
+    @staticmethod
+    def __parse(kind: EntityKind, entity_id: str, html: str) -> Optional[Entity]:
+        try:
+            return Entity(kind, entity_id, html)
+        except Exception as e:
+            logging.warning(f"An error occurred while crawling Entity: {e}")
@@ -0,0 +1,113 @@
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Generator, Iterable, Optional, Union
+
+from tqdm import tqdm
+
+from scraping_netkeiba.client import (
+    BreederParam,
+    Client,
+    HorseParam,
+    HorsePedParam,
+    HorseResultParam,
+    JockeyParam,
+    OwnerParam,
+    RaceListParam,
+    RaceParam,
+    RaceSumParam,
+    TrainerParam,
+)
+
+Param = Union[
+    HorseParam,
+    HorsePedParam,
+    HorseResultParam,
+    RaceParam,
+    RaceListParam,
+    RaceSumParam,
+    JockeyParam,
+    TrainerParam,
+    OwnerParam,
+    BreederParam,
+]
+
+_FETCHES: dict[type, Callable[[Client, Param, bool], str]] = {
+    HorseParam: Client.horse,
+    HorsePedParam: Client.horse_ped,
+    HorseResultParam: Client.horse_result,
+    RaceParam: Client.race,
+    RaceListParam: Client.race_list,
+    RaceSumParam: Client.race_sum,
+    JockeyParam: Client.jockey,
+    TrainerParam: Client.trainer,
+    OwnerParam: Client.owner,
+    BreederParam: Client.breeder,
+}
+
+
+class Fetcher:
+    """
+    Client を複数スレッドから呼び出してHTMLを取得する
+
+    ネットワーク待ちが主な処理なのでプロセスではなくスレッドを使う。
+    全てのスレッドが同じ Client を使うため、リクエストの頻度は Client の
+    RateLimiter で全体として制御され、接続も使い回される。
+    取得に失敗したページのパラメータは failed で分かる。
+    """
+
+    def __init__(self, client: Client, max_workers: int = 4):
+        self.__client = client
+        self.__max_workers = max_workers
+        self.__failed: list[Param] = []
+
+    def failed(self) -> list[Param]:
+        """これまでに取得に失敗したページのパラメータ"""
+        return list(self.__failed)
+
+    def fetch(
+        self,
+        params: Iterable[Param],
+        update_cache: bool = False,
+        desc: Optional[str] = None,
+    ) -> Generator[tuple[Param, str], None, None]:
+        """パラメータに応じたページのHTMLを並行して取得し、取得できた順に返す
+
+        取得に失敗したページは警告を出して読み飛ばす。
+
+        Args:
+            params (Iterable[Param]): RaceParam などのパラメータ
+            update_cache (bool): キャッシュを更新するか
+            desc (Optional[str]): 進捗バーの説明
+
+        Yields:
+            tuple[Param, str]: パラメータとHTML文字列
+        """
+        total: Optional[int] = len(params) if hasattr(params, "__len__") else None
+        param_iter = iter(params)
+        in_flight: dict[Future, Param] = {}
+        with ThreadPoolExecutor(max_workers=self.__max_workers) as executor, tqdm(
+            total=total, desc=desc
+        ) as progress:
+
+            def submit() -> bool:
+                if (p := next(param_iter, None)) is None:
+                    return False
+                fetch = _FETCHES[type(p)]
+                in_flight[executor.submit(fetch, self.__client, p, update_cache)] = p
+                return True
+
+            while len(in_flight) < self.__max_workers * 2 and submit():
+                pass
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                ready: list[tuple[Param, str]] = []
+                for f in done:
+                    p = in_flight.pop(f)
+                    submit()
+                    progress.update()
+                    try:
+                        ready.append((p, f.result()))
+                    except Exception as e:
+                        logging.warning(f"An error occurred while fetching {p}: {e}")
+                        self.__failed.append(p)
+                yield from ready
@@ -0,0 +1,196 @@
+import enum
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+from scraping_netkeiba import url
+
+
+class State(enum.Enum):
+    Pending = "pending"
+    InFlight = "in_flight"
+    Done = "done"
+    Failed = "failed"
+
+
+class FrontierEntry(NamedTuple):
+    url: str
+    page_type: str
+    priority: int
+    attempts: int
+
+
+# 一覧ページから先に取得すると、後続のURLが早く見つかる
+DEFAULT_PRIORITIES: dict[str, int] = {
+    "race_list": 0,
+    "race_sum": 1,
+    "race": 2,
+    "horse": 3,
+    "horse_ped": 4,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    page_type TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS frontier_pending
+    ON frontier (state, priority, id);
+"""
+
+
+class Frontier:
+    """
+    クロール対象のURLをSQLiteに永続化するキュー
+
+    URLごとに未取得・取得中・取得済み・失敗の状態を持ち、同じURLは一度しか
+    登録されない。ページ種別はURLから判定し、取得は優先度の小さいページ種別から、
+    登録順に行う。
+    開き直すと取得中のまま終わったURLは未取得に戻るため、中断したところから
+    再開できる。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        priorities: Optional[dict[str, int]] = None,
+        max_attempts: int = 3,
+    ):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__lock = threading.Lock()
+        self.__priorities = priorities or DEFAULT_PRIORITIES
+        self.__max_attempts = max_attempts
+        with self.__lock, self.__connection:
+            self.__connection.executescript(_SCHEMA)
+            self.__connection.execute(
+                "UPDATE frontier SET state = ? WHERE state = ?",
+                (State.Pending.value, State.InFlight.value),
+            )
+
+    def close(self) -> None:
+        self.__connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, urls: Iterable[str], priority: Optional[int] = None) -> int:
+        """URLを未取得として登録する。登録済みのURLは無視する
+
+        Args:
+            urls (Iterable[str]): URL
+            priority (Optional[int]): 優先度。省略時はページ種別の既定値
+
+        Returns:
+            int: 新たに登録したURLの数
+        """
+        rows: list[tuple[str, str, int, str, float]] = []
+        now = time.time()
+        for v in urls:
+            if (route := url.route(v)) is None:
+                raise Exception(f"unknown page type: {v}")
+            rows.append(
+                (
+                    v,
+                    route.page_type,
+                    self.__priority(route.page_type) if priority is None else priority,
+                    State.Pending.value,
+                    now,
+                )
+            )
+        with self.__lock, self.__connection:
+            before = self.__connection.total_changes
+            self.__connection.executemany(
+                "INSERT OR IGNORE INTO frontier"
+                " (url, page_type, priority, state, updated_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            return self.__connection.total_changes - before
+
+    def __priority(self, page_type: str) -> int:
+        return self.__priorities.get(page_type, len(self.__priorities))
+
+    def seen(self, page_url: str) -> bool:
+        """URLが登録済みか"""
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT 1 FROM frontier WHERE url = ?", (page_url,)
+            ).fetchone()
+        return row is not None
+
+    def claim(self, n: int = 1) -> list[FrontierEntry]:
+        """未取得のURLを優先度順に n 件取り出し、取得中にする"""
+        with self.__lock, self.__connection:
+            rows = self.__connection.execute(
+                "SELECT url, page_type, priority, attempts FROM frontier"
+                " WHERE state = ? ORDER BY priority, id LIMIT ?",
+                (State.Pending.value, n),
+            ).fetchall()
+            self.__connection.executemany(
+                "UPDATE frontier SET state = ?, attempts = attempts + 1,"
+                " updated_at = ? WHERE url = ?",
+                ((State.InFlight.value, time.time(), r[0]) for r in rows),
+            )
+        return [FrontierEntry(u, t, p, a + 1) for u, t, p, a in rows]
+
+    def done(self, page_url: str) -> None:
+        """URLを取得済みにする"""
+        self.__set_state(page_url, State.Done)
+
+    def failed(self, page_url: str, error: str = "") -> None:
+        """URLの取得に失敗したことを記録する
+
+        max_attempts 回に達するまでは未取得に戻し、再び取得できるようにする。
+        """
+        with self.__lock, self.__connection:
+            self.__connection.execute(
+                "UPDATE frontier SET state = CASE WHEN attempts < ? THEN ? ELSE ? END,"
+                " error = ?, updated_at = ? WHERE url = ?",
+                (
+                    self.__max_attempts,
+                    State.Pending.value,
+                    State.Failed.value,
+                    error,
+                    time.time(),
+                    page_url,
+                ),
+            )
+
+    def __set_state(self, page_url: str, state: State) -> None:
+        with self.__lock, self.__connection:
+            self.__connection.execute(
+                "UPDATE frontier SET state = ?, updated_at = ? WHERE url = ?",
+                (state.value, time.time(), page_url),
+            )
+
+    def state(self, page_url: str) -> Optional[State]:
+        """URLの状態。未登録の場合は None"""
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT state FROM frontier WHERE url = ?", (page_url,)
+            ).fetchone()
+        return State(row[0]) if row else None
+
+    def counts(self) -> dict[State, int]:
+        """状態ごとのURLの数"""
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT state, COUNT(*) FROM frontier GROUP BY state"
+            ).fetchall()
+        counts = {s: 0 for s in State}
+        counts.update({State(s): c for s, c in rows})
+        return counts
+
+    def __len__(self) -> int:
+        return sum(self.counts().values())
@@ -6,13 +6,17 @@ from typing import Optional
 import pandas as pd
 from bs4 import BeautifulSoup, Tag
 
-from scraping_netkeiba import url
+from scraping_netkeiba import metrics, url
 
 
 class Horse:
+    # パース結果が変わる修正をしたら上げる。上がると増分パースでパースし直す
+    PARSER_VERSION = 1
+
     def __init__(self, horse_id: str, html: str):
         self.__horse_id: str = horse_id
-        self.__soup: BeautifulSoup = BeautifulSoup(html, "html.parser")
+        with metrics.timer("horse.soup"):
+            self.__soup: BeautifulSoup = BeautifulSoup(html, "html.parser")
         self.__horse_title: Tag = self.__soup.select_one("div.horse_title")
         self.__profile_table: Tag = self.__soup.select_one("table.db_prof_table")
         self.validate()
@@ -53,18 +57,19 @@ class Horse:
 
     def as_dataframe(self) -> pd.DataFrame:
         try:
-            return pd.DataFrame.from_dict(
-                {
-                    "horse_id": [self.__horse_id],
-                    "name": [self.name()],
-                    "eng_name": [self.eng_name()],
-                    "gender": [self.gender()],
-                    "birth_date": [self.birth_date()],
-                    "trainer_id": [self.trainer_id()],
-                    "owner_id": [self.owner_id()],
-                    "breeder_id": [self.breeder_id()],
-                }
-            )
+            with metrics.timer("horse.extract"):
+                return pd.DataFrame.from_dict(
+                    {
+                        "horse_id": [self.__horse_id],
+                        "name": [self.name()],
+                        "eng_name": [self.eng_name()],
+                        "gender": [self.gender()],
+                        "birth_date": [self.birth_date()],
+                        "trainer_id": [self.trainer_id()],
+                        "owner_id": [self.owner_id()],
+                        "breeder_id": [self.breeder_id()],
+                    }
+                )
         except Exception as e:
             logging.warning(f"An error occurred while scraping Horse: {e}")
 
@@ -1,9 +1,11 @@
 import enum
-from typing import Optional
+import logging
+from typing import Iterable, Optional
 
+import pandas as pd
 from bs4 import BeautifulSoup, Tag
 
-from scraping_netkeiba import url
+from scraping_netkeiba import metrics, url
 
 
 class Relation(enum.Enum):
@@ -11,38 +13,108 @@ class Relation(enum.Enum):
     Dam = 1
 
 
+def ped_index(relationships: list[Relation]) -> int:
+    """血統表上の祖先の位置を返す
+
+    1代目の父、母を0、1とし、以降は世代順・父系優先で番号を振る。
+    ある位置iの祖先の父はi * 2 + 2、母はi * 2 + 3になる。
+
+    Args:
+        relationships (list[Relation]): 対象馬から祖先までの続柄
+
+    Returns:
+        int: 位置
+    """
+    depth = len(relationships)
+    return (
+        2**depth
+        - 2
+        + sum(v.value << (depth - i) for i, v in enumerate(relationships, 1))
+    )
+
+
+def ped_relationships(generations: int = 5) -> list[list[Relation]]:
+    """血統表の全ての位置の続柄を位置順に返す
+
+    Args:
+        generations (int): 世代数
+
+    Returns:
+        list[list[Relation]]: 続柄
+    """
+    relationships: list[list[Relation]] = [[]]
+    result: list[list[Relation]] = []
+    for _ in range(generations):
+        relationships = [r + [v] for r in relationships for v in Relation]
+        result.extend(relationships)
+    return result
+
+
+def ped_column_names(generations: int = 5) -> list[str]:
+    """血統表の全ての位置の列名を位置順に返す
+
+    Args:
+        generations (int): 世代数
+
+    Returns:
+        list[str]: sire_dam のような列名
+    """
+    return ["_".join(v.name.lower() for v in r) for r in ped_relationships(generations)]
+
+
 class HorsePed:
+    # パース結果が変わる修正をしたら上げる。上がると増分パースでパースし直す
+    PARSER_VERSION = 1
+
     def __init__(self, horse_id: str, html: str):
         self.__horse_id = horse_id
-        self.__soup = BeautifulSoup(html, "html.parser")
+        with metrics.timer("horse_ped.soup"):
+            self.__soup = BeautifulSoup(html, "html.parser")
         self.__blood_table: Tag = self.__soup.select_one("table.blood_table")
         self.__peds: list[list[Tag]] = [
             [td for td in tr.select("td")] for tr in self.__blood_table.select("tr")
         ]
+        self.__ped_horse_ids: Optional[list[Optional[str]]] = None
         self.validate()
 
-    def __get_ped(self, relationships: list[Relation]) -> Tag:
-        if 2 ** len(relationships) > len(self.__peds):
-            raise Exception(f"Invalid relationship depth")
-        tr_index = sum(
-            int(len(self.__peds) / 2**i) * v.value
-            for i, v in enumerate(relationships, 1)
-        )
-        td_index = (
-            len(relationships)
-            - max([i for i, v in enumerate(relationships) if v == Relation.Dam] or [0])
-            - 1
-        )
-        return self.__peds[tr_index][td_index]
-
     def horse_id(self) -> str:
         return self.__horse_id
 
+    def generations(self) -> int:
+        """血統表の世代数"""
+        return len(self.__peds).bit_length() - 1
+
+    def ped_horse_ids(self) -> list[Optional[str]]:
+        """血統表の全ての祖先の馬IDを位置順に返す
+
+        位置は ped_index と同じ。馬IDが取得できない祖先は None になる。
+        """
+        if self.__ped_horse_ids is None:
+            generations: int = self.generations()
+            horse_ids: list[Optional[str]] = [None] * (2 ** (generations + 1) - 2)
+            for tr_index, tds in enumerate(self.__peds):
+                for td_index, td in enumerate(tds, generations - len(tds) + 1):
+                    position: int = (
+                        2**td_index - 2 + (tr_index >> (generations - td_index))
+                    )
+                    horse_ids[position] = self.__horse_id_of(td)
+            self.__ped_horse_ids = horse_ids
+        return self.__ped_horse_ids
+
+    @staticmethod
+    def __horse_id_of(td: Tag) -> Optional[str]:
+        for a in td.find_all("a", href=True):
+            if m := url.horse_pattern().match(a["href"]):
+                return m.group(1)
+        return None
+
     def ped_horse_id(self, relationships: list[Relation]) -> str:
-        t: Tag = self.__get_ped(relationships).find(
-            "a", href=url.horse_ped_pattern().match
-        )
-        return url.horse_ped_pattern().match(t.get("href")).group(1)
+        if 2 ** len(relationships) > len(self.__peds):
+            raise Exception(f"Invalid relationship depth")
+        horse_id: Optional[str] = self.ped_horse_ids()[ped_index(relationships)]
+        if horse_id is None:
+            raise Exception(f"Horse id is not found: {relationships}")
+        return horse_id
 
     def sire(self) -> str:
         return self.ped_horse_id([Relation.Sire])
@@ -86,8 +158,15 @@ class HorsePed:
     def dam_dam_dam(self) -> str:
         return self.ped_horse_id([Relation.Dam, Relation.Dam, Relation.Dam])
 
-    def as_dataframe(self) -> str:
-        pass
+    def as_dataframe(self) -> pd.DataFrame:
+        try:
+            with metrics.timer("horse_ped.extract"):
+                return pd.DataFrame(
+                    [[self.__horse_id] + self.ped_horse_ids()],
+                    columns=["horse_id"] + ped_column_names(self.generations()),
+                )
+        except Exception as e:
+            logging.warning(f"An error occurred while scraping HorsePed: {e}")
 
     def validate(self):
         ped: Optional[Tag] = self.__soup.find(
@@ -102,3 +181,28 @@ class HorsePed:
             raise Exception(
                 f'Invalid horse id: expected "{self.__horse_id}", got "{horse_id}"'
             )
+
+
+def peds_as_dataframe(horse_peds: Iterable[HorsePed]) -> pd.DataFrame:
+    """複数の競走馬の血統表をまとめて1つのDataFrameにする
+
+    列は最も世代数の多い血統表に合わせ、世代数の少ない血統表の足りない列は None になる。
+
+    Args:
+        horse_peds (Iterable[HorsePed]): 血統ページ
+
+    Returns:
+        pd.DataFrame: 1行1頭のDataFrame
+    """
+    # 血統表のHTMLは保持せず、馬IDだけを集めてから列の数を決める
+    peds: list[tuple[str, int, list[Optional[str]]]] = [
+        (p.horse_id(), p.generations(), p.ped_horse_ids()) for p in horse_peds
+    ]
+    generations: int = max((v for _, v, _ in peds), default=5)
+    columns: list[str] = ped_column_names(generations)
+    # 位置は世代順なので、世代数の少ない血統表は先頭の列に収まり、残りは None になる
+    rows: list[list[Optional[str]]] = [
+        [horse_id] + ids + [None] * (len(columns) - len(ids))
+        for horse_id, _, ids in peds
+    ]
+    return pd.DataFrame(rows, columns=["horse_id"] + columns)
@@ -0,0 +1,333 @@
+import html as html_lib
+import logging
+import re
+from datetime import date, datetime
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from scraping_netkeiba import metrics, url
+
+ACTIVE_A_TAG_PATTERN = re.compile(r"<a\s[^>]*\bclass=[\"']?active\b[^>]*>", re.I)
+HORSE_RESULT_HREF_PATTERN = re.compile(
+    r"""href=["']?""" + url.horse_result_pattern().pattern, re.I
+)
+TR_TAG_PATTERN = re.compile(r"<tr\b", re.I)
+TH_PATTERN = re.compile(r"<th\b[^>]*>(.*?)</th>", re.I | re.S)
+TD_PATTERN = re.compile(r"<td\b[^>]*>(.*?)</td>", re.I | re.S)
+TAG_PATTERN = re.compile(r"<[^>]*>")
+HREF_PATTERN = re.compile(r"""href=["']?([^"'\s>]+)""", re.I)
+DISTANCE_PATTERN = re.compile(r"^(\D*)(\d+)$")
+HORSE_WEIGHT_PATTERN = re.compile(r"^(\d+)\((.*)\)$")
+
+COLUMNS = [
+    "horse_id",
+    "race_date",
+    "race_id",
+    "weather",
+    "race_number",
+    "race_name",
+    "horse_count",
+    "bracket_number",
+    "horse_number",
+    "win_odds",
+    "pop_order",
+    "arrival_order",
+    "jockey_id",
+    "load_weight",
+    "track_surface",
+    "track_distance",
+    "track_condition",
+    "time",
+    "margin",
+    "corner_orders",
+    "pace",
+    "final_push_time",
+    "horse_weight",
+    "horse_weight_delta",
+    "winner_horse_id",
+    "prize",
+]
+
+
+def _text(cell: str) -> str:
+    return html_lib.unescape(TAG_PATTERN.sub("", cell)).strip()
+
+
+def _href_id(cell: str, pattern: re.Pattern) -> Optional[str]:
+    if m := HREF_PATTERN.search(cell):
+        if m2 := pattern.match(m.group(1)):
+            return m2.group(1)
+    return None
+
+
+def _to_float(val: str) -> Optional[float]:
+    try:
+        return float(val)
+    except ValueError:
+        return None
+
+
+def _to_int(val: str) -> Optional[int]:
+    try:
+        return int(val)
+    except ValueError:
+        return None
+
+
+def _to_time(val: str) -> Optional[float]:
+    if ":" not in val:
+        return _to_float(val)
+    minutes, seconds = val.split(":")
+    return float(minutes) * 60 + float(seconds)
+
+
+def _to_prize(val: str) -> int:
+    # Race.prize と同じ単位にする
+    val = val.replace(",", "")
+    return 0 if val == "" else int(float(val) * 1000000)
+
+
+class HorseResult:
+    """
+    競走馬の戦績ページ
+
+    戦績の表はHTMLを正規表現で列ごとに切り出し、BeautifulSoup は使わない。
+    各メソッドは表の1行（1レース）ごとの値を、新しいレースから順に返す。
+
+    テストのページは競走馬ページの戦績の表から作ったもので、実際の
+    /horse/result/ のページではまだ確かめていない。
+    """
+
+    # パース結果が変わる修正をしたら上げる。上がると増分パースでパースし直す
+    PARSER_VERSION = 1
+
+    def __init__(self, horse_id: str, html: str):
+        self.__horse_id = horse_id
+        self.__html = html
+        self.validate()
+        with metrics.timer("horse_result.table"):
+            self.__cells: dict[str, list[str]] = self.__parse_table()
+
+    def __parse_table(self) -> dict[str, list[str]]:
+        start = self.__html.find("db_h_race_results")
+        if start < 0:
+            raise Exception("Horse result table is not found")
+        end = self.__html.find("</table>", start)
+        rows: list[str] = TR_TAG_PATTERN.split(self.__html[start:end])
+        th_names: list[str] = [_text(v) for v in TH_PATTERN.findall(rows[1])]
+        cells: dict[str, list[str]] = {v: [] for v in th_names}
+        for row in rows[2:]:
+            tds: list[str] = TD_PATTERN.findall(row)
+            if len(tds) != len(th_names):
+                continue
+            for name, td in zip(th_names, tds):
+                cells[name].append(td)
+        return cells
+
+    def __column(self, name: str) -> list[str]:
+        if name not in self.__cells:
+            raise Exception(f'Column "{name}" is not found')
+        return self.__cells[name]
+
+    def __texts(self, name: str) -> list[str]:
+        return [_text(v) for v in self.__column(name)]
+
+    def horse_id(self) -> str:
+        return self.__horse_id
+
+    def race_count(self) -> int:
+        """出走数"""
+        return len(self.__column("日付"))
+
+    def race_date(self) -> list[date]:
+        """レース日"""
+        return [datetime.strptime(v, "%Y/%m/%d").date() for v in self.__texts("日付")]
+
+    def race_id(self) -> list[Optional[str]]:
+        """レースID。レース結果ページへのリンクが無い場合は None"""
+        return [_href_id(v, url.race_patten()) for v in self.__column("レース名")]
+
+    def weather(self) -> list[str]:
+        """天気"""
+        return self.__texts("天気")
+
+    def race_number(self) -> list[str]:
+        """レース番号"""
+        return self.__texts("R")
+
+    def race_name(self) -> list[str]:
+        """レース名"""
+        return self.__texts("レース名")
+
+    def horse_count(self) -> list[Optional[int]]:
+        """頭数"""
+        return [_to_int(v) for v in self.__texts("頭数")]
+
+    def bracket_number(self) -> list[str]:
+        """枠番"""
+        return self.__texts("枠番")
+
+    def horse_number(self) -> list[str]:
+        """馬番"""
+        return self.__texts("馬番")
+
+    def win_odds(self) -> list[Optional[float]]:
+        """単勝オッズ"""
+        return [_to_float(v) for v in self.__texts("オッズ")]
+
+    def pop_order(self) -> list[str]:
+        """人気順"""
+        return self.__texts("人気")
+
+    def arrival_order(self) -> list[str]:
+        """着順"""
+        return self.__texts("着順")
+
+    def jockey_id(self) -> list[Optional[str]]:
+        """騎手ID"""
+        return [
+            _href_id(v, url.recent_jockey_result_pattern()) for v in self.__column("騎手")
+        ]
+
+    def load_weight(self) -> list[Optional[float]]:
+        """斤量"""
+        return [_to_float(v) for v in self.__texts("斤量")]
+
+    def track_surface(self) -> list[str]:
+        """芝・ダートなど"""
+        return [
+            m.group(1) if (m := DISTANCE_PATTERN.match(v)) else v
+            for v in self.__texts("距離")
+        ]
+
+    def track_distance(self) -> list[Optional[int]]:
+        """距離"""
+        return [
+            int(m.group(2)) if (m := DISTANCE_PATTERN.match(v)) else None
+            for v in self.__texts("距離")
+        ]
+
+    def track_condition(self) -> list[str]:
+        """馬場状態"""
+        return self.__texts("馬場")
+
+    def total_time(self) -> list[Optional[float]]:
+        """総合タイム"""
+        return [_to_time(v) for v in self.__texts("タイム")]
+
+    def margin(self) -> list[Optional[float]]:
+        """着差（秒）"""
+        return [_to_float(v) for v in self.__texts("着差")]
+
+    def corner_orders(self) -> list[str]:
+        """通過順"""
+        return self.__texts("通過")
+
+    def pace(self) -> list[str]:
+        """ペース"""
+        return self.__texts("ペース")
+
+    def final_push_time(self) -> list[Optional[float]]:
+        """上りタイム"""
+        return [_to_float(v) for v in self.__texts("上り")]
+
+    def horse_weight(self) -> list[Optional[float]]:
+        """馬体重"""
+        return [
+            float(m.group(1)) if (m := HORSE_WEIGHT_PATTERN.match(v)) else None
+            for v in self.__texts("馬体重")
+        ]
+
+    def horse_weight_delta(self) -> list[Optional[float]]:
+        """馬体重変動"""
+        return [
+            _to_float(m.group(2)) if (m := HORSE_WEIGHT_PATTERN.match(v)) else None
+            for v in self.__texts("馬体重")
+        ]
+
+    def winner_horse_id(self) -> list[Optional[str]]:
+        """勝ち馬の馬ID。1着の場合は2着馬"""
+        return [_href_id(v, url.horse_pattern()) for v in self.__column("勝ち馬(2着馬)")]
+
+    def prize(self) -> list[int]:
+        """賞金"""
+        return [_to_prize(v) for v in self.__texts("賞金")]
+
+    def as_columns(self) -> dict[str, list]:
+        """列名から値のリストへの辞書"""
+        with metrics.timer("horse_result.extract"):
+            return self.__as_columns()
+
+    def __as_columns(self) -> dict[str, list]:
+        return {
+            "horse_id": [self.__horse_id] * self.race_count(),
+            "race_date": self.race_date(),
+            "race_id": self.race_id(),
+            "weather": self.weather(),
+            "race_number": self.race_number(),
+            "race_name": self.race_name(),
+            "horse_count": self.horse_count(),
+            "bracket_number": self.bracket_number(),
+            "horse_number": self.horse_number(),
+            "win_odds": self.win_odds(),
+            "pop_order": self.pop_order(),
+            "arrival_order": self.arrival_order(),
+            "jockey_id": self.jockey_id(),
+            "load_weight": self.load_weight(),
+            "track_surface": self.track_surface(),
+            "track_distance": self.track_distance(),
+            "track_condition": self.track_condition(),
+            "time": self.total_time(),
+            "margin": self.margin(),
+            "corner_orders": self.corner_orders(),
+            "pace": self.pace(),
+            "final_push_time": self.final_push_time(),
+            "horse_weight": self.horse_weight(),
+            "horse_weight_delta": self.horse_weight_delta(),
+            "winner_horse_id": self.winner_horse_id(),
+            "prize": self.prize(),
+        }
+
+    def as_dataframe(self) -> pd.DataFrame:
+        try:
+            return pd.DataFrame.from_dict(self.as_columns())
+        except Exception as e:
+            logging.warning(f"An error occurred while scraping HorseResult: {e}")
+
+    def validate(self):
+        horse_id: Optional[str] = None
+        for a_tag in ACTIVE_A_TAG_PATTERN.findall(self.__html):
+            if m := HORSE_RESULT_HREF_PATTERN.search(a_tag):
+                horse_id = m.group(1)
+                break
+        if horse_id is None:
+            raise Exception("Active horse result url is not found")
+        if self.__horse_id != horse_id:
+            raise Exception(
+                f'Invalid horse id: expected "{self.__horse_id}", got "{horse_id}"'
+            )
+
+
+def results_as_dataframe(horse_results: Iterable[HorseResult]) -> pd.DataFrame:
+    """複数の競走馬の戦績をまとめて1つのDataFrameにする
+
+    列ごとにリストを繋げてから DataFrame を1度だけ作るため、
+    1頭ずつ DataFrame にして結合するより速い。
+
+    Args:
+        horse_results (Iterable[HorseResult]): 戦績ページ
+
+    Returns:
+        pd.DataFrame: 1行1出走のDataFrame
+    """
+    columns: dict[str, list] = {v: [] for v in COLUMNS}
+    for horse_result in horse_results:
+        try:
+            values = horse_result.as_columns()
+        except Exception as e:
+            logging.warning(f"An error occurred while scraping HorseResult: {e}")
+            continue
+        for name, column in columns.items():
+            column.extend(values[name])
+    return pd.DataFrame.from_dict(columns)
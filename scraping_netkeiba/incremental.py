@@ -0,0 +1,232 @@
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+import pandas as pd
+
+from scraping_netkeiba.client import ICache
+from scraping_netkeiba.parse_job import ParseJob, parallel_parse
+from scraping_netkeiba.util import chunked, content_hash, parallel_imap
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parsed (
+    job TEXT NOT NULL,
+    id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    parser_version INTEGER NOT NULL,
+    mtime_ns INTEGER,
+    size INTEGER,
+    PRIMARY KEY (job, id)
+);
+"""
+
+# 以前の版で作った記録には更新日時とバイト数の列が無い
+_MIGRATIONS = [
+    ("mtime_ns", "ALTER TABLE parsed ADD COLUMN mtime_ns INTEGER"),
+    ("size", "ALTER TABLE parsed ADD COLUMN size INTEGER"),
+]
+
+
+class PageState(NamedTuple):
+    content_hash: str
+    parser_version: int
+    # キャッシュのファイルの (更新日時のナノ秒, バイト数)。分からない場合は None
+    stat: Optional[tuple[int, int]]
+
+
+class ParseState:
+    """
+    ジョブごとに、パースしたページの内容のハッシュ値・パーサーのバージョン・
+    キャッシュのファイルの更新日時とバイト数をSQLiteに記録する
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__lock = threading.Lock()
+        with self.__lock, self.__connection:
+            self.__connection.executescript(_SCHEMA)
+            columns = {
+                v[1] for v in self.__connection.execute("PRAGMA table_info(parsed)")
+            }
+            for column, statement in _MIGRATIONS:
+                if column not in columns:
+                    self.__connection.execute(statement)
+
+    def close(self) -> None:
+        self.__connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get(self, job: str) -> dict[str, PageState]:
+        """IDごとの記録"""
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT id, content_hash, parser_version, mtime_ns, size"
+                " FROM parsed WHERE job = ?",
+                (job,),
+            )
+            return {
+                v: PageState(h, version, None if mtime_ns is None else (mtime_ns, size))
+                for v, h, version, mtime_ns, size in rows
+            }
+
+    def set(self, job: str, entries: Iterable[tuple[str, PageState]]) -> None:
+        """(ID, 記録) を記録する"""
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                "INSERT OR REPLACE INTO parsed"
+                " (job, id, content_hash, parser_version, mtime_ns, size)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (job, v, state.content_hash, state.parser_version, *stat)
+                    for v, state in entries
+                    for stat in [state.stat or (None, None)]
+                ),
+            )
+
+
+class IncrementalResult(NamedTuple):
+    # パースしたページの数
+    parsed: int
+    # 前回から変わっていないためパースしなかったページの数
+    skipped: int
+    # キャッシュから読めなかったページの数
+    missing: int
+
+
+_worker_cache: Optional[ICache] = None
+
+
+def _init_worker(cache: ICache):
+    global _worker_cache
+    _worker_cache = cache
+
+
+_Hashed = tuple[str, Optional[str], Optional[tuple[int, int]]]
+
+
+def _hash_pages(
+    args: tuple[ParseJob, list[tuple[str, Optional[PageState]]]]
+) -> list[_Hashed]:
+    # 前回とファイルの更新日時とバイト数が同じなら、読まずに前回のハッシュ値を使う
+    job, pages = args
+    hashes: list[_Hashed] = []
+    for v, previous in pages:
+        try:
+            page_url = job.to_url(v)
+            stat = _worker_cache.stat(page_url)
+            if stat is not None and previous is not None and previous.stat == stat:
+                hashes.append((v, previous.content_hash, stat))
+            else:
+                hashes.append((v, content_hash(_worker_cache.read(page_url)), stat))
+        except Exception as e:
+            logging.warning(f"An error occurred while reading {job.name} {v}: {e}")
+            hashes.append((v, None, None))
+    return hashes
+
+
+def incremental_parse(
+    job: ParseJob,
+    ids: Iterable[str],
+    cache: ICache,
+    state_path: str,
+    output_path: str,
+    chunksize: int = 100,
+    max_workers: Optional[int] = None,
+) -> IncrementalResult:
+    """前回から変わったページだけをパースし、出力の表に反映する
+
+    キャッシュのHTMLのハッシュ値とジョブのパーサーのバージョンを前回の記録と
+    比べ、新しいページ・内容が変わったページ・パーサーのバージョンが上がった
+    ページだけを parallel_parse でパースする。キャッシュのファイルの更新日時と
+    バイト数が前回と同じページは、読まずに前回のハッシュ値を使う。出力の表からはパースし直した
+    IDの行を除き、新しい結果を加えて書き戻す。
+    パースに失敗したページも記録するため、内容かバージョンが変わるまでは
+    パースし直さない。
+
+    Args:
+        job (ParseJob): RACE_RESULT などの処理
+        ids (Iterable[str]): レースIDや馬ID
+        cache (ICache): HTMLのキャッシュ。pickle できる必要がある
+        state_path (str): ハッシュ値などを記録するSQLiteのファイル
+        output_path (str): 出力の表。DataFrame の pickle
+        chunksize (int): 1つのプロセスにまとめて渡す件数
+        max_workers (Optional[int]): プロセス数
+
+    Returns:
+        IncrementalResult: 件数
+    """
+    output = Path(output_path)
+    with ParseState(state_path) as state:
+        # 出力が無い場合は全てパースし直す
+        previous = state.get(job.name) if output.exists() else {}
+        hashed: dict[str, tuple[Optional[str], Optional[tuple[int, int]]]] = {
+            v: (h, stat)
+            for chunk in parallel_imap(
+                _hash_pages,
+                (
+                    (job, [(v, previous.get(v)) for v in chunk])
+                    for chunk in chunked(ids, chunksize)
+                ),
+                desc=f"{job.name} (hash)",
+                max_workers=max_workers,
+                initializer=_init_worker,
+                initargs=(cache,),
+            )
+            for v, h, stat in chunk
+        }
+        changed: list[str] = []
+        # 内容は同じで更新日時などだけ変わったページは、記録だけ更新する
+        restat: list[str] = []
+        for v, (h, stat) in hashed.items():
+            if h is None:
+                continue
+            p = previous.get(v)
+            if p is None or (p.content_hash, p.parser_version) != (
+                h,
+                job.parser_version,
+            ):
+                changed.append(v)
+            elif p.stat != stat:
+                restat.append(v)
+        missing = sum(h is None for h, _ in hashed.values())
+
+        if changed:
+            parsed = parallel_parse(
+                job, changed, cache, chunksize=chunksize, max_workers=max_workers
+            )
+            if output.exists():
+                current: pd.DataFrame = pd.read_pickle(output)
+                # 前回1件もパースできなかった場合は列の無い表になっている
+                if job.id_column in current.columns:
+                    current = current[~current[job.id_column].isin(changed)]
+                    parsed = pd.concat([current, parsed], ignore_index=True)
+            output.parent.mkdir(parents=True, exist_ok=True)
+            # 書き込み途中で止まっても前回の出力が壊れないようにする
+            tmp_path = output.with_name(f"{output.name}.tmp")
+            parsed.to_pickle(tmp_path)
+            os.replace(tmp_path, output)
+            # 出力を書き終えてから記録する。途中で止まった場合は次回パースし直す
+            state.set(
+                job.name,
+                (
+                    (v, PageState(hashed[v][0], job.parser_version, hashed[v][1]))
+                    for v in changed
+                ),
+            )
+        if restat:
+            state.set(
+                job.name,
+                ((v, previous[v]._replace(stat=hashed[v][1])) for v in restat),
+            )
+        return IncrementalResult(
+            len(changed), len(hashed) - len(changed) - missing, missing
+        )
@@ -0,0 +1,293 @@
+import locale
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, NamedTuple, Optional
+
+import pandas as pd
+
+from scraping_netkeiba import url
+from scraping_netkeiba.client import Cache, ICache
+
+# Cache は write_text でロケールの文字コードで書き込む
+FILE_ENCODING = locale.getpreferredencoding(False)
+
+
+def page_type(page_url: str) -> tuple[Optional[str], Optional[str]]:
+    """URLのページ種別とIDを返す。該当しない場合は (None, None)
+
+    race_sum のようにIDが複数ある場合は / で繋げる。
+    """
+    if r := url.route(page_url):
+        return r.page_type, "/".join(r.ids)
+    return None, None
+
+
+# 表のIDの列と、そのIDのページ種別
+REFERENCE_COLUMNS: dict[str, str] = {
+    "race_id": "race",
+    "horse_id": "horse",
+    "jockey_id": "recent_jockey_result",
+    "trainer_id": "trainer",
+    "owner_id": "owner",
+    "breeder_id": "breeder",
+}
+
+
+class ManifestEntry(NamedTuple):
+    url: str
+    page_type: Optional[str]
+    page_id: Optional[str]
+    # キャッシュのファイルのバイト数
+    size: int
+    fetched_at: float
+    # キャッシュのファイルの文字コード
+    encoding: str
+    parsed_at: Optional[float]
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    page_type TEXT,
+    page_id TEXT,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    encoding TEXT NOT NULL,
+    parsed_at REAL
+);
+CREATE INDEX IF NOT EXISTS pages_id ON pages (page_type, page_id);
+CREATE TABLE IF NOT EXISTS refs (
+    src_url TEXT NOT NULL,
+    page_type TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    PRIMARY KEY (src_url, page_type, page_id)
+);
+CREATE INDEX IF NOT EXISTS refs_id ON refs (page_type, page_id);
+"""
+
+
+class Manifest:
+    """
+    キャッシュ済みのページの一覧
+
+    ページごとに種別・ID・サイズ・取得日時・文字コード・パース日時を持つ。
+    ページから参照されている他のページのIDも記録でき、キャッシュに無い
+    参照先を調べられる。
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__lock = threading.Lock()
+        with self.__lock, self.__connection:
+            self.__connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.__connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def record(
+        self,
+        page_url: str,
+        size: int,
+        fetched_at: Optional[float] = None,
+        encoding: str = FILE_ENCODING,
+    ) -> None:
+        """ページを記録する
+
+        記録済みの場合は上書きする。サイズか取得日時が変わった場合は
+        パース日時を消す。
+        """
+        self.record_all([(page_url, size, fetched_at or time.time(), encoding)])
+
+    def record_all(self, entries: Iterable[tuple[str, int, float, str]]) -> None:
+        """(URL, サイズ, 取得日時, 文字コード) をまとめて記録する
+
+        変わっていないページのパース日時は残す。
+        """
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                "INSERT INTO pages"
+                " (url, page_type, page_id, size, fetched_at, encoding, parsed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, NULL)"
+                " ON CONFLICT (url) DO UPDATE SET"
+                " parsed_at = CASE WHEN size = excluded.size"
+                " AND fetched_at = excluded.fetched_at THEN parsed_at END,"
+                " page_type = excluded.page_type, page_id = excluded.page_id,"
+                " size = excluded.size, fetched_at = excluded.fetched_at,"
+                " encoding = excluded.encoding",
+                ((v, *page_type(v), s, t, e) for v, s, t, e in entries),
+            )
+
+    def mark_parsed(self, urls: Iterable[str], parsed_at: Optional[float] = None):
+        """ページをパース済みにする"""
+        parsed_at = parsed_at or time.time()
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                "UPDATE pages SET parsed_at = ? WHERE url = ?",
+                ((parsed_at, v) for v in urls),
+            )
+
+    def record_parsed(
+        self,
+        to_url: Callable[[str], str],
+        id_column: str,
+        df: pd.DataFrame,
+        parsed_at: Optional[float] = None,
+    ) -> None:
+        """パースした結果の表から、パース済みのページと参照先を記録する
+
+        id_column のIDのページをパース済みにし、horse_id や jockey_id などの
+        REFERENCE_COLUMNS の列のIDを、その行のページからの参照として記録する。
+
+        Args:
+            to_url (Callable[[str], str]): IDからページのURLを作る関数
+            id_column (str): パースしたページのIDの列
+            df (pd.DataFrame): パースした結果
+            parsed_at (Optional[float]): パース日時。省略時は現在時刻
+        """
+        if df is None or df.empty or id_column not in df.columns:
+            return
+        self.mark_parsed((to_url(v) for v in df[id_column].unique()), parsed_at)
+        columns = [c for c in REFERENCE_COLUMNS if c != id_column and c in df.columns]
+        if not columns:
+            return
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                "INSERT OR IGNORE INTO refs (src_url, page_type, page_id)"
+                " VALUES (?, ?, ?)",
+                (
+                    (to_url(src_id), REFERENCE_COLUMNS[column], ref_id)
+                    for column in columns
+                    for src_id, ref_id in df[[id_column, column]]
+                    .dropna()
+                    .drop_duplicates()
+                    .itertuples(index=False)
+                ),
+            )
+
+    def add_references(self, src_url: str, page_type: str, ids: Iterable[str]):
+        """src_url のページが参照している page_type のページのIDを記録する
+
+        例えばレース結果ページに出走している馬の馬IDを horse として記録する。
+        """
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                "INSERT OR IGNORE INTO refs (src_url, page_type, page_id)"
+                " VALUES (?, ?, ?)",
+                ((src_url, page_type, v) for v in ids),
+            )
+
+    def entry(self, page_url: str) -> Optional[ManifestEntry]:
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT url, page_type, page_id, size, fetched_at, encoding, parsed_at"
+                " FROM pages WHERE url = ?",
+                (page_url,),
+            ).fetchone()
+        return ManifestEntry(*row) if row else None
+
+    def ids(
+        self,
+        page_type: str,
+        id_prefix: str = "",
+        parsed: Optional[bool] = None,
+    ) -> list[str]:
+        """条件に合うページのIDをID順に返す
+
+        Args:
+            page_type (str): race や horse などのページ種別
+            id_prefix (str): IDの前方一致。レースIDなら "2015" で2015年のレース
+            parsed (Optional[bool]): パース済みか。None の場合は問わない
+
+        Returns:
+            list[str]: ID
+        """
+        query = "SELECT page_id FROM pages WHERE page_type = ? AND page_id >= ?"
+        args: list = [page_type, id_prefix]
+        if id_prefix:
+            # 前方一致を範囲検索にして索引を使う
+            query += " AND page_id < ?"
+            args.append(id_prefix[:-1] + chr(ord(id_prefix[-1]) + 1))
+        if parsed is not None:
+            query += (
+                " AND parsed_at IS NOT NULL" if parsed else " AND parsed_at IS NULL"
+            )
+        with self.__lock:
+            rows = self.__connection.execute(query + " ORDER BY page_id", args)
+            return [r[0] for r in rows]
+
+    def missing_references(self, page_type: str) -> list[str]:
+        """参照されているがキャッシュに無い page_type のページのIDを返す"""
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT DISTINCT r.page_id FROM refs r"
+                " LEFT JOIN pages p"
+                " ON p.page_type = r.page_type AND p.page_id = r.page_id"
+                " WHERE r.page_type = ? AND p.url IS NULL ORDER BY r.page_id",
+                (page_type,),
+            )
+            return [r[0] for r in rows]
+
+    def counts(self) -> dict[Optional[str], int]:
+        """ページ種別ごとのページ数"""
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT page_type, COUNT(*) FROM pages GROUP BY page_type"
+            )
+            return dict(rows.fetchall())
+
+    def rebuild(self, cache_dir: str) -> None:
+        """キャッシュのディレクトリを一度だけ走査して一覧を作り直す
+
+        取得日時にはファイルの更新日時を使う。サイズと更新日時が変わって
+        いないページはパース済みのまま残る。
+        """
+        cache = Cache(cache_dir)
+        entries: list[tuple[str, int, float, str]] = []
+        for page_url in cache.urls():
+            if (stat := cache.stat(page_url)) is None:
+                continue
+            mtime_ns, size = stat
+            entries.append((page_url, size, mtime_ns / 1e9, FILE_ENCODING))
+        self.record_all(entries)
+
+
+class ManifestCache(ICache):
+    """
+    書き込みのたびに Manifest を更新するキャッシュ
+
+    サイズと取得日時は rebuild と同じく、書き込んだファイルのバイト数と
+    更新日時を記録する。
+    """
+
+    def __init__(self, cache: ICache, manifest: Manifest):
+        self.__cache = cache
+        self.__manifest = manifest
+
+    def manifest(self) -> Manifest:
+        return self.__manifest
+
+    def exists(self, url: str) -> bool:
+        return self.__cache.exists(url)
+
+    def write(self, url: str, html: str) -> None:
+        self.__cache.write(url, html)
+        # ファイルの情報が分からないキャッシュでは UTF-8 のバイト数と現在時刻を使う
+        if (stat := self.__cache.stat(url)) is None:
+            self.__manifest.record(url, len(html.encode()))
+        else:
+            self.__manifest.record(url, stat[1], stat[0] / 1e9)
+
+    def read(self, url: str) -> str:
+        return self.__cache.read(url)
+
+    def stat(self, url: str) -> Optional[tuple[int, int]]:
+        return self.__cache.stat(url)
@@ -0,0 +1,251 @@
+"""
+処理の段階ごとの時間・バイト数・回数の計測
+
+既定では無効で、enable() を呼んだ場合だけ記録する。無効な間の timer() と
+count() は何もしないため、計測のためのコードを残したままでよい。
+
+    metrics.enable()
+    ... # 取得やパース
+    print(metrics.format_summary())
+    metrics.write_prometheus("metrics.prom")
+
+記録はプロセスごとに持つ。util.parallel_imap は各プロセスの記録を
+親プロセスにまとめる。
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import pandas as pd
+
+
+class StageStat(NamedTuple):
+    # 回数
+    count: int = 0
+    # 合計時間（秒）
+    seconds: float = 0.0
+    # 1回の最大時間（秒）
+    max_seconds: float = 0.0
+    # 合計バイト数
+    bytes: int = 0
+
+    def add(self, other: "StageStat") -> "StageStat":
+        return StageStat(
+            self.count + other.count,
+            self.seconds + other.seconds,
+            max(self.max_seconds, other.max_seconds),
+            self.bytes + other.bytes,
+        )
+
+
+_lock = threading.Lock()
+_stats: Optional[dict[str, StageStat]] = None
+
+
+def enable() -> None:
+    """計測を始める。既に有効な場合は何もしない"""
+    global _stats
+    with _lock:
+        if _stats is None:
+            _stats = {}
+
+
+def disable() -> None:
+    """計測をやめ、記録を捨てる"""
+    global _stats
+    with _lock:
+        _stats = None
+
+
+def enabled() -> bool:
+    return _stats is not None
+
+
+def reset() -> None:
+    """記録を空にする。有効・無効は変えない"""
+    with _lock:
+        if _stats is not None:
+            _stats.clear()
+
+
+def record(stage: str, seconds: float = 0.0, n_bytes: int = 0, count: int = 1) -> None:
+    """段階の1回分の時間とバイト数を記録する
+
+    Args:
+        stage (str): fetch や race.soup などの段階の名前
+        seconds (float): かかった時間（秒）
+        n_bytes (int): 扱ったバイト数
+        count (int): 回数
+    """
+    with _lock:
+        if _stats is None:
+            return
+        _stats[stage] = _stats.get(stage, StageStat()).add(
+            StageStat(count, seconds, seconds, n_bytes)
+        )
+
+
+def count(stage: str, value: int = 1) -> None:
+    """時間を伴わない回数を記録する。cache_hit など"""
+    if _stats is not None:
+        record(stage, count=value)
+
+
+class _Timer:
+    def __init__(self, stage: str):
+        self.__stage = stage
+        self.__bytes = 0
+        self.__start = 0.0
+
+    def add_bytes(self, n_bytes: int) -> None:
+        self.__bytes += n_bytes
+
+    def __enter__(self):
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        record(self.__stage, time.perf_counter() - self.__start, self.__bytes)
+
+
+class _NullTimer:
+    def add_bytes(self, n_bytes: int) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(stage: str):
+    """with 文の中の時間を段階の1回分として記録する
+
+    例外で抜けた場合も記録する。バイト数は add_bytes で加える。
+
+        with metrics.timer("fetch") as t:
+            response = session.get(url)
+            t.add_bytes(len(response.content))
+
+    Args:
+        stage (str): 段階の名前
+    """
+    return _NULL_TIMER if _stats is None else _Timer(stage)
+
+
+def snapshot() -> dict[str, StageStat]:
+    """現在の記録の複製。無効な場合は空"""
+    with _lock:
+        return dict(_stats or {})
+
+
+def merge(stats: dict[str, StageStat]) -> None:
+    """別のプロセスの snapshot() を加える。無効な場合は何もしない"""
+    with _lock:
+        if _stats is None:
+            return
+        for stage, stat in stats.items():
+            _stats[stage] = _stats.get(stage, StageStat()).add(StageStat(*stat))
+
+
+def summary() -> pd.DataFrame:
+    """段階ごとの記録を合計時間の長い順に並べた表"""
+    rows = [
+        [
+            stage,
+            v.count,
+            v.seconds,
+            v.seconds / v.count * 1000 if v.count else 0.0,
+            v.max_seconds * 1000,
+            v.bytes,
+        ]
+        for stage, v in snapshot().items()
+    ]
+    return (
+        pd.DataFrame(
+            rows,
+            columns=["stage", "count", "seconds", "mean_ms", "max_ms", "bytes"],
+        )
+        .sort_values(["seconds", "stage"], ascending=[False, True])
+        .reset_index(drop=True)
+    )
+
+
+def format_summary() -> str:
+    """summary() を表示用の文字列にする"""
+    df = summary()
+    if df.empty:
+        return "No metrics"
+    return df.to_string(index=False, float_format=lambda v: f"{v:.3f}")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def to_prometheus(prefix: str = "scraping_netkeiba") -> str:
+    """Prometheus のテキスト形式にする
+
+    Args:
+        prefix (str): メトリクス名の接頭辞
+
+    Returns:
+        str: テキスト形式の文字列
+    """
+    stats = sorted(snapshot().items())
+    metrics: list[tuple[str, str, str, list[tuple[str, float]]]] = [
+        (
+            f"{prefix}_stage_count_total",
+            "counter",
+            "Number of times the stage ran.",
+            [(k, v.count) for k, v in stats],
+        ),
+        (
+            f"{prefix}_stage_seconds_total",
+            "counter",
+            "Total time spent in the stage.",
+            [(k, v.seconds) for k, v in stats],
+        ),
+        (
+            f"{prefix}_stage_max_seconds",
+            "gauge",
+            "Longest single run of the stage.",
+            [(k, v.max_seconds) for k, v in stats],
+        ),
+        (
+            f"{prefix}_stage_bytes_total",
+            "counter",
+            "Total bytes handled by the stage.",
+            [(k, v.bytes) for k, v in stats],
+        ),
+    ]
+    lines: list[str] = []
+    for name, metric_type, help_text, samples in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for stage, value in samples:
+            lines.append(f'{name}{{stage="{_escape_label(stage)}"}} {value!r}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str, prefix: str = "scraping_netkeiba") -> None:
+    """Prometheus のテキスト形式でファイルに書き出す
+
+    node_exporter の textfile collector が書き込み途中のファイルを読まないよう、
+    一時ファイルに書いてから置き換える。
+
+    Args:
+        path (str): 出力先
+        prefix (str): メトリクス名の接頭辞
+    """
+    output = Path(path)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output.with_name(f"{output.name}.tmp")
+    tmp_path.write_text(to_prometheus(prefix))
+    os.replace(tmp_path, output)
@@ -0,0 +1,337 @@
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+class TableSpec(NamedTuple):
+    """
+    Parquet に書き出す表の定義
+
+    partition_by は DataFrame からパーティションの列（値は文字列）を作る。
+    """
+
+    name: str
+    schema: pa.Schema
+    partition_columns: tuple[str, ...]
+    partition_by: Callable[[pd.DataFrame], pd.DataFrame]
+    # 値の種類が少なく、辞書エンコードすると小さくなる列
+    dictionary_columns: tuple[str, ...]
+
+
+def _race_partitions(df: pd.DataFrame) -> pd.DataFrame:
+    # レースIDの先頭4文字が年、続く2文字が競馬場
+    race_ids = df["race_id"].astype(str)
+    return pd.DataFrame(
+        {"year": race_ids.str[:4], "track": race_ids.str[4:6]}, index=df.index
+    )
+
+
+def _race_info_partitions(df: pd.DataFrame) -> pd.DataFrame:
+    # 中央競馬のレースIDには月が含まれないため、月はレース日から求める
+    partitions = _race_partitions(df)
+    partitions.insert(
+        1, "month", pd.to_datetime(df["race_date"]).dt.strftime("%m").to_numpy()
+    )
+    return partitions
+
+
+def _no_partitions(df: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame(index=df.index)
+
+
+# race_info はレース日を持つので、月でも分けて期間で絞り込めるようにする
+RACE_INFO = TableSpec(
+    "race_info",
+    pa.schema(
+        [
+            ("race_id", pa.string()),
+            ("race_date", pa.date32()),
+            ("post_time", pa.timestamp("us")),
+            ("weather", pa.string()),
+            ("racecourse", pa.string()),
+            ("track_name", pa.string()),
+            ("track_surface", pa.string()),
+            ("track_distance", pa.int32()),
+            ("track_condition", pa.string()),
+            ("horse_count", pa.int32()),
+        ]
+    ),
+    ("year", "month", "track"),
+    _race_info_partitions,
+    ("weather", "racecourse", "track_surface", "track_condition"),
+)
+
+# race_result はレース日を持たず、中央競馬のレースIDからは月が分からないため、
+# 年と競馬場だけで分ける。月で絞り込む場合は race_info と race_id で結合する
+RACE_RESULT = TableSpec(
+    "race_result",
+    pa.schema(
+        [
+            ("race_id", pa.string()),
+            ("horse_id", pa.string()),
+            ("jockey_id", pa.string()),
+            ("bracket_number", pa.string()),
+            ("horse_number", pa.string()),
+            ("corner_orders", pa.string()),
+            ("arrival_order", pa.string()),
+            ("pop_order", pa.string()),
+            ("horse_weight", pa.float64()),
+            ("load_weight", pa.float64()),
+            ("time", pa.float64()),
+            ("final_push_time", pa.float64()),
+            ("win_odds", pa.float64()),
+            ("prize", pa.int64()),
+        ]
+    ),
+    ("year", "track"),
+    _race_partitions,
+    ("race_id", "horse_id", "jockey_id", "bracket_number", "horse_number"),
+)
+
+HORSE = TableSpec(
+    "horse",
+    pa.schema(
+        [
+            ("horse_id", pa.string()),
+            ("name", pa.string()),
+            ("eng_name", pa.string()),
+            ("gender", pa.string()),
+            ("birth_date", pa.date32()),
+            ("trainer_id", pa.string()),
+            ("owner_id", pa.string()),
+            ("breeder_id", pa.string()),
+        ]
+    ),
+    (),
+    _no_partitions,
+    ("gender", "trainer_id", "owner_id", "breeder_id"),
+)
+
+
+def _partition_dir(root: Path, spec: TableSpec, values: tuple[str, ...]) -> Path:
+    path = root / spec.name
+    for column, value in zip(spec.partition_columns, values):
+        path /= f"{column}={value}"
+    return path
+
+
+def _partition_dirs(root: str, spec: TableSpec) -> list[Path]:
+    table_dir = Path(root) / spec.name
+    depth = len(spec.partition_columns)
+    if not depth:
+        return [table_dir]
+    return [v for v in table_dir.glob("/".join(["*"] * depth)) if v.is_dir()]
+
+
+# 書き込み中のファイルと compact の記録。先頭が _ のファイルは
+# pyarrow のデータセットが読み飛ばす
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(f"_{path.name}.tmp")
+
+
+def _journals(partition_dir: Path) -> list[tuple[Path, Path, list[Path]]]:
+    # compact の記録ごとの (記録, まとめたファイル, まとめる前のファイル)
+    journals: list[tuple[Path, Path, list[Path]]] = []
+    for path in sorted(partition_dir.glob("_compact-*.json")):
+        journal = json.loads(path.read_text())
+        journals.append(
+            (
+                path,
+                partition_dir / journal["output"],
+                [partition_dir / v for v in journal["parts"]],
+            )
+        )
+    return journals
+
+
+def _merged_parts(partition_dir: Path) -> set[Path]:
+    # まとめたファイルを置いた後、まとめる前のファイルを消し終わっていないもの
+    return {
+        part
+        for _, output, parts in _journals(partition_dir)
+        if output.exists()
+        for part in parts
+    }
+
+
+class ParquetSink:
+    """
+    DataFrame を少しずつ、パーティション分けした Parquet のデータセットに書き出す
+
+    root/<表の名前>/year=2021/month=01/track=05/part-*.parquet のように、
+    パーティションごとに1ファイルを書く。行は row_group_size 行ずつ
+    行グループとして書き出すため、メモリに溜まるのは高々それだけになる。
+    書き込み中は _part-*.parquet.tmp に書き、close で part-*.parquet に
+    置き換えるため、読み込みや compact が書き込み途中のファイルを読むことはない。
+    既存のファイルは変更しないので、別の実行で書いたデータに追記できる。
+    ファイルが増えたら compact でまとめる。
+
+    Pipeline の sink として使える。
+    """
+
+    def __init__(self, root: str, spec: TableSpec, row_group_size: int = 100_000):
+        self.__root = Path(root)
+        self.__spec = spec
+        self.__row_group_size = row_group_size
+        self.__buffers: dict[tuple[str, ...], list[pa.Table]] = {}
+        self.__buffered_rows: dict[tuple[str, ...], int] = {}
+        self.__writers: dict[tuple[str, ...], pq.ParquetWriter] = {}
+        self.__part_name = f"part-{uuid.uuid4().hex}.parquet"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __call__(self, df: pd.DataFrame) -> None:
+        self.write(df)
+
+    def write(self, df: pd.DataFrame) -> None:
+        """DataFrame をパーティションごとに溜め、row_group_size 行に達したら書き出す"""
+        if df.empty:
+            return
+        partitions = self.__spec.partition_by(df)
+        groups = (
+            partitions.groupby(list(partitions.columns), sort=False).indices.items()
+            if len(partitions.columns)
+            else [((), slice(None))]
+        )
+        for key, rows in groups:
+            key = key if isinstance(key, tuple) else (key,)
+            table = pa.Table.from_pandas(
+                df.iloc[rows], schema=self.__spec.schema, preserve_index=False
+            )
+            self.__buffers.setdefault(key, []).append(table)
+            self.__buffered_rows[key] = self.__buffered_rows.get(key, 0) + len(table)
+            if self.__buffered_rows[key] >= self.__row_group_size:
+                self.__flush(key)
+
+    def __flush(self, key: tuple[str, ...]) -> None:
+        if not self.__buffers.get(key):
+            return
+        table = pa.concat_tables(self.__buffers.pop(key))
+        self.__buffered_rows.pop(key)
+        if key not in self.__writers:
+            path = _partition_dir(self.__root, self.__spec, key)
+            path.mkdir(parents=True, exist_ok=True)
+            self.__writers[key] = pq.ParquetWriter(
+                _tmp_path(path / self.__part_name),
+                self.__spec.schema,
+                use_dictionary=list(self.__spec.dictionary_columns),
+                compression="zstd",
+            )
+        self.__writers[key].write_table(table, row_group_size=self.__row_group_size)
+
+    def flush(self) -> None:
+        """溜まっている行を全て書き出す"""
+        for key in list(self.__buffers):
+            self.__flush(key)
+
+    def close(self) -> None:
+        """溜まっている行を書き出し、ファイルを閉じて part-*.parquet に置き換える"""
+        self.flush()
+        for key, writer in self.__writers.items():
+            writer.close()
+            path = _partition_dir(self.__root, self.__spec, key) / self.__part_name
+            os.replace(_tmp_path(path), path)
+        self.__writers.clear()
+
+
+def _recover(partition_dir: Path) -> None:
+    # 途中で止まった compact を、まとめたファイルを置く前なら取り消し、
+    # 置いた後なら最後まで進める
+    for journal, output, parts in _journals(partition_dir):
+        if output.exists():
+            for part in parts:
+                part.unlink(missing_ok=True)
+        else:
+            _tmp_path(output).unlink(missing_ok=True)
+        journal.unlink()
+
+
+def compact(root: str, spec: TableSpec, row_group_size: int = 100_000) -> None:
+    """パーティションごとに、追記で増えたファイルを1つにまとめる
+
+    ParquetSink が書き込み中のファイルはまとめない。まとめる前に、どのファイルを
+    まとめるかを記録しておき、まとめたファイルを置いてから古いファイルを消す。
+    途中で止まっても、データが失われたり同じ行が2回読まれたりすることはなく、
+    次の compact が続きを片付ける。compact 同士は同時に実行しないこと。
+    """
+    for partition_dir in _partition_dirs(root, spec):
+        _recover(partition_dir)
+        paths = sorted(partition_dir.glob("part-*.parquet"))
+        if len(paths) <= 1:
+            continue
+        name = uuid.uuid4().hex
+        output = partition_dir / f"part-{name}.parquet"
+        journal = partition_dir / f"_compact-{name}.json"
+        _tmp_path(journal).write_text(
+            json.dumps({"output": output.name, "parts": [v.name for v in paths]})
+        )
+        os.replace(_tmp_path(journal), journal)
+        with pq.ParquetWriter(
+            _tmp_path(output),
+            spec.schema,
+            use_dictionary=list(spec.dictionary_columns),
+            compression="zstd",
+        ) as writer:
+            for path in paths:
+                writer.write_table(
+                    pq.read_table(path, schema=spec.schema),
+                    row_group_size=row_group_size,
+                )
+        # ここから古いファイルを消し終わるまでは、読み込みは記録を見て古いファイルを除く
+        os.replace(_tmp_path(output), output)
+        for path in paths:
+            path.unlink()
+        journal.unlink()
+
+
+def dataset(root: str, spec: TableSpec) -> ds.Dataset:
+    """書き出したデータセット。パーティションの列で絞り込んで読める
+
+    書き込み中のファイルと、compact でまとめ終わったファイルは読まない。
+    """
+    partitioning = ds.partitioning(
+        pa.schema([(v, pa.string()) for v in spec.partition_columns]), flavor="hive"
+    )
+    paths: list[str] = []
+    for partition_dir in _partition_dirs(root, spec):
+        merged = _merged_parts(partition_dir)
+        paths += [
+            str(v)
+            for v in sorted(partition_dir.glob("part-*.parquet"))
+            if v not in merged
+        ]
+    return ds.dataset(
+        paths,
+        schema=pa.unify_schemas([spec.schema, partitioning.schema]),
+        format="parquet",
+        partitioning=partitioning,
+        partition_base_dir=str(Path(root) / spec.name),
+    )
+
+
+def read(
+    root: str, spec: TableSpec, condition: Optional[ds.Expression] = None
+) -> pd.DataFrame:
+    """データセットを DataFrame として読み込む
+
+    Args:
+        root (str): データセットのディレクトリ
+        spec (TableSpec): 表の定義
+        condition (Optional[ds.Expression]): 絞り込みの条件。
+            例えば ds.field("year") == "2021" なら2021年のパーティションだけを読む
+
+    Returns:
+        pd.DataFrame: 表
+    """
+    return dataset(root, spec).to_table(filter=condition).to_pandas()
@@ -0,0 +1,236 @@
+import functools
+import logging
+import os
+import pickle
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Callable, Iterable, NamedTuple, Optional
+
+import pandas as pd
+
+from scraping_netkeiba import entity, url
+from scraping_netkeiba.client import (
+    BreederParam,
+    HorseParam,
+    HorsePedParam,
+    HorseResultParam,
+    ICache,
+    JockeyParam,
+    OwnerParam,
+    RaceParam,
+    TrainerParam,
+)
+from scraping_netkeiba.entity import Entity, EntityKind
+from scraping_netkeiba.horse import Horse
+from scraping_netkeiba.horse_ped import HorsePed
+from scraping_netkeiba.horse_result import HorseResult
+from scraping_netkeiba.manifest import Manifest
+from scraping_netkeiba.parsed_cache import ParsedCache
+from scraping_netkeiba.race import Race
+from scraping_netkeiba.util import chunked, parallel_imap
+
+
+class ParseJob(NamedTuple):
+    """
+    IDからキャッシュのURLや取得用のパラメータを求め、HTMLを DataFrame にする処理の組
+    """
+
+    name: str
+    to_url: Callable[[str], str]
+    parse: Callable[[str, str], Optional[pd.DataFrame]]
+    to_param: Callable[[str], NamedTuple]
+    # 結果のIDの列
+    id_column: str
+    # パーサーのバージョン。上がるとパース済みのページもパースし直す
+    parser_version: int
+
+
+def _race_result(race_id: str, html: str) -> pd.DataFrame:
+    return Race(race_id, html).race_result_as_dataframe()
+
+
+def _race_info(race_id: str, html: str) -> pd.DataFrame:
+    return Race(race_id, html).race_info_as_dataframe()
+
+
+def _horse(horse_id: str, html: str) -> Optional[pd.DataFrame]:
+    return Horse(horse_id, html).as_dataframe()
+
+
+def _horse_ped(horse_id: str, html: str) -> Optional[pd.DataFrame]:
+    return HorsePed(horse_id, html).as_dataframe()
+
+
+def _horse_result(horse_id: str, html: str) -> Optional[pd.DataFrame]:
+    return HorseResult(horse_id, html).as_dataframe()
+
+
+def _entity(kind: EntityKind, entity_id: str, html: str) -> Optional[pd.DataFrame]:
+    return Entity(kind, entity_id, html).as_dataframe()
+
+
+def _entity_job(kind: EntityKind, to_param: Callable[[str], NamedTuple]) -> ParseJob:
+    # 別プロセスに渡せるよう、種類は partial で束ねる
+    return ParseJob(
+        kind.name,
+        kind.to_url,
+        functools.partial(_entity, kind),
+        to_param,
+        f"{kind.name}_id",
+        Entity.PARSER_VERSION,
+    )
+
+
+RACE_RESULT = ParseJob(
+    "race_result", url.race, _race_result, RaceParam, "race_id", Race.PARSER_VERSION
+)
+RACE_INFO = ParseJob(
+    "race_info", url.race, _race_info, RaceParam, "race_id", Race.PARSER_VERSION
+)
+HORSE = ParseJob(
+    "horse", url.horse, _horse, HorseParam, "horse_id", Horse.PARSER_VERSION
+)
+HORSE_PED = ParseJob(
+    "horse_ped",
+    url.horse_ped,
+    _horse_ped,
+    HorsePedParam,
+    "horse_id",
+    HorsePed.PARSER_VERSION,
+)
+HORSE_RESULT = ParseJob(
+    "horse_result",
+    url.horse_result,
+    _horse_result,
+    HorseResultParam,
+    "horse_id",
+    HorseResult.PARSER_VERSION,
+)
+JOCKEY = _entity_job(entity.JOCKEY, JockeyParam)
+TRAINER = _entity_job(entity.TRAINER, TrainerParam)
+OWNER = _entity_job(entity.OWNER, OwnerParam)
+BREEDER = _entity_job(entity.BREEDER, BreederParam)
+
+
+_worker_cache: Optional[ICache] = None
+_worker_shard_dir: Optional[Path] = None
+# プロセスごとのシャードの名前
+_worker_shard_name: Optional[str] = None
+_worker_parsed_cache: Optional[ParsedCache] = None
+
+
+def _init_worker(
+    cache: ICache, shard_dir: str, parsed_cache: Optional[ParsedCache] = None
+):
+    global _worker_cache, _worker_shard_dir, _worker_shard_name, _worker_parsed_cache
+    _worker_cache = cache
+    _worker_shard_dir = Path(shard_dir)
+    _worker_shard_name = f"{os.getpid()}-{uuid.uuid4().hex}"
+    _worker_parsed_cache = parsed_cache
+
+
+def _parse(job: ParseJob, id_: str, html: str) -> Optional[pd.DataFrame]:
+    if _worker_parsed_cache is None:
+        return job.parse(id_, html)
+    return _worker_parsed_cache.get_or_parse(
+        job.name,
+        job.to_url(id_),
+        html,
+        job.parser_version,
+        lambda: job.parse(id_, html),
+    )
+
+
+def _parse_shard(args: tuple[ParseJob, list[str]]) -> Optional[tuple[str, int]]:
+    job, ids = args
+    frames: list[pd.DataFrame] = []
+    for v in ids:
+        try:
+            html: str = _worker_cache.read(job.to_url(v))
+            if (df := _parse(job, v, html)) is not None:
+                frames.append(df)
+        except Exception as e:
+            logging.warning(f"An error occurred while parsing {job.name} {v}: {e}")
+    if not frames:
+        return None
+    # プロセスごとに1つのシャードに追記し、書き出した位置を返す
+    path = _worker_shard_dir / f"{job.name}-{_worker_shard_name}.pkl"
+    with open(path, "ab") as f:
+        offset = f.tell()
+        pickle.dump(pd.concat(frames, ignore_index=True), f, pickle.HIGHEST_PROTOCOL)
+    return str(path), offset
+
+
+def _read_shard(path: str, offset: int) -> pd.DataFrame:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return pickle.load(f)
+
+
+def parallel_parse(
+    job: ParseJob,
+    ids: Iterable[str],
+    cache: ICache,
+    shard_dir: Optional[str] = None,
+    chunksize: int = 100,
+    max_workers: Optional[int] = None,
+    desc: Optional[str] = None,
+    parsed_cache: Optional[ParsedCache] = None,
+    manifest: Optional[Manifest] = None,
+) -> pd.DataFrame:
+    """キャッシュ済みのページを複数プロセスでパースし、1つの DataFrame にまとめる
+
+    プロセス間ではIDとシャードのパスだけを受け渡す。各プロセスは cache から
+    HTMLを読み込み、chunksize 件ごとの結果をプロセスごとのシャードファイルに
+    追記する。最後に親プロセスがIDの順にシャードから読み込んで結合する。
+
+    Args:
+        job (ParseJob): RACE_RESULT などの処理
+        ids (Iterable[str]): レースIDや馬ID
+        cache (ICache): HTMLのキャッシュ。pickle できる必要がある
+        shard_dir (Optional[str]): シャードの出力先。省略時は一時ディレクトリを使い、
+            結合後に削除する
+        chunksize (int): 1つのシャードにまとめる件数
+        max_workers (Optional[int]): プロセス数
+        desc (Optional[str]): 進捗バーの説明
+        parsed_cache (Optional[ParsedCache]): パース結果のキャッシュ。指定すると
+            同じHTMLを同じバージョンのパーサーでパースし直さない
+        manifest (Optional[Manifest]): 指定すると、パースできたページと
+            その参照先を記録する
+
+    Returns:
+        pd.DataFrame: 全てのIDの結果
+    """
+    if shard_dir is None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            return parallel_parse(
+                job,
+                ids,
+                cache,
+                tmp_dir,
+                chunksize,
+                max_workers,
+                desc,
+                parsed_cache,
+                manifest,
+            )
+    Path(shard_dir).mkdir(parents=True, exist_ok=True)
+    shards: list[tuple[str, int]] = [
+        v
+        for v in parallel_imap(
+            _parse_shard,
+            ((job, chunk) for chunk in chunked(ids, chunksize)),
+            desc=desc or job.name,
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(cache, shard_dir, parsed_cache),
+        )
+        if v is not None
+    ]
+    if not shards:
+        return pd.DataFrame()
+    df = pd.concat([_read_shard(*v) for v in shards], ignore_index=True)
+    if manifest is not None:
+        manifest.record_parsed(job.to_url, job.id_column, df)
+    return df
@@ -0,0 +1,187 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional, TypeVar
+
+import pandas as pd
+
+from scraping_netkeiba import url
+from scraping_netkeiba.horse import Horse
+from scraping_netkeiba.horse_ped import HorsePed
+from scraping_netkeiba.race import Race
+from scraping_netkeiba.util import content_hash
+
+R = TypeVar("R")
+
+_PAYOFF_NAMES = [
+    "win",
+    "show",
+    "bracket_quinella",
+    "quinella",
+    "quinella_place",
+    "exacta",
+    "trio",
+    "trifecta",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parsed (
+    key BLOB PRIMARY KEY,
+    value BLOB NOT NULL
+);
+"""
+
+
+class RaceRecord(NamedTuple):
+    race_info: pd.DataFrame
+    race_result: pd.DataFrame
+    # 単勝などの払い戻し。キーは Payoff のメソッド名
+    payoff: dict[str, Any]
+
+
+class HorsePedRecord(NamedTuple):
+    ped_horse_ids: list[Optional[str]]
+    dataframe: Optional[pd.DataFrame]
+
+
+def _key(kind: str, page_url: str, html: str, parser_version: int) -> bytes:
+    return hashlib.blake2b(
+        f"{kind}\0{page_url}\0{content_hash(html)}\0{parser_version}".encode(),
+        digest_size=16,
+    ).digest()
+
+
+class ParsedCache:
+    """
+    パース結果のキャッシュ
+
+    (種類, URL, HTMLのハッシュ値, パーサーのバージョン) ごとに、パース結果を
+    pickle して圧縮し、SQLiteに保存する。HTMLかパーサーのバージョンが
+    変わると別のキーになるため、古い結果が返ることはない。
+
+    pickle でき、別のプロセスでは開き直して使う。
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.__connection: Optional[sqlite3.Connection] = None
+        self.__pid: Optional[int] = None
+
+    def __reduce__(self):
+        return ParsedCache, (self.__path,)
+
+    def __connect(self) -> sqlite3.Connection:
+        # 接続はプロセスをまたいで使えないため、プロセスごとに開く
+        if self.__connection is None or self.__pid != os.getpid():
+            self.__connection = sqlite3.connect(
+                self.__path, timeout=60, check_same_thread=False
+            )
+            self.__pid = os.getpid()
+            with self.__connection:
+                self.__connection.executescript(_SCHEMA)
+        return self.__connection
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.__connection is not None and self.__pid == os.getpid():
+                self.__connection.close()
+            self.__connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_or_parse(
+        self,
+        kind: str,
+        page_url: str,
+        html: str,
+        parser_version: int,
+        parse: Callable[[], R],
+    ) -> R:
+        """キャッシュにあればその結果を、無ければ parse した結果を保存して返す
+
+        parse が例外を投げた場合は保存しない。
+
+        Args:
+            kind (str): race_result などの結果の種類
+            page_url (str): ページのURL
+            html (str): ページのHTML
+            parser_version (int): パーサーのバージョン
+            parse (Callable[[], R]): パースする関数
+
+        Returns:
+            R: パース結果
+        """
+        key = _key(kind, page_url, html, parser_version)
+        with self.__lock:
+            row = (
+                self.__connect()
+                .execute("SELECT value FROM parsed WHERE key = ?", (key,))
+                .fetchone()
+            )
+        if row is not None:
+            return pickle.loads(zlib.decompress(row[0]))
+        value = parse()
+        data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        with self.__lock, self.__connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO parsed (key, value) VALUES (?, ?)", (key, data)
+            )
+        return value
+
+    def race(self, race_id: str, html: str) -> RaceRecord:
+        """レース結果ページのパース結果。表と払い戻しをまとめて保存する"""
+
+        def parse() -> RaceRecord:
+            race = Race(race_id, html)
+            payoff = race.payoff()
+            return RaceRecord(
+                race.race_info_as_dataframe(),
+                race.race_result_as_dataframe(),
+                {v: getattr(payoff, v)() for v in _PAYOFF_NAMES},
+            )
+
+        return self.get_or_parse(
+            "race", url.race(race_id), html, Race.PARSER_VERSION, parse
+        )
+
+    def race_info_as_dataframe(self, race_id: str, html: str) -> pd.DataFrame:
+        return self.race(race_id, html).race_info
+
+    def race_result_as_dataframe(self, race_id: str, html: str) -> pd.DataFrame:
+        return self.race(race_id, html).race_result
+
+    def payoff(self, race_id: str, html: str) -> dict[str, Any]:
+        return self.race(race_id, html).payoff
+
+    def horse_as_dataframe(self, horse_id: str, html: str) -> Optional[pd.DataFrame]:
+        return self.get_or_parse(
+            "horse",
+            url.horse(horse_id),
+            html,
+            Horse.PARSER_VERSION,
+            lambda: Horse(horse_id, html).as_dataframe(),
+        )
+
+    def horse_ped(self, horse_id: str, html: str) -> HorsePedRecord:
+        def parse() -> HorsePedRecord:
+            horse_ped = HorsePed(horse_id, html)
+            return HorsePedRecord(horse_ped.ped_horse_ids(), horse_ped.as_dataframe())
+
+        # ParseJob の horse_ped とは結果の型が違うため、別の種類にする
+        return self.get_or_parse(
+            "horse_ped_record",
+            url.horse_ped(horse_id),
+            html,
+            HorsePed.PARSER_VERSION,
+            parse,
+        )
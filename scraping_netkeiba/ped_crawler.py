@@ -0,0 +1,169 @@
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Optional
+
+from scraping_netkeiba import url
+from scraping_netkeiba.client import Client, HorsePedParam
+from scraping_netkeiba.fetcher import Fetcher
+from scraping_netkeiba.horse_ped import HorsePed
+from scraping_netkeiba.manifest import Manifest
+from scraping_netkeiba.ped_graph import PedGraph
+
+
+class PedCrawler:
+    """
+    血統ページを幅優先で辿り、PedGraph に登録するクローラー
+
+    血統表が既に分かっている馬の血統ページは取得しない。
+    batch_size 頭ずつ、Fetcher で並行して取得する。
+    state_dir を指定すると、バッチごとにグラフと未取得の馬IDを保存し、
+    次回はその続きから再開する。取得やパースに失敗した馬は同じ crawl の間は
+    取得し直さず、次の crawl で max_retries 回まで取得し直す。
+    manifest を指定すると、パースできた血統ページと
+    そこに載っている祖先の血統ページを参照として記録する。
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        state_dir: Optional[str] = None,
+        batch_size: int = 100,
+        max_workers: int = 4,
+        manifest: Optional[Manifest] = None,
+        max_retries: int = 3,
+    ):
+        self.__client = client
+        self.__max_workers = max_workers
+        self.__manifest = manifest
+        self.__state_dir = Path(state_dir) if state_dir else None
+        self.__batch_size = batch_size
+        self.__max_retries = max_retries
+        self.__graph = PedGraph()
+        self.__queue: deque[tuple[str, int]] = deque()
+        # 失敗した馬IDから (遡ったページ数, 失敗した回数) への辞書
+        self.__failed: dict[str, tuple[int, int]] = {}
+        if self.__state_dir and self.__graph_path().exists():
+            self.__graph = PedGraph.load(self.__graph_path())
+        if self.__state_dir and self.__queue_path().exists():
+            for line in self.__queue_path().read_text().splitlines():
+                horse_id, level = line.split("\t")
+                self.__queue.append((horse_id, int(level)))
+        if self.__state_dir and self.__failed_path().exists():
+            for line in self.__failed_path().read_text().splitlines():
+                horse_id, level, attempts = line.split("\t")
+                self.__failed[horse_id] = (int(level), int(attempts))
+
+    def __graph_path(self) -> Path:
+        return self.__state_dir / "ped_graph.pkl"
+
+    def __queue_path(self) -> Path:
+        return self.__state_dir / "queue.tsv"
+
+    def __failed_path(self) -> Path:
+        return self.__state_dir / "failed.tsv"
+
+    def graph(self) -> PedGraph:
+        return self.__graph
+
+    def pending(self) -> list[str]:
+        """未取得の馬ID"""
+        return [v for v, _ in self.__queue]
+
+    def failed(self) -> list[str]:
+        """取得やパースに失敗した馬ID"""
+        return sorted(self.__failed)
+
+    def crawl(
+        self, horse_ids: Iterable[str] = (), depth: Optional[int] = None
+    ) -> PedGraph:
+        """指定した馬から血統ページを辿る
+
+        Args:
+            horse_ids (Iterable[str]): 起点の馬ID。前回の続きだけを行う場合は空
+            depth (Optional[int]): 血統ページを何ページ分遡るか。None の場合は
+                取得できる限り遡る
+
+        Returns:
+            PedGraph: 血統グラフ
+        """
+        # max_retries 回失敗した馬は取得しない
+        queued: set[str] = {v for v, _ in self.__queue} | {
+            v for v, (_, n) in self.__failed.items() if n >= self.__max_retries
+        }
+        for v in horse_ids:
+            if v not in queued:
+                queued.add(v)
+                self.__queue.append((v, 0))
+        # 前回までに失敗した馬を取得し直す
+        for v, (level, _) in self.__failed.items():
+            if v not in queued:
+                queued.add(v)
+                self.__queue.append((v, level))
+        failed: set[str] = set()
+
+        fetcher = Fetcher(self.__client, self.__max_workers)
+        while self.__queue:
+            batch: list[tuple[str, int]] = [
+                self.__queue.popleft()
+                for _ in range(min(self.__batch_size, len(self.__queue)))
+            ]
+            levels: dict[str, int] = {
+                v: level
+                for v, level in batch
+                if v not in failed and not self.__graph.is_materialized(v)
+            }
+            for v, _ in batch:
+                if self.__graph.is_materialized(v):
+                    self.__failed.pop(v, None)
+            for param, html in fetcher.fetch(
+                [HorsePedParam(v) for v in levels], desc="horse_ped"
+            ):
+                level: int = levels[param.horse_id]
+                horse_ped: Optional[HorsePed] = self.__parse(param.horse_id, html)
+                if horse_ped is None:
+                    continue
+                del levels[param.horse_id]
+                self.__failed.pop(param.horse_id, None)
+                self.__graph.add(horse_ped)
+                ped_horse_ids = horse_ped.ped_horse_ids()
+                if self.__manifest is not None:
+                    page_url = url.horse_ped(param.horse_id)
+                    self.__manifest.mark_parsed([page_url])
+                    self.__manifest.add_references(
+                        page_url, "horse_ped", {v for v in ped_horse_ids if v}
+                    )
+                if depth is not None and level + 1 >= depth:
+                    continue
+                for v in ped_horse_ids[len(ped_horse_ids) // 2 - 1 :]:
+                    if v is not None and v not in queued:
+                        queued.add(v)
+                        self.__queue.append((v, level + 1))
+            # 取得やパースに失敗した馬は今回の実行中は再び取得しない
+            for v, level in levels.items():
+                failed.add(v)
+                self.__failed[v] = (level, self.__failed.get(v, (level, 0))[1] + 1)
+            self.save()
+        return self.__graph
+
+    def __parse(self, horse_id: str, html: str) -> Optional[HorsePed]:
+        try:
+            return HorsePed(horse_id, html)
+        except Exception as e:
+            logging.warning(f"An error occurred while crawling HorsePed: {e}")
+
+    def save(self) -> None:
+        """グラフと未取得の馬ID、失敗した馬IDを保存する"""
+        if not self.__state_dir:
+            return
+        self.__state_dir.mkdir(parents=True, exist_ok=True)
+        self.__graph.save(self.__graph_path())
+        self.__queue_path().write_text(
+            "".join(f"{v}\t{level}\n" for v, level in self.__queue)
+        )
+        self.__failed_path().write_text(
+            "".join(
+                f"{v}\t{level}\t{attempts}\n"
+                for v, (level, attempts) in sorted(self.__failed.items())
+            )
+        )
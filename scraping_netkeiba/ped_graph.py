@@ -0,0 +1,291 @@
+import pickle
+from array import array
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Optional, Self
+
+from scraping_netkeiba.horse_ped import HorsePed, Relation
+
+_UNKNOWN = -1
+
+
+class PedGraph:
+    """
+    複数の血統ページから組み立てる血統グラフ
+
+    馬IDは整数に変換して1頭1ノードで保持し、父・母への辺は整数配列で持つ。
+    同じ種牡馬が何千頭の血統表に現れても、ノードは1つになる。
+    """
+
+    def __init__(self):
+        self.__horse_ids: list[str] = []
+        self.__nodes: dict[str, int] = {}
+        self.__sires: array = array("l")
+        self.__dams: array = array("l")
+        self.__expanded: bytearray = bytearray()
+        self.__children: Optional[list[list[int]]] = None
+        self.__heights: dict[int, int] = {}
+        self.__kinships: dict[tuple[int, int], float] = {}
+
+    def __len__(self) -> int:
+        return len(self.__horse_ids)
+
+    def __contains__(self, horse_id: str) -> bool:
+        return horse_id in self.__nodes
+
+    def node(self, horse_id: str) -> int:
+        """馬IDに対応するノード番号を返す。未登録の場合は登録する"""
+        if (n := self.__nodes.get(horse_id)) is not None:
+            return n
+        n = len(self.__horse_ids)
+        self.__nodes[horse_id] = n
+        self.__horse_ids.append(horse_id)
+        self.__sires.append(_UNKNOWN)
+        self.__dams.append(_UNKNOWN)
+        self.__expanded.append(0)
+        return n
+
+    def horse_id(self, node: int) -> str:
+        """ノード番号に対応する馬IDを返す"""
+        return self.__horse_ids[node]
+
+    def add_parents(
+        self, horse_id: str, sire_id: Optional[str], dam_id: Optional[str]
+    ) -> None:
+        """父・母を登録する
+
+        Args:
+            horse_id (str): 馬ID
+            sire_id (Optional[str]): 父の馬ID
+            dam_id (Optional[str]): 母の馬ID
+        """
+        n = self.node(horse_id)
+        if sire_id is not None:
+            self.__sires[n] = self.node(sire_id)
+        if dam_id is not None:
+            self.__dams[n] = self.node(dam_id)
+        self.__invalidate()
+
+    def add(self, horse_ped: HorsePed) -> None:
+        """血統ページの血統表を全て登録する
+
+        血統表の空欄は不明として扱い、既に分かっている父・母は上書きしない。
+
+        Args:
+            horse_ped (HorsePed): 血統ページ
+        """
+        ped_horse_ids: list[Optional[str]] = horse_ped.ped_horse_ids()
+        root = self.node(horse_ped.horse_id())
+        nodes: list[int] = [
+            _UNKNOWN if v is None else self.node(v) for v in ped_horse_ids
+        ]
+        self.__fill_parents(root, nodes[0], nodes[1])
+        for i, n in enumerate(nodes[: len(nodes) // 2 - 1]):
+            if n != _UNKNOWN:
+                self.__fill_parents(n, nodes[i * 2 + 2], nodes[i * 2 + 3])
+        self.__expanded[root] = 1
+        self.__invalidate()
+
+    def __fill_parents(self, n: int, sire: int, dam: int) -> None:
+        if sire != _UNKNOWN:
+            self.__sires[n] = sire
+        if dam != _UNKNOWN:
+            self.__dams[n] = dam
+
+    def add_all(self, horse_peds: Iterable[HorsePed]) -> None:
+        for p in horse_peds:
+            self.add(p)
+
+    def __invalidate(self) -> None:
+        self.__children = None
+        self.__heights.clear()
+        self.__kinships.clear()
+
+    def __parents(self, n: int) -> tuple[int, int]:
+        return self.__sires[n], self.__dams[n]
+
+    def sire(self, horse_id: str) -> Optional[str]:
+        """父の馬ID"""
+        return self.ancestor(horse_id, [Relation.Sire])
+
+    def dam(self, horse_id: str) -> Optional[str]:
+        """母の馬ID"""
+        return self.ancestor(horse_id, [Relation.Dam])
+
+    def ancestor(self, horse_id: str, relationships: list[Relation]) -> Optional[str]:
+        """続柄で指定した祖先の馬IDを返す。不明な場合は None"""
+        n = self.__nodes.get(horse_id, _UNKNOWN)
+        for r in relationships:
+            if n == _UNKNOWN:
+                return None
+            n = self.__parents(n)[r.value]
+        return None if n == _UNKNOWN else self.__horse_ids[n]
+
+    def ancestors(self, horse_id: str, generations: Optional[int] = None) -> set[str]:
+        """既知の全ての祖先の馬IDを返す
+
+        Args:
+            horse_id (str): 馬ID
+            generations (Optional[int]): 遡る世代数。None の場合は全て
+
+        Returns:
+            set[str]: 祖先の馬ID
+        """
+        if horse_id not in self.__nodes:
+            return set()
+        return {
+            self.__horse_ids[n]
+            for n in self.__walk(self.__nodes[horse_id], self.__parents, generations)
+        }
+
+    def descendants(self, horse_id: str, generations: Optional[int] = None) -> set[str]:
+        """既知の全ての子孫の馬IDを返す
+
+        Args:
+            horse_id (str): 馬ID
+            generations (Optional[int]): 下る世代数。None の場合は全て
+
+        Returns:
+            set[str]: 子孫の馬ID
+        """
+        if horse_id not in self.__nodes:
+            return set()
+        if self.__children is None:
+            children: list[list[int]] = [[] for _ in self.__horse_ids]
+            for n in range(len(self.__horse_ids)):
+                for p in self.__parents(n):
+                    if p != _UNKNOWN:
+                        children[p].append(n)
+            self.__children = children
+        return {
+            self.__horse_ids[n]
+            for n in self.__walk(
+                self.__nodes[horse_id], self.__children.__getitem__, generations
+            )
+        }
+
+    @staticmethod
+    def __walk(start: int, neighbors, generations: Optional[int]) -> set[int]:
+        visited: set[int] = set()
+        queue: deque[tuple[int, int]] = deque([(start, 0)])
+        while queue:
+            n, depth = queue.popleft()
+            if generations is not None and depth >= generations:
+                continue
+            for m in neighbors(n):
+                if m != _UNKNOWN and m not in visited:
+                    visited.add(m)
+                    queue.append((m, depth + 1))
+        return visited
+
+    def __height(self, n: int) -> int:
+        # 既知の祖先を遡れる世代数。祖先は必ず子孫より小さくなる
+        if (h := self.__heights.get(n)) is not None:
+            return h
+        stack: list[int] = [n]
+        while stack:
+            m = stack[-1]
+            parents = [p for p in self.__parents(m) if p != _UNKNOWN]
+            pending = [p for p in parents if p not in self.__heights]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            self.__heights[m] = 1 + max(
+                (self.__heights[p] for p in parents), default=-1
+            )
+        return self.__heights[n]
+
+    def __kinship(self, a: int, b: int) -> float:
+        if a == _UNKNOWN or b == _UNKNOWN:
+            return 0.0
+        key = (a, b) if a < b else (b, a)
+        if (k := self.__kinships.get(key)) is not None:
+            return k
+        if a == b:
+            k = (1.0 + self.__kinship(*self.__parents(a))) / 2
+        else:
+            # 世代の新しい方を遡れば、もう一方の祖先を経由せずに済む
+            if self.__height(a) < self.__height(b):
+                a, b = b, a
+            sire, dam = self.__parents(a)
+            k = (self.__kinship(sire, b) + self.__kinship(dam, b)) / 2
+        self.__kinships[key] = k
+        return k
+
+    def kinship(self, horse_id: str, other_horse_id: str) -> float:
+        """2頭の近縁係数を既知の血統から求める"""
+        return self.__kinship(
+            self.__nodes.get(horse_id, _UNKNOWN),
+            self.__nodes.get(other_horse_id, _UNKNOWN),
+        )
+
+    def inbreeding_coefficient(self, horse_id: str) -> float:
+        """近交係数を既知の血統から求める"""
+        if horse_id not in self.__nodes:
+            return 0.0
+        return self.__kinship(*self.__parents(self.__nodes[horse_id]))
+
+    def is_expanded(self, horse_id: str) -> bool:
+        """血統ページを登録済みか"""
+        n = self.__nodes.get(horse_id)
+        return n is not None and self.__expanded[n] == 1
+
+    def is_materialized(self, horse_id: str, generations: int = 5) -> bool:
+        """血統ページから得られる世代数の血統表が既に全て分かっているか
+
+        Args:
+            horse_id (str): 馬ID
+            generations (int): 血統ページの世代数
+
+        Returns:
+            bool: 血統ページを取得する必要がなければ True
+        """
+        if (n := self.__nodes.get(horse_id)) is None:
+            return False
+        frontier: list[int] = [n]
+        for _ in range(generations):
+            parents: list[int] = []
+            for m in frontier:
+                if self.__expanded[m]:
+                    continue
+                sire, dam = self.__parents(m)
+                if sire == _UNKNOWN or dam == _UNKNOWN:
+                    return False
+                parents.extend((sire, dam))
+            frontier = parents
+        return True
+
+    def missing(self, horse_ids: Iterable[str], generations: int = 5) -> list[str]:
+        """血統ページの取得が必要な馬IDを重複なく返す
+
+        Args:
+            horse_ids (Iterable[str]): 馬ID
+            generations (int): 血統ページの世代数
+
+        Returns:
+            list[str]: 血統表が分かっていない馬ID
+        """
+        return [
+            v
+            for v in dict.fromkeys(horse_ids)
+            if not self.is_materialized(v, generations)
+        ]
+
+    def save(self, path: str | Path) -> None:
+        """グラフをファイルに保存する"""
+        Path(path).write_bytes(
+            pickle.dumps((self.__horse_ids, self.__sires, self.__dams, self.__expanded))
+        )
+
+    @classmethod
+    def load(cls, path: str | Path) -> Self:
+        """保存したグラフを読み込む"""
+        graph = cls()
+        horse_ids, sires, dams, expanded = pickle.loads(Path(path).read_bytes())
+        graph.__horse_ids = horse_ids
+        graph.__nodes = {v: i for i, v in enumerate(horse_ids)}
+        graph.__sires = sires
+        graph.__dams = dams
+        graph.__expanded = expanded
+        return graph
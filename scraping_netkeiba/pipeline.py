@@ -0,0 +1,138 @@
+import logging
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Iterable, NamedTuple, Optional
+
+import pandas as pd
+
+from scraping_netkeiba import metrics
+from scraping_netkeiba.client import Client
+from scraping_netkeiba.fetcher import Fetcher
+from scraping_netkeiba.manifest import Manifest
+from scraping_netkeiba.parse_job import ParseJob
+
+Sink = Callable[[pd.DataFrame], None]
+
+
+class PipelineResult(NamedTuple):
+    fetched: int
+    parsed: int
+    # パースに失敗したページの数
+    failed: int
+    # 取得に失敗したページの数
+    fetch_failed: int
+
+
+def _parse(
+    job: ParseJob, id_: str, html: str, collect_metrics: bool = False
+) -> tuple[Optional[pd.DataFrame], Optional[dict[str, metrics.StageStat]]]:
+    if collect_metrics:
+        metrics.enable()
+        metrics.reset()
+    try:
+        df = job.parse(id_, html)
+    except Exception as e:
+        logging.warning(f"An error occurred while parsing {job.name} {id_}: {e}")
+        df = None
+    return df, metrics.snapshot() if collect_metrics else None
+
+
+class Pipeline:
+    """
+    取得・パース・出力を並行して行うパイプライン
+
+    取得は Fetcher のスレッド、パースはプロセスプール、出力は専用のスレッドで
+    行う。キャッシュへの書き込みは取得と同じスレッドで Client が行う。
+    各段の間で処理待ちの件数は queue_size までに抑えられ、後段が詰まると
+    前段も待つ。manifest を指定すると、パースできたページとその参照先を記録する。
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        job: ParseJob,
+        sink: Sink,
+        max_fetch_workers: int = 4,
+        max_parse_workers: Optional[int] = None,
+        queue_size: int = 64,
+        manifest: Optional[Manifest] = None,
+    ):
+        self.__client = client
+        self.__job = job
+        self.__sink = sink
+        self.__max_fetch_workers = max_fetch_workers
+        self.__max_parse_workers = max_parse_workers
+        self.__queue_size = queue_size
+        self.__manifest = manifest
+
+    def run(self, ids: Iterable[str], update_cache: bool = False) -> PipelineResult:
+        """IDのページを取得・パースし、結果を sink に渡す
+
+        Args:
+            ids (Iterable[str]): レースIDや馬ID
+            update_cache (bool): キャッシュを更新するか
+
+        Returns:
+            PipelineResult: 件数
+        """
+        fetched, parsed, failed = 0, 0, 0
+        sink_queue: queue.Queue[Optional[pd.DataFrame]] = queue.Queue(self.__queue_size)
+        sink_errors: list[Exception] = []
+
+        def write():
+            while (df := sink_queue.get()) is not None:
+                try:
+                    with metrics.timer("sink"):
+                        self.__sink(df)
+                except Exception as e:
+                    sink_errors.append(e)
+
+        sink_thread = threading.Thread(target=write, daemon=True)
+        sink_thread.start()
+        in_flight: set[Future] = set()
+        # パースは別のプロセスで行うため、計測が有効なら記録を受け取ってまとめる
+        collect_metrics = metrics.enabled()
+
+        def drain(block: bool) -> None:
+            nonlocal parsed, failed
+            done, _ = wait(
+                in_flight, timeout=None if block else 0, return_when=FIRST_COMPLETED
+            )
+            for f in done:
+                in_flight.remove(f)
+                df, stats = f.result()
+                if stats:
+                    metrics.merge(stats)
+                if df is None:
+                    failed += 1
+                else:
+                    parsed += 1
+                    if self.__manifest is not None:
+                        self.__manifest.record_parsed(
+                            self.__job.to_url, self.__job.id_column, df
+                        )
+                    sink_queue.put(df)
+
+        fetcher = Fetcher(self.__client, self.__max_fetch_workers)
+        try:
+            with ProcessPoolExecutor(max_workers=self.__max_parse_workers) as executor:
+                params = (self.__job.to_param(v) for v in ids)
+                for param, html in fetcher.fetch(params, update_cache, self.__job.name):
+                    fetched += 1
+                    drain(block=False)
+                    while len(in_flight) >= self.__queue_size:
+                        drain(block=True)
+                    in_flight.add(
+                        executor.submit(
+                            _parse, self.__job, param[0], html, collect_metrics
+                        )
+                    )
+                while in_flight:
+                    drain(block=True)
+        finally:
+            sink_queue.put(None)
+            sink_thread.join()
+        if sink_errors:
+            raise sink_errors[0]
+        return PipelineResult(fetched, parsed, failed, len(fetcher.failed()))
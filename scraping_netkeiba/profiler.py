@@ -0,0 +1,212 @@
+"""
+パーサーのメソッドとDOMの検索ごとの時間の計測
+
+with 文の間だけ Race などのメソッドと BeautifulSoup の検索メソッドを
+計測用の関数に差し替え、呼び出しの経路ごとの時間を記録する。
+
+    with Profiler() as profiler:
+        for race_id, html in pages:
+            Race(race_id, html).race_result_as_dataframe()
+    print(profiler.format_report())
+    profiler.write_collapsed("race.folded")
+
+write_collapsed の出力は flamegraph.pl や speedscope でフレームグラフにできる。
+差し替えた関数の呼び出しの分だけ遅くなるため、値は比較に使う。
+記録するのは with 文を実行したプロセスの呼び出しだけである。
+"""
+import functools
+import inspect
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+import pandas as pd
+from bs4 import BeautifulSoup, Tag
+
+from scraping_netkeiba.horse import Horse
+from scraping_netkeiba.horse_ped import HorsePed
+from scraping_netkeiba.race import Payoff, Race
+
+# 計測するパーサーのクラス。__init__ と全てのメソッドを計測する
+DEFAULT_CLASSES: list[type] = [Race, Payoff, Horse, HorsePed]
+
+# 計測するDOMの検索メソッドとプロパティ
+DOM_QUERIES: list[tuple[type, str]] = [
+    (BeautifulSoup, "__init__"),
+    (Tag, "select"),
+    (Tag, "select_one"),
+    (Tag, "find"),
+    (Tag, "find_all"),
+    (Tag, "get_text"),
+    (Tag, "text"),
+    (Tag, "decode_contents"),
+]
+
+_active_lock = threading.Lock()
+_active = False
+
+
+def _frame_name(cls: type, name: str) -> str:
+    # 名前修飾されたメソッドは元の名前で表す
+    return f"{cls.__name__}.{name.removeprefix(f'_{cls.__name__}')}"
+
+
+class Profiler:
+    """
+    呼び出しの経路ごとの回数と時間を記録する
+
+    同時に有効にできるのは1つだけである。
+    """
+
+    def __init__(
+        self,
+        classes: Optional[Iterable[type]] = None,
+        dom_queries: bool = True,
+    ):
+        """
+        Args:
+            classes (Optional[Iterable[type]]): 計測するクラス。省略時は DEFAULT_CLASSES
+            dom_queries (bool): BeautifulSoup の検索を計測するか
+        """
+        self.__targets: list[tuple[type, str]] = [
+            (cls, name)
+            for cls in (DEFAULT_CLASSES if classes is None else classes)
+            for name, value in vars(cls).items()
+            if inspect.isfunction(value)
+            and (name == "__init__" or not name.endswith("__"))
+        ]
+        if dom_queries:
+            self.__targets += DOM_QUERIES
+        self.__originals: list[tuple[type, str, Any]] = []
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        # 呼び出しの経路ごとの (回数, 合計時間)
+        self.__stats: dict[tuple[str, ...], list] = {}
+
+    def __wrap(self, frame: str, function: Callable) -> Callable:
+        local = self.__local
+        stats = self.__stats
+        lock = self.__lock
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            stack: list[str] = local.__dict__.setdefault("stack", [])
+            stack.append(frame)
+            key = tuple(stack)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stack.pop()
+                with lock:
+                    if (stat := stats.get(key)) is None:
+                        stats[key] = [1, elapsed]
+                    else:
+                        stat[0] += 1
+                        stat[1] += elapsed
+
+        return wrapper
+
+    def start(self) -> None:
+        global _active
+        with _active_lock:
+            if _active:
+                raise Exception("Profiler is already active")
+            _active = True
+        for cls, name in self.__targets:
+            # 親クラスで定義されている場合は、定義しているクラスで差し替える
+            owner = next(c for c in cls.__mro__ if name in vars(c))
+            value = vars(owner)[name]
+            frame = _frame_name(cls, name)
+            self.__originals.append((owner, name, value))
+            if isinstance(value, property):
+                setattr(owner, name, property(self.__wrap(frame, value.fget)))
+            else:
+                setattr(owner, name, self.__wrap(frame, value))
+
+    def stop(self) -> None:
+        global _active
+        for owner, name, value in reversed(self.__originals):
+            setattr(owner, name, value)
+        self.__originals.clear()
+        with _active_lock:
+            _active = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def __self_seconds(self) -> dict[tuple[str, ...], float]:
+        # 経路の時間から、そこから呼んだ経路の時間を引く
+        with self.__lock:
+            stats = {k: v[1] for k, v in self.__stats.items()}
+        self_seconds = dict(stats)
+        for key, seconds in stats.items():
+            if len(key) > 1 and key[:-1] in self_seconds:
+                self_seconds[key[:-1]] -= seconds
+        return self_seconds
+
+    def collapsed(self) -> str:
+        """フレームグラフ用の collapsed stack 形式の文字列
+
+        1行が1つの呼び出しの経路で、値はその経路の自身の時間（µs）である。
+        """
+        lines: list[str] = [
+            f"{';'.join(key)} {round(seconds * 1e6)}"
+            for key, seconds in sorted(self.__self_seconds().items())
+            if round(seconds * 1e6) > 0
+        ]
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write_collapsed(self, path: str) -> None:
+        """collapsed() をファイルに書き出す"""
+        output = Path(path)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = output.with_name(f"{output.name}.tmp")
+        tmp_path.write_text(self.collapsed())
+        os.replace(tmp_path, output)
+
+    def report(self) -> pd.DataFrame:
+        """関数ごとの回数と時間を、自身の時間の長い順に並べた表
+
+        total_ms は呼び出し先を含む時間で、再帰した分は数えない。
+        self_ms は呼び出し先を含まない時間である。
+        """
+        with self.__lock:
+            stats = {k: list(v) for k, v in self.__stats.items()}
+        self_seconds = self.__self_seconds()
+        rows: dict[str, list] = {}
+        for key, (calls, seconds) in stats.items():
+            row = rows.setdefault(key[-1], [0, 0.0, 0.0])
+            row[0] += calls
+            if key[-1] not in key[:-1]:
+                row[1] += seconds
+            row[2] += self_seconds[key]
+        df = pd.DataFrame(
+            [
+                [name, calls, total * 1000, self_ * 1000, total / calls * 1e6]
+                for name, (calls, total, self_) in rows.items()
+            ],
+            columns=["name", "calls", "total_ms", "self_ms", "per_call_us"],
+        )
+        df = df.sort_values(["self_ms", "name"], ascending=[False, True])
+        return df.reset_index(drop=True)
+
+    def format_report(self, limit: Optional[int] = None) -> str:
+        """report() を表示用の文字列にする
+
+        Args:
+            limit (Optional[int]): 表示する行数。省略時は全て
+        """
+        df = self.report()
+        if df.empty:
+            return "No calls"
+        if limit is not None:
+            df = df.head(limit)
+        return df.to_string(index=False, float_format=lambda v: f"{v:.3f}")
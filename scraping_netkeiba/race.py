@@ -7,7 +7,7 @@ from typing import Optional
 import pandas as pd
 from bs4 import BeautifulSoup, Tag
 
-from scraping_netkeiba import url
+from scraping_netkeiba import metrics, url
 
 
 class ScrapingExceptionCode(Enum):
@@ -135,6 +135,9 @@ class Payoff:
 
 
 class Race:
+    # パース結果が変わる修正をしたら上げる。上がると増分パースでパースし直す
+    PARSER_VERSION = 1
+
     __spaces_pattern = re.compile(r"\s+")
     __race_info_pattern = re.compile(
         r"^(([芝ダ])(左|右|直線)\s?(外|内2周)?(\d+)m).*"
@@ -148,7 +151,8 @@ class Race:
 
     def __init__(self, race_id: str, html: str):
         self.__race_id = race_id
-        self.__soup = BeautifulSoup(html, "html.parser")
+        with metrics.timer("race.soup"):
+            self.__soup = BeautifulSoup(html, "html.parser")
 
         race_num_tag: Tag = self.__soup.select_one("div.race_num")
         active_a_tag: Tag = race_num_tag.find(
@@ -469,37 +473,39 @@ class Race:
             raise ScrapingException(code=ScrapingExceptionCode.Prize, previous=e)
 
     def race_info_as_dataframe(self) -> pd.DataFrame:
-        return pd.DataFrame.from_dict(
-            {
-                "race_id": [self.race_id()],
-                "race_date": [self.race_date()],
-                "post_time": [self.post_time()],
-                "weather": [self.weather()],
-                "racecourse": [self.racecourse()],
-                "track_name": [self.track_name()],
-                "track_surface": [self.track_surface()],
-                "track_distance": [self.track_distance()],
-                "track_condition": [self.track_condition()],
-                "horse_count": [self.horse_count()],
-            }
-        )
+        with metrics.timer("race_info.extract"):
+            return pd.DataFrame.from_dict(
+                {
+                    "race_id": [self.race_id()],
+                    "race_date": [self.race_date()],
+                    "post_time": [self.post_time()],
+                    "weather": [self.weather()],
+                    "racecourse": [self.racecourse()],
+                    "track_name": [self.track_name()],
+                    "track_surface": [self.track_surface()],
+                    "track_distance": [self.track_distance()],
+                    "track_condition": [self.track_condition()],
+                    "horse_count": [self.horse_count()],
+                }
+            )
 
     def race_result_as_dataframe(self) -> pd.DataFrame:
-        return pd.DataFrame.from_dict(
-            {
-                "race_id": [self.race_id()] * self.horse_count(),
-                "horse_id": self.horse_id(),
-                "jockey_id": self.jockey_id(),
-                "bracket_number": self.bracket_number(),
-                "horse_number": self.horse_number(),
-                "corner_orders": self.corner_orders(),
-                "arrival_order": self.arrival_order(),
-                "pop_order": self.pop_order(),
-                "horse_weight": self.horse_weight(),
-                "load_weight": self.load_weight(),
-                "time": self.total_time(),
-                "final_push_time": self.final_push_time(),
-                "win_odds": self.win_odds(),
-                "prize": self.prize(),
-            }
-        )
+        with metrics.timer("race_result.extract"):
+            return pd.DataFrame.from_dict(
+                {
+                    "race_id": [self.race_id()] * self.horse_count(),
+                    "horse_id": self.horse_id(),
+                    "jockey_id": self.jockey_id(),
+                    "bracket_number": self.bracket_number(),
+                    "horse_number": self.horse_number(),
+                    "corner_orders": self.corner_orders(),
+                    "arrival_order": self.arrival_order(),
+                    "pop_order": self.pop_order(),
+                    "horse_weight": self.horse_weight(),
+                    "load_weight": self.load_weight(),
+                    "time": self.total_time(),
+                    "final_push_time": self.final_push_time(),
+                    "win_odds": self.win_odds(),
+                    "prize": self.prize(),
+                }
+            )
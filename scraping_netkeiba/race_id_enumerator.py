@@ -0,0 +1,148 @@
+import datetime
+import json
+import logging
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Generator, Iterator, Optional
+
+from scraping_netkeiba import race_list
+from scraping_netkeiba.client import Client, RaceListParam, RaceSumParam
+from scraping_netkeiba.race_list import RaceList
+from scraping_netkeiba.race_sum import RaceSum
+from scraping_netkeiba.util import date_range
+
+
+class RaceIdEnumerator:
+    """
+    期間内のレースIDを列挙する
+
+    日別のレース一覧と競馬場・日別のレース一覧を並行して取得し、
+    見つかったレースIDを重複なく順次返す。リクエストの頻度は Client の
+    RateLimiter で制御される。
+
+    checkpoint_path を指定すると、列挙し終えた日とそのレースIDを追記していき、
+    次回はその日の取得を省略する。レースの無い日は、レースIDの無い日として記録する。
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        max_workers: int = 4,
+        checkpoint_path: Optional[str] = None,
+    ):
+        self.__client = client
+        self.__max_workers = max_workers
+        self.__checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+
+    def __load_checkpoint(self) -> dict[datetime.date, list[str]]:
+        if not self.__checkpoint_path or not self.__checkpoint_path.exists():
+            return {}
+        checkpoint: dict[datetime.date, list[str]] = {}
+        for line in self.__checkpoint_path.read_text().splitlines():
+            if line:
+                record = json.loads(line)
+                race_date = datetime.date.fromisoformat(record["date"])
+                checkpoint[race_date] = record["race_ids"]
+        return checkpoint
+
+    def __save_checkpoint(self, race_date: datetime.date, race_ids: list[str]):
+        if not self.__checkpoint_path:
+            return
+        self.__checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.__checkpoint_path.open("a") as f:
+            f.write(json.dumps({"date": race_date.isoformat(), "race_ids": race_ids}))
+            f.write("\n")
+
+    def __race_sum_params(self, race_date: datetime.date) -> list[RaceSumParam]:
+        html: str = self.__client.race_list(RaceListParam(race_date))
+        # レースの無い日は次の開催日の一覧が返る。その日のレースは無いものとして
+        # チェックポイントに記録し、次回は取得しない
+        page_date = race_list.title_date(html)
+        if page_date is not None and page_date != race_date:
+            return []
+        return RaceList(race_date, html).race_sum_params()
+
+    def __race_ids(self, param: RaceSumParam) -> list[str]:
+        html: str = self.__client.race_sum(param)
+        return [p.race_id for p in RaceSum(html).race_params()]
+
+    def enumerate(
+        self, start: datetime.date, to: datetime.date
+    ) -> Generator[str, None, None]:
+        """期間内のレースIDを返す
+
+        チェックポイントに記録済みの日のレースIDは取得せずに返す。
+
+        Args:
+            start (datetime.date): 開始日
+            to (datetime.date): 終了日（この日を含まない）
+
+        Yields:
+            str: レースID
+        """
+        checkpoint = self.__load_checkpoint()
+        seen: set[str] = set()
+        dates: list[datetime.date] = []
+        for d in date_range(start, to):
+            if d in checkpoint:
+                for race_id in checkpoint[d]:
+                    if race_id not in seen:
+                        seen.add(race_id)
+                        yield race_id
+            else:
+                dates.append(d)
+
+        remaining: dict[datetime.date, int] = {}
+        found: dict[datetime.date, list[str]] = {}
+        failed: set[datetime.date] = set()
+        date_iter: Iterator[datetime.date] = iter(dates)
+        race_sum_params: deque[tuple[datetime.date, RaceSumParam]] = deque()
+        futures: dict[Future, tuple[str, datetime.date]] = {}
+
+        def complete(race_date: datetime.date):
+            del remaining[race_date]
+            race_ids = found.pop(race_date)
+            if race_date not in failed:
+                self.__save_checkpoint(race_date, race_ids)
+
+        with ThreadPoolExecutor(max_workers=self.__max_workers) as executor:
+            while True:
+                # 競馬場別の一覧を優先して取得し、見つかったIDを早く返す
+                while len(futures) < self.__max_workers * 2:
+                    if race_sum_params:
+                        d, p = race_sum_params.popleft()
+                        futures[executor.submit(self.__race_ids, p)] = ("sum", d)
+                    elif (d := next(date_iter, None)) is not None:
+                        f = executor.submit(self.__race_sum_params, d)
+                        futures[f] = ("list", d)
+                    else:
+                        break
+                if not futures:
+                    break
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for f in done:
+                    kind, race_date = futures.pop(f)
+                    try:
+                        result = f.result()
+                    except Exception as e:
+                        logging.warning(f"An error occurred while enumerating: {e}")
+                        if kind == "list":
+                            continue
+                        failed.add(race_date)
+                        result = []
+
+                    if kind == "list":
+                        remaining[race_date] = len(result)
+                        found[race_date] = []
+                        race_sum_params.extend((race_date, p) for p in result)
+                    else:
+                        remaining[race_date] -= 1
+                        for race_id in result:
+                            found[race_date].append(race_id)
+                            if race_id not in seen:
+                                seen.add(race_id)
+                                yield race_id
+                    if remaining[race_date] == 0:
+                        complete(race_date)
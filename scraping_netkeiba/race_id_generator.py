@@ -0,0 +1,139 @@
+import datetime
+from typing import Callable, Generator, Iterable
+
+from scraping_netkeiba import url
+from scraping_netkeiba.client import Client, ICache
+from scraping_netkeiba.util import date_range
+
+JRA_TRACK_IDS = [f"{i:02}" for i in range(1, 11)]
+
+Probe = Callable[[str], bool]
+
+
+def is_jra_track(track_id: str) -> bool:
+    """中央競馬の競馬場か
+
+    中央競馬のレースIDは「年・競馬場・回・日目・レース番号」、
+    地方競馬のレースIDは「年・競馬場・月・日・レース番号」で構成される。
+    """
+    return track_id in JRA_TRACK_IDS
+
+
+def cache_probe(cache: ICache) -> Probe:
+    """キャッシュにレース結果ページがあるかでレースの有無を判定する"""
+    return lambda race_id: bool(cache.exists(url.race(race_id)))
+
+
+def remote_probe(client: Client) -> Probe:
+    """レース結果ページがあるかを、本文を取得せずに netkeiba.com に確かめる
+
+    キャッシュ済みのページは確かめない。リクエストは client の RateLimiter の
+    間隔を守り、同じレースIDは一度しか確かめない。
+    """
+    return lambda race_id: client.exists(url.race(race_id))
+
+
+class RaceIdGenerator:
+    """
+    レース一覧ページを取得せずに、レースIDを組み合わせから予測する
+
+    回数・日数・レース数の上限は既定値と、既知のレースIDから学習した
+    競馬場ごとの最大値の大きい方にする。学習したレースIDに無い回や日も
+    候補に含めるためで、その範囲の候補を probe で確かめながら返す。
+    レースが見つからなければその日・その回の残りの候補は確かめないので、
+    上限が大きくても確かめる候補はあまり増えない。
+    """
+
+    def __init__(self, max_meeting: int = 6, max_day: int = 12, max_race: int = 12):
+        self.__default_limits = (max_meeting, max_day, max_race)
+        self.__limits: dict[str, tuple[int, int, int]] = {}
+
+    def learn(self, race_ids: Iterable[str]) -> None:
+        """既知のレースIDから競馬場ごとの上限を学習する
+
+        学習した値が既定値より小さい場合は既定値を使う。
+
+        Args:
+            race_ids (Iterable[str]): レースID
+        """
+        for race_id in race_ids:
+            track_id = race_id[4:6]
+            if not race_id[6:].isdigit():
+                continue
+            meeting, day, race = (
+                int(race_id[6:8]),
+                int(race_id[8:10]),
+                int(race_id[10:]),
+            )
+            m, d, r = self.__limits.get(track_id, (0, 0, 0))
+            if is_jra_track(track_id):
+                self.__limits[track_id] = (max(m, meeting), max(d, day), max(r, race))
+            else:
+                self.__limits[track_id] = (m, d, max(r, race))
+
+    def limits(self, track_id: str) -> tuple[int, int, int]:
+        """競馬場の回数・日数・レース数の上限"""
+        learned = self.__limits.get(track_id, (0, 0, 0))
+        return tuple(max(v, d) for v, d in zip(learned, self.__default_limits))
+
+    def candidates(
+        self, year: int, track_ids: Iterable[str]
+    ) -> Generator[str, None, None]:
+        """上限の範囲で考えられる全てのレースIDを返す
+
+        Args:
+            year (int): 年
+            track_ids (Iterable[str]): 競馬場ID
+
+        Yields:
+            str: レースID
+        """
+        for track_id in track_ids:
+            for prefix in self.__day_prefixes(year, track_id):
+                for race in range(1, self.limits(track_id)[2] + 1):
+                    yield f"{prefix}{race:02}"
+
+    def __day_prefixes(self, year: int, track_id: str) -> Generator[str, None, None]:
+        if is_jra_track(track_id):
+            max_meeting, max_day, _ = self.limits(track_id)
+            for meeting in range(1, max_meeting + 1):
+                for day in range(1, max_day + 1):
+                    yield f"{year}{track_id}{meeting:02}{day:02}"
+        else:
+            for d in date_range(
+                datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)
+            ):
+                yield f"{year}{track_id}{d.strftime('%m%d')}"
+
+    def generate(
+        self, year: int, track_ids: Iterable[str], probe: Probe
+    ) -> Generator[str, None, None]:
+        """実在するレースIDを probe で確かめながら返す
+
+        Args:
+            year (int): 年
+            track_ids (Iterable[str]): 競馬場ID
+            probe (Probe): レースIDのレースが存在するかを返す関数
+
+        Yields:
+            str: レースID
+        """
+        for track_id in track_ids:
+            max_race: int = self.limits(track_id)[2]
+            skip_meeting: str = ""
+            for prefix in self.__day_prefixes(year, track_id):
+                meeting = prefix[:8]
+                if meeting == skip_meeting:
+                    continue
+                found = False
+                for race in range(1, max_race + 1):
+                    race_id = f"{prefix}{race:02}"
+                    if not probe(race_id):
+                        break
+                    found = True
+                    yield race_id
+                if found or not is_jra_track(track_id):
+                    continue
+                # 中央競馬の日目は連番なので、見つからなければその回の残りの日は無い。
+                # 回は中止などで抜けることがあるため、次の回は確かめる
+                skip_meeting = meeting
@@ -1,52 +1,71 @@
 import datetime
 import re
-from re import Match
-from typing import List
-
-from bs4 import BeautifulSoup, Tag
+from typing import List, Optional
 
 from scraping_netkeiba import url
 from scraping_netkeiba.client import RaceSumParam
 
 TITLE_PATTERN = re.compile(r"^([0-9]{4}年[0-9]{2}月[0-9]{2}日).*")
+TITLE_TAG_PATTERN = re.compile(r"<title[^>]*>([^<]*)", re.IGNORECASE)
+RACE_SUM_HREF_PATTERN = re.compile(
+    r"""href=["']?""" + url.race_sum_pattern().pattern, re.IGNORECASE
+)
+# 開催ごとの一覧のブロックの開始タグ。中に div は無いため、次の </div> で終わる
+RACE_KAISAI_PATTERN = re.compile(
+    r'<div\b[^>]*\bclass=(?:"[^"]*\brace_kaisai\b[^"]*"'
+    r"|'[^']*\brace_kaisai\b[^']*'|race_kaisai\b)[^>]*>",
+    re.IGNORECASE,
+)
+
+
+def title_date(html: str) -> Optional[datetime.date]:
+    """レース一覧のページのタイトルの日付。タイトルが想定と違う場合は None
+
+    レースの無い日には次の開催日の一覧が返るため、指定した日と違うことがある。
+    """
+    title_tag: re.Match | None = TITLE_TAG_PATTERN.search(html)
+    title_text = title_tag.group(1).strip() if title_tag else ""
+    m: re.Match | None = TITLE_PATTERN.match(title_text)
+    if not m:
+        return None
+    return datetime.datetime.strptime(m.group(1), "%Y年%m月%d日").date()
 
 
 class RaceList:
     def __init__(self, race_date: datetime.date, html: str):
         self.__race_date = race_date
-        self.__soup = BeautifulSoup(html, "html.parser")
+        self.__html = html
         self.validate()
 
     def race_date(self) -> datetime.date:
         return self.__race_date
 
     def race_sum_params(self) -> List[RaceSumParam]:
-        race_kaisai_tags: List[Tag] = self.__soup.select("div.race_kaisai")
-        race_sum_a_tags: List[Tag] = [
-            a
-            for t in race_kaisai_tags
-            for a in t.find_all("a", href=lambda x: url.race_sum_pattern().match(x))
-        ]
-        race_sum_hrefs: List[str] = [t.get("href") for t in race_sum_a_tags]
-        race_sum_href_matches: List[Match] = [
-            url.race_sum_pattern().match(v) for v in race_sum_hrefs
-        ]
-        race_sum_params: List[RaceSumParam] = [
-            RaceSumParam(
-                m.group(1), datetime.datetime.strptime(m.group(2), "%Y%m%d").date()
-            )
-            for m in race_sum_href_matches
-        ]
+        # レース一覧はリンクのみのページなので、パースせずにHTML文字列から直接探す。
+        # カレンダーやフッターのリンクを拾わないよう、開催ごとのブロックの中だけを見る
+        dates: dict[str, datetime.date] = {}
+        race_sum_params: List[RaceSumParam] = []
+        for block in RACE_KAISAI_PATTERN.finditer(self.__html):
+            start: int = block.end()
+            end: int = self.__html.find("</div>", start)
+            if end < 0:
+                end = len(self.__html)
+            for m in RACE_SUM_HREF_PATTERN.finditer(self.__html, start, end):
+                track_id, date = m.group(1, 2)
+                if date not in dates:
+                    dates[date] = datetime.date(
+                        int(date[:4]), int(date[4:6]), int(date[6:])
+                    )
+                race_sum_params.append(RaceSumParam(track_id, dates[date]))
         return race_sum_params
 
     def validate(self):
-        title_tag = self.__soup.find("title")
-        title_text = title_tag.text.strip()
-        m: re.Match | None = re.match(r"^([0-9]{4}年[0-9]{2}月[0-9]{2}日).*", title_text)
-        if not m:
+        race_date = title_date(self.__html)
+        if race_date is None:
+            title_tag: re.Match | None = TITLE_TAG_PATTERN.search(self.__html)
+            title_text = title_tag.group(1).strip() if title_tag else ""
             raise Exception(f"Unexpected title text: {title_text}")
 
-        race_date = datetime.datetime.strptime(m.group(1), "%Y年%m月%d日").date()
         if self.__race_date != race_date:
             raise Exception(
                 f'Invalid race date: expected "{self.__race_date}", got "{race_date}"'
@@ -1,25 +1,35 @@
-from re import Match
+import re
 from typing import List
 
-from bs4 import BeautifulSoup, Tag
-
 from scraping_netkeiba import url
 from scraping_netkeiba.client import RaceParam
 
+RACE_HREF_PATTERN = re.compile(
+    r"""href=["']?""" + url.race_patten().pattern, re.IGNORECASE
+)
+# レース一覧の表の開始タグ。class は "race_table_01 nk_tb_common" のように複数ある
+RACE_TABLE_PATTERN = re.compile(
+    r'<table\b[^>]*\bclass=(?:"[^"]*\brace_table_01\b[^"]*"'
+    r"|'[^']*\brace_table_01\b[^']*'|race_table_01\b)[^>]*>",
+    re.IGNORECASE,
+)
+
 
 class RaceSum:
     def __init__(self, html: str):
-        self.__soup = BeautifulSoup(html, "html.parser")
+        self.__html = html
 
     def race_params(self) -> List[RaceParam]:
-        race_table_tag: Tag = self.__soup.select_one("table.race_table_01")
-        race_a_tags: List[Tag] = race_table_tag.find_all(
-            "a", href=lambda x: url.race_patten().match(x)
-        )
-        race_href_matches: List[Match] = [
-            url.race_patten().match(t.get("href")) for t in race_a_tags
-        ]
+        # レース一覧はリンクのみのページなので、パースせずにHTML文字列から直接探す
+        table: re.Match | None = RACE_TABLE_PATTERN.search(self.__html)
+        if not table:
+            raise Exception("Race table is not found")
+        start: int = table.end()
+        end: int = self.__html.find("</table>", start)
         race_params: List[RaceParam] = [
-            RaceParam(m.group(1)) for m in race_href_matches
+            RaceParam(m.group(1))
+            for m in RACE_HREF_PATTERN.finditer(
+                self.__html, start, end if end >= 0 else len(self.__html)
+            )
         ]
         return race_params
@@ -0,0 +1,178 @@
+import logging
+import os
+from pathlib import Path
+from typing import Iterable, Literal, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.ipc as ipc
+
+from scraping_netkeiba.parquet_sink import RACE_RESULT, TableSpec
+from scraping_netkeiba.race import Race
+
+Format = Literal["arrow", "csv"]
+
+
+class StreamWriter:
+    """
+    DataFrame を受け取った順に、決まった行数のレコードバッチとして1つのファイルに書き出す
+
+    溜めておくのは batch_size 行未満だけなので、書き出す行の総数によらず
+    メモリ使用量は一定になる。format が "arrow" の場合は Arrow IPC の
+    ファイル形式で、圧縮しないため read でメモリマップして読める。
+
+    書き込み中は <path>.tmp に書き、close で path に置き換える。途中で
+    止まった場合は path は作られない（前回のファイルがあればそのまま残る）。
+    with 文の中で例外が起きた場合は、書きかけのファイルを消す。
+
+    Pipeline の sink として使える。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        spec: TableSpec = RACE_RESULT,
+        batch_size: int = 10_000,
+        format: Format = "arrow",
+    ):
+        if format not in ["arrow", "csv"]:
+            raise Exception(f"Unsupported format: {format}")
+        self.__path = Path(path)
+        self.__tmp_path = self.__path.with_name(f"{self.__path.name}.tmp")
+        self.__schema = spec.schema
+        self.__batch_size = batch_size
+        self.__format = format
+        self.__buffer: list[pa.Table] = []
+        self.__buffered_rows = 0
+        self.__rows = 0
+        self.__path.parent.mkdir(parents=True, exist_ok=True)
+        self.__writer = (
+            ipc.new_file(str(self.__tmp_path), self.__schema)
+            if format == "arrow"
+            else pa_csv.CSVWriter(str(self.__tmp_path), self.__schema)
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def __call__(self, df: pd.DataFrame) -> None:
+        self.write(df)
+
+    def rows(self) -> int:
+        """書き出した行数"""
+        return self.__rows
+
+    def write(self, df: pd.DataFrame) -> None:
+        """DataFrame を溜め、batch_size 行ずつ書き出す"""
+        if df is None or df.empty:
+            return
+        self.__buffer.append(
+            pa.Table.from_pandas(df, schema=self.__schema, preserve_index=False)
+        )
+        self.__buffered_rows += len(df)
+        if self.__buffered_rows >= self.__batch_size:
+            self.__flush(full_batches_only=True)
+
+    def __flush(self, full_batches_only: bool) -> None:
+        if not self.__buffer:
+            return
+        table = pa.concat_tables(self.__buffer).combine_chunks()
+        self.__buffer.clear()
+        offset = 0
+        while len(table) - offset >= self.__batch_size or (
+            not full_batches_only and offset < len(table)
+        ):
+            batch = table.slice(offset, self.__batch_size).to_batches()[0]
+            self.__writer.write_batch(batch)
+            offset += len(batch)
+        self.__rows += offset
+        # 書き出せなかった端数は次のバッチに回す
+        rest = table.slice(offset)
+        self.__buffered_rows = len(rest)
+        if len(rest):
+            self.__buffer.append(rest)
+
+    def close(self) -> None:
+        """残りの行を書き出し、ファイルを閉じて path に置き換える"""
+        if self.__writer is None:
+            return
+        self.__flush(full_batches_only=False)
+        self.__writer.close()
+        self.__writer = None
+        os.replace(self.__tmp_path, self.__path)
+
+    def discard(self) -> None:
+        """書きかけのファイルを閉じて消す。path は変更しない"""
+        if self.__writer is None:
+            return
+        self.__buffer.clear()
+        self.__buffered_rows = 0
+        self.__writer.close()
+        self.__writer = None
+        self.__tmp_path.unlink(missing_ok=True)
+
+
+def write_race_results(
+    races: Iterable[Race],
+    path: str,
+    batch_size: int = 10_000,
+    format: Format = "arrow",
+) -> int:
+    """レースを1つずつ race_result の表にし、ファイルに書き出す
+
+    パースに失敗したレースは警告を出して読み飛ばす。races をジェネレーターに
+    すれば、レースの数によらずメモリ使用量は一定になる。
+
+    Args:
+        races (Iterable[Race]): レース
+        path (str): 出力先
+        batch_size (int): 1つのレコードバッチの行数
+        format (Format): "arrow" または "csv"
+
+    Returns:
+        int: 書き出した行数
+    """
+    with StreamWriter(path, RACE_RESULT, batch_size, format) as writer:
+        for race in races:
+            try:
+                df = race.race_result_as_dataframe()
+            except Exception as e:
+                logging.warning(f"An error occurred while scraping Race: {e}")
+                continue
+            writer.write(df)
+    return writer.rows()
+
+
+def read(
+    path: str, spec: TableSpec = RACE_RESULT, format: Optional[Format] = None
+) -> pa.Table:
+    """StreamWriter で書き出したファイルを読み込む
+
+    Arrow IPC のファイルはメモリマップして読むため、ファイルより大きい
+    メモリは使わず、列は必要になったときにディスクから読まれる。
+    CSVは spec の型で読み込む。
+
+    Args:
+        path (str): ファイル
+        spec (TableSpec): 表の定義。CSVの場合だけ使う
+        format (Optional[Format]): 省略時は拡張子が .csv なら "csv"、それ以外は "arrow"
+
+    Returns:
+        pa.Table: 表
+    """
+    format = format or ("csv" if Path(path).suffix == ".csv" else "arrow")
+    if format == "arrow":
+        return ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return pa_csv.read_csv(
+        path,
+        convert_options=pa_csv.ConvertOptions(
+            column_types={v.name: v.type for v in spec.schema}
+        ),
+    )
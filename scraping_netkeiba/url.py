@@ -1,8 +1,8 @@
 import datetime
 import re
 from functools import cache
-from typing import Self, Union
-from urllib.parse import urlencode, urlparse, urlunparse
+from typing import Iterable, NamedTuple, Optional, Self, Union
+from urllib.parse import urlencode
 
 BASE_URL = "https://db.netkeiba.com"
 
@@ -17,21 +17,31 @@ def _assert_pattern(pattern: re.Pattern, string: str) -> str:
     )
 
 
-def _match_pattern(pattern: re.Pattern, string: str) -> re.Match:
-    if m := pattern.match(string):
-        return m
-    raise ValueError(
-        'Unexpected URL path pattern: expected "{}", got "{}"'.format(
-            pattern.pattern, string
-        )
-    )
-
-
 def _generate(path: str, params: dict[str, Union[str, int, float]] = None) -> str:
-    url = list(urlparse(BASE_URL))
-    url[2] = path
-    url[4] = urlencode(params) if params else ""
-    return urlunparse(url)
+    # BASE_URL はパスもクエリも持たないため、連結するだけでよい
+    return f"{BASE_URL}{path}?{urlencode(params)}" if params else BASE_URL + path
+
+
+def _generate_all(path: str, id_pattern: str, ids: Iterable[str]) -> list[str]:
+    # IDを改行で繋げて一度の fullmatch で検証し、URLは連結で作る。
+    # 改行を含むIDは2つのIDに見えるため、改行の数も確かめる。
+    # 不正なIDがある場合だけ、どのIDかを探す
+    ids = list(ids)
+    if not ids:
+        return []
+    joined = "\n".join(ids)
+    if joined.count("\n") != len(ids) - 1 or not re.fullmatch(
+        rf"(?:{id_pattern}\n)*{id_pattern}", joined
+    ):
+        for v in ids:
+            if not re.fullmatch(id_pattern, v):
+                raise ValueError(
+                    'Unexpected ID pattern: expected "{}", got "{}"'.format(
+                        id_pattern, v
+                    )
+                )
+    prefix = BASE_URL + path
+    return [f"{prefix}{v}/" for v in ids]
 
 
 class Race:
@@ -40,8 +50,14 @@ class Race:
 
     @classmethod
     def parse(cls, url: str) -> Self:
-        m = _match_pattern(cls.__url_pattern, url.replace(BASE_URL, ""))
-        return Race(m.group(1))
+        r = route(url)
+        if r is None or r.page_type != "race":
+            raise ValueError(
+                'Unexpected URL path pattern: expected "{}", got "{}"'.format(
+                    cls.__url_pattern.pattern, url
+                )
+            )
+        return Race(r.ids[0])
 
     def __init__(self, race_id: str):
         self.__race_id: str = _assert_pattern(self.__race_id_pattern, race_id)
@@ -155,17 +171,94 @@ def recent_jockey_result(jockey_id: str) -> str:
     )
 
 
+class Route(NamedTuple):
+    page_type: str
+    ids: tuple[str, ...]
+
+
+# ページ種別と、そのURLのパスのパターン
+_ROUTES: list[tuple[str, re.Pattern]] = [
+    ("race", race_patten()),
+    ("race_list", race_list_patten()),
+    ("race_sum", race_sum_pattern()),
+    ("horse", horse_pattern()),
+    ("horse_result", horse_result_pattern()),
+    ("horse_ped", horse_ped_pattern()),
+    ("breeder", breeder_pattern()),
+    ("owner", owner_pattern()),
+    ("trainer", trainer_pattern()),
+    ("recent_jockey_result", recent_jockey_result_pattern()),
+]
+
+
+def _compile_router() -> tuple[re.Pattern, dict[str, tuple[str, tuple[int, ...]]]]:
+    # 全てのパターンを名前付きグループの選択にまとめ、一度の match で判定する。
+    # 各パターンのIDのグループが、まとめたパターンで何番目になるかを覚えておく
+    alternatives: list[str] = []
+    groups: dict[str, tuple[str, tuple[int, ...]]] = {}
+    index = 1
+    for page_type, pattern in _ROUTES:
+        name = f"_{len(alternatives)}"
+        alternatives.append(f"(?P<{name}>{pattern.pattern})")
+        groups[name] = (page_type, tuple(range(index + 1, index + 1 + pattern.groups)))
+        index += 1 + pattern.groups
+    base_url = re.escape(BASE_URL)
+    return (
+        re.compile(rf"(?:{base_url})?(?:{'|'.join(alternatives)})(?:[?#]|$)"),
+        groups,
+    )
+
+
+_router_pattern, _router_groups = _compile_router()
+
+
+def route(url: str) -> Optional[Route]:
+    """URLのページ種別とIDを返す
+
+    全てのページ種別のパターンを1つの正規表現にまとめてあるため、
+    リンクの抽出のように大量のURLを判定する場合に使う。
+
+    Args:
+        url (str): URLまたはURLのパス
+
+    Returns:
+        Optional[Route]: ページ種別とID。該当するページ種別が無い場合は None
+    """
+    m = _router_pattern.match(url)
+    if m is None:
+        return None
+    page_type, indices = _router_groups[m.lastgroup]
+    return Route(page_type, tuple(m.group(i) for i in indices))
+
+
 def parse(path: str) -> str:
-    patterns = [
-        breeder_pattern(),
-        horse_pattern(),
-        horse_ped_pattern(),
-        horse_result_pattern(),
-        owner_pattern(),
-        race_sum_pattern(),
-        trainer_pattern(),
-    ]
-    for p in patterns:
-        if p.match(path):
-            return _generate(path)
-    raise ValueError(f"Unsupported URL path: {path}")
+    if route(path) is None:
+        raise ValueError(f"Unsupported URL path: {path}")
+    return _generate(path)
+
+
+_RACE_ID_PATTERN = r"[a-zA-Z0-9]{12}"
+_HORSE_ID_PATTERN = r"[a-zA-Z0-9]{10}"
+
+
+def race_urls(race_ids: Iterable[str]) -> list[str]:
+    """レースIDのリストからレース結果ページのURLをまとめて作る
+
+    url.race を繰り返し呼ぶより速い。不正なIDがある場合は ValueError
+    """
+    return _generate_all("/race/", _RACE_ID_PATTERN, race_ids)
+
+
+def horse_urls(horse_ids: Iterable[str]) -> list[str]:
+    """馬IDのリストから馬ページのURLをまとめて作る"""
+    return _generate_all("/horse/", _HORSE_ID_PATTERN, horse_ids)
+
+
+def horse_result_urls(horse_ids: Iterable[str]) -> list[str]:
+    """馬IDのリストから競走成績ページのURLをまとめて作る"""
+    return _generate_all("/horse/result/", _HORSE_ID_PATTERN, horse_ids)
+
+
+def horse_ped_urls(horse_ids: Iterable[str]) -> list[str]:
+    """馬IDのリストから血統ページのURLをまとめて作る"""
+    return _generate_all("/horse/ped/", _HORSE_ID_PATTERN, horse_ids)
@@ -1,10 +1,16 @@
 import datetime
-from concurrent.futures import ProcessPoolExecutor
-from typing import Callable, Generator, Iterable, Optional, ParamSpec, TypeVar
+import hashlib
+import itertools
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Generator, Iterable, Optional, ParamSpec, TypeVar
 
 from bs4 import BeautifulSoup, Comment
 from tqdm import tqdm
 
+from scraping_netkeiba import metrics
+
 
 def date_range(
     start: datetime.date, to: datetime.date
@@ -41,19 +47,120 @@ def minify_html(html: str) -> str:
     return str(soup)
 
 
+def content_hash(html: str) -> str:
+    """HTMLの内容のハッシュ値。ページが変わったかの判定に使う"""
+    return hashlib.blake2b(html.encode(), digest_size=16).hexdigest()
+
+
 P = ParamSpec("P")
 R = TypeVar("R")
 
 
+def _apply_chunk(
+    function: Callable[P, R], chunk: list, collect_metrics: bool = False
+) -> tuple[list[R], Optional[dict[str, metrics.StageStat]]]:
+    if not collect_metrics:
+        return [function(v) for v in chunk], None
+    # 親プロセスで計測が有効な場合は、このまとまりの分の記録を返す
+    metrics.enable()
+    metrics.reset()
+    results = [function(v) for v in chunk]
+    return results, metrics.snapshot()
+
+
+def chunked(iterables: Iterable, chunksize: int) -> Generator[list, None, None]:
+    """chunksize 件ずつ list にまとめて返す"""
+    iterator = iter(iterables)
+    while chunk := list(itertools.islice(iterator, chunksize)):
+        yield chunk
+
+
+def parallel_imap(
+    function: Callable[P, R],
+    iterables: Iterable,
+    desc: Optional[str] = None,
+    chunksize: int = 1,
+    max_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    initializer: Optional[Callable[..., Any]] = None,
+    initargs: tuple = (),
+    ordered: bool = True,
+) -> Generator[R, None, None]:
+    """関数を複数プロセスで並列に適用し、結果を順次返す
+
+    入力は chunksize 件ずつまとめてプロセスに渡し、同時に処理中のまとまりは
+    max_in_flight 個までに抑える。入力を全て読み込まずに処理するため、
+    入力や結果の件数が多くてもメモリ使用量が増えない。
+    metrics が有効な場合は、各プロセスの記録をこのプロセスにまとめる。
+
+    Args:
+        function (Callable[P, R]): 適用する関数。pickle できる必要がある
+        iterables (Iterable): 入力
+        desc (Optional[str]): 進捗バーの説明
+        chunksize (int): 1回にプロセスに渡す件数
+        max_workers (Optional[int]): プロセス数
+        max_in_flight (Optional[int]): 同時に処理するまとまりの数。省略時はプロセス数の2倍
+        initializer (Optional[Callable[..., Any]]): 各プロセスの開始時に呼ぶ関数
+        initargs (tuple): initializer の引数
+        ordered (bool): 入力の順に結果を返すか。False の場合は終わった順に返す
+
+    Yields:
+        R: 結果
+    """
+    total: Optional[int] = len(iterables) if hasattr(iterables, "__len__") else None
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or max_workers * 2
+    chunks = chunked(iterables, chunksize)
+    collect_metrics = metrics.enabled()
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=initializer, initargs=initargs
+    ) as executor, tqdm(total=total, desc=desc) as progress:
+        in_flight: deque[Future] = deque()
+        for chunk in itertools.islice(chunks, max_in_flight):
+            in_flight.append(
+                executor.submit(_apply_chunk, function, chunk, collect_metrics)
+            )
+        while in_flight:
+            if ordered:
+                done: list[Future] = [in_flight.popleft()]
+            else:
+                completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                done = [f for f in in_flight if f in completed]
+                for f in done:
+                    in_flight.remove(f)
+            for f in done:
+                results, stats = f.result()
+                if stats:
+                    metrics.merge(stats)
+                for chunk in itertools.islice(chunks, 1):
+                    in_flight.append(
+                        executor.submit(_apply_chunk, function, chunk, collect_metrics)
+                    )
+                progress.update(len(results))
+                yield from results
+
+
 def parallel_map(
-    function: Callable[P, R], iterables: Iterable, desc: Optional[str] = None
+    function: Callable[P, R],
+    iterables: Iterable,
+    desc: Optional[str] = None,
+    chunksize: int = 1,
+    max_workers: Optional[int] = None,
+    initializer: Optional[Callable[..., Any]] = None,
+    initargs: tuple = (),
 ) -> list[R]:
-    list_from_iter = list(iterables)
-    with ProcessPoolExecutor() as thread:
-        return list(
-            tqdm(
-                thread.map(function, list_from_iter),
-                total=len(list_from_iter),
-                desc=desc,
-            )
+    """関数を複数プロセスで並列に適用し、結果を入力の順に list で返す
+
+    引数は parallel_imap と同じ。
+    """
+    return list(
+        parallel_imap(
+            function,
+            iterables,
+            desc=desc,
+            chunksize=chunksize,
+            max_workers=max_workers,
+            initializer=initializer,
+            initargs=initargs,
         )
+    )
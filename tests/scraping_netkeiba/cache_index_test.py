@@ -0,0 +1,96 @@
+import os.path
+import shutil
+from pathlib import Path
+
+import pytest
+
+from scraping_netkeiba import url
+from scraping_netkeiba.cache_index import BloomFilter, IndexedCache
+from scraping_netkeiba.client import Cache
+from scraping_netkeiba.manifest import Manifest, ManifestCache
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data"
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"race/{i:012}".encode())
+    assert all(f"race/{i:012}".encode() in bloom for i in range(1000))
+    false_positives = sum(f"horse/{i:010}".encode() in bloom for i in range(10000))
+    assert false_positives < 300
+    restored = BloomFilter.from_bytes(bloom.to_bytes())
+    assert len(restored) == 1000
+    assert all(f"race/{i:012}".encode() in restored for i in range(1000))
+
+
+def test_cache_urls(tmp_path):
+    shutil.copytree(data_dir / "horse_ped", tmp_path / "horse/ped")
+    assert sorted(Cache(str(tmp_path)).urls()) == sorted(
+        url.horse_ped(p.stem) for p in (data_dir / "horse_ped").glob("*.html")
+    )
+
+
+@pytest.fixture
+def cache(tmp_path) -> Cache:
+    shutil.copytree(data_dir / "race", tmp_path / "cache/race")
+    return Cache(str(tmp_path / "cache"))
+
+
+def test_indexed_cache_rebuild(tmp_path, cache):
+    indexed = IndexedCache(cache, str(tmp_path / "index"), capacity=1000)
+    # 索引を通さずに書き込んだページは rebuild するまで索引に無い
+    Cache(str(tmp_path / "cache")).write(url.horse("2018105460"), "<html></html>")
+    assert not indexed.might_exist(url.horse("2018105460"))
+    indexed.rebuild()
+    assert indexed.might_exist(url.horse("2018105460"))
+    assert indexed.exists(url.race("202105010101"))
+    assert indexed.missing([url.race("202105010101"), url.race("202105010102")]) == [
+        url.race("202105010102")
+    ]
+    indexed.close()
+
+
+def test_indexed_cache_wraps_populated_cache(tmp_path, cache):
+    # 索引が無ければ、キャッシュ済みのページから作る
+    race_ids = [p.stem for p in (data_dir / "race").glob("*.html")]
+    indexed = IndexedCache(cache, str(tmp_path / "index"), capacity=1000)
+    assert all(indexed.exists(url.race(v)) for v in race_ids)
+    assert indexed.missing([url.race(v) for v in race_ids]) == []
+    indexed.close()
+    assert (tmp_path / "index/bloom.bin").exists()
+
+
+def test_indexed_cache_falls_back_without_index(tmp_path, cache):
+    # 走査できないキャッシュでは rebuild するまでキャッシュを確認する
+    manifest = Manifest(str(tmp_path / "manifest.sqlite"))
+    indexed = IndexedCache(
+        ManifestCache(cache, manifest), str(tmp_path / "index"), capacity=1000
+    )
+    assert indexed.exists(url.race("202105010101"))
+    assert not indexed.exists(url.race("202105010102"))
+    indexed.rebuild([url.race("202105010101")])
+    assert indexed.missing([url.race("202105010101"), url.race("202105010102")]) == [
+        url.race("202105010102")
+    ]
+    indexed.close()
+    manifest.close()
+
+
+def test_indexed_cache_write_persists(tmp_path, cache):
+    index_dir = str(tmp_path / "index")
+    indexed = IndexedCache(cache, index_dir, capacity=1000)
+    indexed.rebuild()
+    indexed.write(url.horse("2018105460"), "<html></html>")
+    assert indexed.read(url.horse("2018105460")) == "<html></html>"
+    indexed.close()
+
+    # 追記ログから save 後の書き込みも復元される
+    reopened = IndexedCache(cache, index_dir)
+    assert reopened.might_exist(url.horse("2018105460"))
+    assert reopened.might_exist(url.race("202105010101"))
+    assert not reopened.might_exist(url.horse("2018105461"))
+    reopened.save()
+    reopened.close()
+    assert IndexedCache(cache, index_dir).might_exist(url.horse("2018105460"))
@@ -0,0 +1,154 @@
+import time
+from typing import Callable
+
+import pytest
+import requests
+
+from scraping_netkeiba.client import Cache, Client, RaceParam, RateLimiter
+from tests.scraping_netkeiba.conftest import FakeResponse
+
+
+def test_client_default_base_url(requested):
+    Client(rate_limiter=RateLimiter(0)).race(RaceParam("202105010101"))
+    assert requested == ["https://db.netkeiba.com/race/202105010101/"]
+
+
+def test_client_base_url(tmp_path, requested):
+    cache = Cache(str(tmp_path))
+    client = Client(cache, RateLimiter(0), base_url="http://127.0.0.1:8000/")
+    actual = client.race(RaceParam("202105010101"))
+    assert requested == ["http://127.0.0.1:8000/race/202105010101/"]
+    # キャッシュは netkeiba.com のURLで保存する
+    assert cache.read("https://db.netkeiba.com/race/202105010101/") == actual
+    client.race(RaceParam("202105010101"))
+    assert len(requested) == 1
+
+
+def test_rate_limiter_wait():
+    rate_limiter = RateLimiter(0.05)
+    start = time.monotonic()
+    for _ in range(4):
+        rate_limiter.wait()
+    assert time.monotonic() - start >= 0.15
+
+
+def test_client_waits_before_request(requested):
+    client = Client(rate_limiter=RateLimiter(0.2))
+    start = time.monotonic()
+    client.race(RaceParam("202105010101"))
+    # 最初のリクエストは待たずに送り、送った後にも待たない
+    assert time.monotonic() - start < 0.2
+    client.race(RaceParam("202105010102"))
+    # 次のリクエストを送る前に、前のリクエストから interval 秒待つ
+    assert time.monotonic() - start >= 0.2
+    assert len(requested) == 2
+
+
+@pytest.fixture
+def responses(monkeypatch) -> list[FakeResponse]:
+    # 先頭から順に返す
+    responses: list[FakeResponse] = []
+
+    def get(self, url, *args, **kwargs):
+        return responses.pop(0)
+
+    monkeypatch.setattr(requests.Session, "get", get)
+    return responses
+
+
+def test_client_does_not_cache_errors(tmp_path, responses):
+    cache = Cache(str(tmp_path))
+    client = Client(cache, RateLimiter(0))
+    responses += [FakeResponse("Internal Server Error", 500), FakeResponse("<html>")]
+    with pytest.raises(requests.HTTPError):
+        client.race(RaceParam("202105010101"))
+    assert not cache.exists("https://db.netkeiba.com/race/202105010101/")
+    assert client.race(RaceParam("202105010101")) == "<html>"
+    assert cache.exists("https://db.netkeiba.com/race/202105010101/")
+
+
+def test_client_retries_after_retry_after(responses):
+    client = Client(rate_limiter=RateLimiter(0))
+    responses += [
+        FakeResponse("Too Many Requests", 429, {"Retry-After": "1"}),
+        FakeResponse("<html>"),
+    ]
+    start = time.monotonic()
+    assert client.race(RaceParam("202105010101")) == "<html>"
+    assert time.monotonic() - start >= 1
+    assert responses == []
+
+
+def test_client_retries_service_unavailable(tmp_path, responses):
+    cache = Cache(str(tmp_path))
+    client = Client(cache, RateLimiter(0))
+    # 過ぎた日時が指定されていれば待たない
+    responses += [
+        FakeResponse(
+            "Service Unavailable", 503, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}
+        ),
+        FakeResponse("<html>"),
+    ]
+    assert client.race(RaceParam("202105010101")) == "<html>"
+    assert responses == []
+    assert cache.read("https://db.netkeiba.com/race/202105010101/") == "<html>"
+
+
+def test_client_gives_up_retrying(responses):
+    client = Client(rate_limiter=RateLimiter(0), max_retries=2)
+    responses += [
+        FakeResponse("Too Many Requests", 429, {"Retry-After": "0"}) for _ in range(3)
+    ]
+    with pytest.raises(requests.HTTPError):
+        client.race(RaceParam("202105010101"))
+    assert responses == []
+
+
+@pytest.fixture
+def respond_head() -> Callable[[str], FakeResponse]:
+    # 202105010101 だけが存在し、202105019999 はサーバーエラーになる
+    def respond(url: str) -> FakeResponse:
+        if url.endswith("/202105010101/"):
+            return FakeResponse("")
+        if url.endswith("/202105019999/"):
+            return FakeResponse("", 500)
+        return FakeResponse("", 404)
+
+    return respond
+
+
+def test_client_exists(tmp_path, heads):
+    cache = Cache(str(tmp_path))
+    cache.write("https://db.netkeiba.com/race/202105010102/", "<html>")
+    client = Client(cache, RateLimiter(0))
+    # キャッシュにあるページは確かめない
+    assert client.exists("https://db.netkeiba.com/race/202105010102/")
+    assert heads == []
+    assert client.exists("https://db.netkeiba.com/race/202105010101/")
+    assert not client.exists("https://db.netkeiba.com/race/202105010103/")
+    # 結果を覚えていて送り直さない
+    assert client.exists("https://db.netkeiba.com/race/202105010101/")
+    assert not client.exists("https://db.netkeiba.com/race/202105010103/")
+    assert heads == [
+        "https://db.netkeiba.com/race/202105010101/",
+        "https://db.netkeiba.com/race/202105010103/",
+    ]
+    # 本文は取得しないのでキャッシュしない
+    assert not cache.exists("https://db.netkeiba.com/race/202105010101/")
+
+
+def test_client_exists_error(heads):
+    client = Client(rate_limiter=RateLimiter(0))
+    # 存在しないとは分からないので、覚えずに例外を投げる
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            client.exists("https://db.netkeiba.com/race/202105019999/")
+    assert len(heads) == 2
+
+
+def test_client_exists_rate_limited(heads):
+    client = Client(rate_limiter=RateLimiter(0.1))
+    start = time.monotonic()
+    for i in range(3):
+        client.exists(f"https://db.netkeiba.com/race/20210501010{i + 3}/")
+    assert time.monotonic() - start >= 0.2
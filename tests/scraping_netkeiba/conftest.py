@@ -0,0 +1,62 @@
+from typing import Callable
+
+import pytest
+import requests
+
+from scraping_netkeiba.client import Cache
+
+
+class FakeResponse:
+    def __init__(self, text: str, status_code: int = 200, headers=None):
+        self.text = text
+        self.encoding = None
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class CountingCache(Cache):
+    def __init__(self, cache_dir: str):
+        super().__init__(cache_dir)
+        self.reads: list[str] = []
+
+    def read(self, url: str) -> str:
+        self.reads.append(url)
+        return super().read(url)
+
+
+@pytest.fixture
+def respond() -> Callable[[str], FakeResponse]:
+    # requested が GET に返すレスポンス。テストのモジュールで上書きする
+    return lambda url: FakeResponse(f"<html>{url}</html>")
+
+
+@pytest.fixture
+def requested(monkeypatch, respond) -> list[str]:
+    # GET したURLを記録し、ネットワークには接続しない
+    requested: list[str] = []
+
+    def get(self, url, *args, **kwargs):
+        requested.append(url)
+        return respond(url)
+
+    monkeypatch.setattr(requests.Session, "get", get)
+    return requested
+
+
+@pytest.fixture
+def respond_head() -> Callable[[str], FakeResponse]:
+    # heads が HEAD に返すレスポンス。テストのモジュールで上書きする
+    return lambda url: FakeResponse("", 404)
+
+
+@pytest.fixture
+def heads(monkeypatch, respond_head) -> list[str]:
+    # HEAD したURLを記録し、ネットワークには接続しない
+    heads: list[str] = []
+
+    def head(self, url, *args, **kwargs):
+        heads.append(url)
+        return respond_head(url)
+
+    monkeypatch.setattr(requests.Session, "head", head)
+    return heads
@@ -0,0 +1,136 @@
+import os.path
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+import pytest
+
+from scraping_netkeiba.client import Cache, Client, RateLimiter
+from scraping_netkeiba.entity_crawler import EntityCrawler, referenced_entity_ids
+from scraping_netkeiba.horse import Horse
+from scraping_netkeiba.manifest import Manifest, ManifestCache
+from scraping_netkeiba.race import Race
+from tests.scraping_netkeiba.conftest import FakeResponse
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data"
+
+
+@pytest.fixture
+def failing() -> set[str]:
+    # 取得に失敗させるID
+    return set()
+
+
+@pytest.fixture
+def respond(failing) -> Callable[[str], FakeResponse]:
+    def respond(url: str) -> FakeResponse:
+        name = url.rstrip("/").rsplit("/", 1)[1]
+        if name in failing:
+            return FakeResponse("Internal Server Error", 500)
+        return FakeResponse(
+            f"<div class=db_head_name><h1>name{name} <span>(kana)</span></h1></div>"
+            f"<a class=active href={url.removeprefix('https://db.netkeiba.com')}>TOP</a>"
+        )
+
+    return respond
+
+
+def frames() -> list[pd.DataFrame]:
+    races = [
+        Race(v, (data_dir / f"race/{v}.html").read_text()).race_result_as_dataframe()
+        for v in ["202105010101", "202106050907"]
+    ]
+    horses = [
+        Horse(v, (data_dir / f"horse/{v}.html").read_text()).as_dataframe()
+        for v in ["2018105460", "2018101711", "2018100299"]
+    ]
+    return races + horses
+
+
+def test_referenced_entity_ids():
+    ids = referenced_entity_ids(frames())
+    races, horses = frames()[:2], frames()[2:]
+    assert ids["jockey"] == sorted(set(pd.concat(races)["jockey_id"]))
+    assert ids["trainer"] == sorted(set(pd.concat(horses)["trainer_id"]))
+    assert ids["owner"] == sorted(set(pd.concat(horses)["owner_id"]))
+    assert ids["breeder"] == sorted(set(pd.concat(horses)["breeder_id"]))
+
+
+def test_entity_crawler_crawl(tmp_path, requested):
+    client = Client(Cache(str(tmp_path)), RateLimiter(0))
+    crawler = EntityCrawler(client)
+    ids = referenced_entity_ids(frames())
+    tables = crawler.crawl(ids)
+    assert len(requested) == sum(len(v) for v in ids.values())
+    assert len(requested) == len(set(requested))
+    assert sorted(tables["jockey"]["jockey_id"]) == ids["jockey"]
+    trainer_id = ids["trainer"][0]
+    row = tables["trainer"].set_index("trainer_id").loc[trainer_id]
+    assert row["name"] == f"name{trainer_id}"
+    assert row["name_kana"] == "kana"
+
+    # 取得済みのIDは取得し直さない
+    again = crawler.crawl(ids)
+    assert len(requested) == sum(len(v) for v in ids.values())
+    assert all(len(v) == 0 for v in again.values())
+
+
+def test_entity_crawler_retries_failed_ids(tmp_path, requested, failing):
+    client = Client(Cache(str(tmp_path)), RateLimiter(0))
+    crawler = EntityCrawler(client)
+    failing.add("01017")
+    tables = crawler.crawl({"trainer": ["01017", "01018"]})
+    failing.clear()
+    assert list(tables["trainer"]["trainer_id"]) == ["01018"]
+
+    # 失敗したIDだけ取得し直す
+    tables = crawler.crawl({"trainer": ["01017", "01018"]})
+    assert list(tables["trainer"]["trainer_id"]) == ["01017"]
+    assert sorted(requested) == [
+        "https://db.netkeiba.com/trainer/01017/",
+        "https://db.netkeiba.com/trainer/01017/",
+        "https://db.netkeiba.com/trainer/01018/",
+    ]
+
+
+def test_entity_crawler_manifest(tmp_path, requested, failing):
+    with Manifest(str(tmp_path / "manifest.sqlite")) as manifest:
+        cache = ManifestCache(Cache(str(tmp_path / "cache")), manifest)
+        crawler = EntityCrawler(Client(cache, RateLimiter(0)), manifest=manifest)
+        failing.add("01018")
+        crawler.crawl({"trainer": ["01017", "01018"], "owner": ["808800"]})
+        assert manifest.ids("trainer", parsed=True) == ["01017"]
+        assert manifest.ids("owner", parsed=True) == ["808800"]
+
+
+def test_entity_crawler_resume(tmp_path, requested, failing):
+    state_dir = str(tmp_path / "state")
+    client = Client(Cache(str(tmp_path / "cache")), RateLimiter(0))
+    failing.add("01018")
+    with EntityCrawler(client, state_dir=state_dir) as crawler:
+        crawler.crawl({"trainer": ["01017", "01018"]})
+    failing.clear()
+    requested.clear()
+
+    # キャッシュが無くても、前回パースできたIDは取得せず、失敗したIDは取得し直す
+    client = Client(Cache(str(tmp_path / "other")), RateLimiter(0))
+    with EntityCrawler(client, state_dir=state_dir) as crawler:
+        tables = crawler.crawl({"owner": ["808800"]})
+    assert sorted(tables["trainer"]["trainer_id"]) == ["01018"]
+    assert list(tables["owner"]["owner_id"]) == ["808800"]
+    assert sorted(requested) == [
+        "https://db.netkeiba.com/owner/808800/",
+        "https://db.netkeiba.com/trainer/01018/",
+    ]
+
+
+def test_entity_crawler_max_attempts(tmp_path, requested, failing):
+    client = Client(Cache(str(tmp_path)), RateLimiter(0))
+    crawler = EntityCrawler(client, max_attempts=2)
+    failing.add("01017")
+    for _ in range(3):
+        crawler.crawl({"trainer": ["01017"]})
+
+    # max_attempts 回失敗したIDは取得しない
+    assert requested == ["https://db.netkeiba.com/trainer/01017/"] * 2
@@ -0,0 +1,170 @@
+import datetime
+import os.path
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from scraping_netkeiba.entity import (
+    BREEDER,
+    JOCKEY,
+    OWNER,
+    TRAINER,
+    Entity,
+    entities_as_dataframe,
+)
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data"
+
+# 騎手・調教師・馬主・生産者のページを取得できない環境で、競走馬ページから
+# 作ったページ。プロフィールの値も実際のページから写したものではない
+synthetic_dir = data_dir / "entity_synthetic"
+
+
+def page(heading: str, title: str = "", href: str = "/owner/a00033/") -> str:
+    return (
+        f"<html><head><title>{title}</title></head><body>"
+        f'<div class="db_head_name fc"><div class=Name>{heading}</div></div>'
+        f"<ul class=db_detail_menu><li><a class=active href={href}>TOP</a></li></ul>"
+        "</body></html>"
+    )
+
+
+@pytest.mark.parametrize(
+    "html, name, name_kana",
+    [
+        [page("<h1>武豊 <span>(タケユタカ)</span></h1>"), "武豊", "タケユタカ"],
+        [page("<h1>\n  国枝栄\n  <span>（クニエダサカエ）</span></h1>"), "国枝栄", "クニエダサカエ"],
+        [page("<h1>(有)社台レースホース</h1>"), "(有)社台レースホース", None],
+        [page("<h1>ノーザンファーム</h1>"), "ノーザンファーム", None],
+        [page("<h1>A&amp;B</h1>"), "A&B", None],
+        [
+            "<html><head><title>サンデーレーシング | 馬主データ - netkeiba.com</title>"
+            "</head><body><a href='/owner/a00033/' class='active'>TOP</a></body></html>",
+            "サンデーレーシング",
+            None,
+        ],
+    ],
+)
+def test_entity_name(html: str, name: str, name_kana: str):
+    entity = Entity(OWNER, "a00033", html)
+    assert entity.name() == name
+    assert entity.name_kana() == name_kana
+
+
+def test_entity_name_not_found():
+    with pytest.raises(Exception) as e:
+        Entity(TRAINER, "01017", "<html><a class=active href=/trainer/01017/></html>")
+    assert str(e.value) == "Entity name is not found"
+
+
+@pytest.mark.parametrize(
+    "kind, entity_id, name, name_kana",
+    [
+        [JOCKEY, "05386", "戸崎圭太", "トサキケイタ"],
+        [TRAINER, "01017", "萩原清", "ハギワラキヨシ"],
+        [OWNER, "808800", "Ｇ１レーシング", None],
+        [BREEDER, "301513", "追分ファーム", None],
+    ],
+)
+def test_entity_page(kind, entity_id: str, name: str, name_kana: str):
+    html = (synthetic_dir / f"{kind.name}/{entity_id}.html").read_text()
+    entity = Entity(kind, entity_id, html)
+    assert entity.name() == name
+    assert entity.name_kana() == name_kana
+
+
+@pytest.mark.parametrize(
+    "kind, entity_id, affiliation, birth_date, debut_year",
+    [
+        [JOCKEY, "05386", "美浦", datetime.date(1980, 7, 8), 1998],
+        [TRAINER, "01017", "美浦", None, None],
+        [OWNER, "808800", None, None, None],
+        [BREEDER, "301513", "安平町", None, None],
+    ],
+)
+def test_entity_profile(kind, entity_id: str, affiliation, birth_date, debut_year):
+    html = (synthetic_dir / f"{kind.name}/{entity_id}.html").read_text()
+    entity = Entity(kind, entity_id, html)
+    assert entity.affiliation() == affiliation
+    assert entity.birth_date() == birth_date
+    assert entity.debut_year() == debut_year
+
+
+def test_entity_profile_only_in_heading():
+    # 見出しの外の txt_01 はプロフィールではない
+    html = page("<h1>ノーザンファーム</h1>") + "<p class=txt_01>1999/01/01<br>栗東</p>"
+    entity = Entity(OWNER, "a00033", html)
+    assert entity.affiliation() is None
+    assert entity.birth_date() is None
+
+
+def test_breeder_page():
+    html = (synthetic_dir / "breeder/301513.html").read_text()
+    with pytest.raises(Exception) as e:
+        Entity(OWNER, "301513", html)
+    assert str(e.value) == "Active owner url is not found"
+    pd.testing.assert_frame_equal(
+        Entity(BREEDER, "301513", html).as_dataframe(),
+        pd.DataFrame(
+            {
+                "breeder_id": ["301513"],
+                "name": ["追分ファーム"],
+                "name_kana": [None],
+                "affiliation": ["安平町"],
+                "birth_date": [None],
+                "debut_year": [None],
+            }
+        ),
+    )
+
+
+def test_entity_invalid_id():
+    html = (synthetic_dir / "trainer/01017.html").read_text()
+    with pytest.raises(Exception) as e:
+        Entity(TRAINER, "01018", html)
+    assert str(e.value) == 'Invalid trainer id: expected "01018", got "01017"'
+    # 種類の違うページ
+    with pytest.raises(Exception) as e:
+        Entity(OWNER, "01017", html)
+    assert str(e.value) == "Active owner url is not found"
+
+
+def test_as_dataframe():
+    entity = Entity(
+        JOCKEY,
+        "00666",
+        page(
+            "<h1>武豊 <span>(タケユタカ)</span></h1>",
+            href="/jockey/result/recent/00666/",
+        ),
+    )
+    pd.testing.assert_frame_equal(
+        entity.as_dataframe(),
+        pd.DataFrame(
+            {
+                "jockey_id": ["00666"],
+                "name": ["武豊"],
+                "name_kana": ["タケユタカ"],
+                "affiliation": [None],
+                "birth_date": [None],
+                "debut_year": [None],
+            }
+        ),
+    )
+
+
+def test_entities_as_dataframe():
+    entities = [
+        Entity(
+            BREEDER,
+            "373126",
+            page("<h1>ノーザンファーム</h1>", href="/breeder/373126/"),
+        ),
+        Entity(BREEDER, "400196", page("<h1>社台ファーム</h1>", href="/breeder/400196/")),
+    ]
+    pd.testing.assert_frame_equal(
+        entities_as_dataframe(BREEDER, entities),
+        pd.concat([v.as_dataframe() for v in entities], ignore_index=True),
+    )
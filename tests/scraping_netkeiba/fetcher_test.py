@@ -0,0 +1,65 @@
+import os.path
+import shutil
+import time
+from pathlib import Path
+from typing import Callable
+
+import pytest
+import requests
+
+from scraping_netkeiba.client import (
+    Cache,
+    Client,
+    HorsePedParam,
+    RaceParam,
+    RateLimiter,
+)
+from scraping_netkeiba.fetcher import Fetcher
+from tests.scraping_netkeiba.conftest import FakeResponse
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data"
+
+
+@pytest.fixture
+def respond() -> Callable[[str], FakeResponse]:
+    def respond(url: str) -> FakeResponse:
+        if "missing" in url:
+            raise requests.ConnectionError(url)
+        return FakeResponse(f"<html>{url}</html>")
+
+    return respond
+
+
+def test_fetcher_fetch_from_cache(tmp_path, requested):
+    shutil.copytree(data_dir / "horse_ped", tmp_path / "horse/ped")
+    client = Client(Cache(str(tmp_path)))
+    params = [HorsePedParam(p.stem) for p in (data_dir / "horse_ped").glob("*.html")]
+    actual = dict(Fetcher(client).fetch(params))
+    assert set(actual) == set(params)
+    assert (
+        actual[HorsePedParam("2018105460")]
+        == (data_dir / "horse_ped/2018105460.html").read_text()
+    )
+    assert requested == []
+
+
+def test_fetcher_fetch_shares_rate_limit(requested):
+    client = Client(rate_limiter=RateLimiter(0.05))
+    params = [RaceParam(f"2021050101{i:02}") for i in range(1, 9)]
+    start = time.monotonic()
+    actual = list(Fetcher(client, max_workers=4).fetch(params))
+    assert time.monotonic() - start >= 0.05 * 7
+    assert len(actual) == 8
+    assert sorted(requested) == [
+        f"https://db.netkeiba.com/race/{p.race_id}/" for p in params
+    ]
+
+
+def test_fetcher_fetch_skips_errors(requested):
+    client = Client(rate_limiter=RateLimiter(0))
+    params = [RaceParam("202105010101"), RaceParam("missing00000")]
+    fetcher = Fetcher(client)
+    actual = list(fetcher.fetch(params))
+    assert [p for p, _ in actual] == [RaceParam("202105010101")]
+    assert fetcher.failed() == [RaceParam("missing00000")]
@@ -0,0 +1,73 @@
+import datetime
+
+import pytest
+
+from scraping_netkeiba import url
+from scraping_netkeiba.frontier import Frontier, State
+
+
+@pytest.fixture
+def path(tmp_path) -> str:
+    return str(tmp_path / "frontier.sqlite")
+
+
+def race(n: int) -> str:
+    return url.race(f"2021050101{n:02}")
+
+
+def test_frontier_add_deduplicates(path):
+    with Frontier(path) as frontier:
+        assert frontier.add([race(1), race(2), race(1)]) == 2
+        assert frontier.add([race(2), race(3)]) == 1
+        assert len(frontier) == 3
+        assert frontier.seen(race(1))
+        assert not frontier.seen(race(4))
+
+
+def test_frontier_add_page_type(path):
+    with Frontier(path) as frontier:
+        frontier.add([url.horse_ped("2018105460"), url.trainer("01017")])
+        assert [(e.page_type, e.priority) for e in frontier.claim(2)] == [
+            ("horse_ped", 4),
+            ("trainer", 5),
+        ]
+        with pytest.raises(Exception):
+            frontier.add(["https://db.netkeiba.com/unknown/"])
+
+
+def test_frontier_claim_by_priority(path):
+    list1 = url.race_list(datetime.date(2021, 1, 1))
+    horse1 = url.horse("2018105460")
+    with Frontier(path) as frontier:
+        frontier.add([race(1), race(2)])
+        frontier.add([list1])
+        frontier.add([horse1], priority=-1)
+        assert [e.url for e in frontier.claim(3)] == [horse1, list1, race(1)]
+        assert [e.url for e in frontier.claim(3)] == [race(2)]
+        assert frontier.claim(3) == []
+        assert frontier.counts()[State.InFlight] == 4
+
+
+def test_frontier_done_and_failed(path):
+    with Frontier(path, max_attempts=2) as frontier:
+        frontier.add([race(1), race(2)])
+        frontier.claim(2)
+        frontier.done(race(1))
+        frontier.failed(race(2), "timeout")
+        assert frontier.state(race(1)) == State.Done
+        assert frontier.state(race(2)) == State.Pending
+        assert [e.attempts for e in frontier.claim(1)] == [2]
+        frontier.failed(race(2), "timeout")
+        assert frontier.state(race(2)) == State.Failed
+        assert frontier.state(race(3)) is None
+
+
+def test_frontier_resume(path):
+    with Frontier(path) as frontier:
+        frontier.add([race(1), race(2), race(3)])
+        frontier.claim(2)
+        frontier.done(race(1))
+    with Frontier(path) as frontier:
+        assert frontier.state(race(2)) == State.Pending
+        assert [e.url for e in frontier.claim(5)] == [race(2), race(3)]
+        assert frontier.add([race(1)]) == 0
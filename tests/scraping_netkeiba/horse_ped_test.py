@@ -1,9 +1,18 @@
 import os.path
 from pathlib import Path
 
+import pandas as pd
 import pytest
+from bs4 import BeautifulSoup
 
-from scraping_netkeiba.horse_ped import HorsePed
+from scraping_netkeiba.horse_ped import (
+    HorsePed,
+    Relation,
+    peds_as_dataframe,
+    ped_column_names,
+    ped_index,
+    ped_relationships,
+)
 
 script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
 
@@ -357,3 +366,110 @@ def test_horse_ped_dam_dam_sire(path, dam_dam_sire):
 )
 def test_horse_ped_dam_dam_dam(path, dam_dam_dam):
     assert HorsePed(path.stem, path.read_text()).dam_dam_dam() == dam_dam_dam
+
+
+@pytest.mark.parametrize(
+    "relationships, index",
+    [
+        ([Relation.Sire], 0),
+        ([Relation.Dam], 1),
+        ([Relation.Sire, Relation.Sire], 2),
+        ([Relation.Sire, Relation.Dam], 3),
+        ([Relation.Dam, Relation.Dam], 5),
+        ([Relation.Dam, Relation.Sire, Relation.Dam], 11),
+        ([Relation.Sire] * 5, 30),
+        ([Relation.Dam] * 5, 61),
+    ],
+)
+def test_ped_index(relationships, index):
+    assert ped_index(relationships) == index
+
+
+def test_ped_column_names():
+    names = ped_column_names()
+    assert len(names) == 62
+    assert names[:6] == ["sire", "dam", "sire_sire", "sire_dam", "dam_sire", "dam_dam"]
+    assert names[-1] == "dam_dam_dam_dam_dam"
+
+
+@pytest.mark.parametrize("path", sorted((script_dir / "data/horse_ped").glob("*.html")))
+def test_horse_ped_ped_horse_ids(path):
+    horse_ped = HorsePed(path.stem, path.read_text())
+    ped_horse_ids = horse_ped.ped_horse_ids()
+    assert len(ped_horse_ids) == 62
+    assert all(v is not None for v in ped_horse_ids)
+    for relationships in ped_relationships(3):
+        assert ped_horse_ids[ped_index(relationships)] == horse_ped.ped_horse_id(
+            relationships
+        )
+    assert ped_horse_ids[:2] == [horse_ped.sire(), horse_ped.dam()]
+
+
+def test_horse_ped_ped_horse_ids_5th_generation():
+    path = script_dir / "data/horse_ped/2018105460.html"
+    horse_ped = HorsePed(path.stem, path.read_text())
+    assert horse_ped.ped_horse_id([Relation.Sire] * 5) == "000a0012cb"
+    assert horse_ped.ped_horse_id([Relation.Sire] * 4 + [Relation.Dam]) == "000a008c0e"
+    with pytest.raises(Exception) as _:
+        horse_ped.ped_horse_id([Relation.Sire] * 6)
+
+
+def test_horse_ped_as_dataframe():
+    path = script_dir / "data/horse_ped/2018105460.html"
+    df = HorsePed(path.stem, path.read_text()).as_dataframe()
+    assert df.shape == (1, 63)
+    assert df.loc[0, "horse_id"] == "2018105460"
+    assert df.loc[0, "sire"] == "2011100655"
+    assert df.loc[0, "sire_sire_sire_sire_sire"] == "000a0012cb"
+
+
+def test_peds_as_dataframe():
+    paths = sorted((script_dir / "data/horse_ped").glob("*.html"))
+    df = peds_as_dataframe(HorsePed(p.stem, p.read_text()) for p in paths)
+    assert df.shape == (len(paths), 63)
+    assert df["horse_id"].tolist() == [p.stem for p in paths]
+    assert df.loc[df["horse_id"] == "2018105460", "dam"].item() == "2005102077"
+
+
+def without_link(html: str) -> str:
+    # 父の欄から馬のページへのリンクを取り除く
+    soup = BeautifulSoup(html, "html.parser")
+    for a in soup.select_one("table.blood_table td").find_all("a", href=True):
+        a.unwrap()
+    return str(soup)
+
+
+def test_horse_ped_ped_horse_id_without_link():
+    path = script_dir / "data/horse_ped/2018105460.html"
+    horse_ped = HorsePed(path.stem, without_link(path.read_text()))
+    assert horse_ped.ped_horse_ids()[0] is None
+    with pytest.raises(Exception):
+        horse_ped.sire()
+    assert horse_ped.dam() == "2005102077"
+
+
+def four_generations(html: str) -> str:
+    # 5代の血統表から5代目を取り除き、4代の血統表にする
+    soup = BeautifulSoup(html, "html.parser")
+    for tr_index, tr in enumerate(soup.select("table.blood_table tr")):
+        if tr_index % 2 == 1:
+            tr.decompose()
+        else:
+            tr.select("td")[-1].decompose()
+    return str(soup)
+
+
+def test_peds_as_dataframe_mixed_generations():
+    path = script_dir / "data/horse_ped/2018105460.html"
+    full = HorsePed(path.stem, path.read_text())
+    short = HorsePed(path.stem, four_generations(path.read_text()))
+    assert short.generations() == 4
+    # 最後のページの世代数に関わらず、列は5代の血統表に揃う
+    for names in [["full", "short"], ["short", "full"]]:
+        peds = {"full": full, "short": short}
+        df = peds_as_dataframe(peds[v] for v in names).set_axis(names)
+        assert df.shape == (2, 63)
+        columns = ped_column_names(4)
+        assert df.loc["short", columns].tolist() == df.loc["full", columns].tolist()
+        assert pd.isna(df.loc["short", "sire_sire_sire_sire_sire"])
+        assert df.loc["full", "sire_sire_sire_sire_sire"] == "000a0012cb"
@@ -0,0 +1,125 @@
+import datetime
+import os.path
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from scraping_netkeiba.client import Cache
+from scraping_netkeiba.horse import Horse
+from scraping_netkeiba.horse_result import (
+    COLUMNS,
+    HorseResult,
+    results_as_dataframe,
+)
+from scraping_netkeiba.parse_job import HORSE_RESULT, parallel_parse
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data"
+
+# 戦績ページを取得できない環境で、競走馬ページの戦績の表から作ったページ。
+# 実際の /horse/result/ のページではないため、ここでのテストは実際の
+# ページのHTMLでパースできることを確かめるものではない
+synthetic_dir = data_dir / "horse_result_synthetic"
+
+
+def horse_result(horse_id: str) -> HorseResult:
+    return HorseResult(horse_id, (synthetic_dir / f"{horse_id}.html").read_text())
+
+
+@pytest.mark.parametrize(
+    "path, error_message",
+    [
+        [
+            data_dir / "horse/invalid_empty.html",
+            "Active horse result url is not found",
+        ],
+        [
+            synthetic_dir / "invalid_active_horse_result_url_is_not_found.html",
+            "Active horse result url is not found",
+        ],
+        [
+            synthetic_dir / "2018105460.html",
+            'Invalid horse id: expected "2018105461", got "2018105460"',
+        ],
+    ],
+)
+def test_horse_result_init(path: Path, error_message: str):
+    horse_id = "2018105461" if path.stem == "2018105460" else path.stem
+    with pytest.raises(Exception) as e:
+        HorseResult(horse_id, path.read_text())
+    assert str(e.value) == error_message
+
+
+def test_horse_result_is_not_horse():
+    # プロフィールを除いてあり、競走馬ページとしては読めない
+    with pytest.raises(Exception) as e:
+        Horse("2018105460", (synthetic_dir / "2018105460.html").read_text())
+    assert str(e.value) == "Active horse url is not found"
+
+
+def test_horse_result_jra():
+    result = horse_result("2018105460")
+    assert result.race_count() == 11
+    assert result.race_date()[0] == datetime.date(2022, 9, 11)
+    assert result.race_id()[0] == "202206040212"
+    assert result.weather()[0] == "曇"
+    assert result.race_number()[0] == "12"
+    assert result.race_name()[0] == "3歳以上2勝クラス"
+    assert result.horse_count()[0] == 15
+    assert result.bracket_number()[0] == "3"
+    assert result.horse_number()[0] == "6"
+    assert result.win_odds()[0] == 119.6
+    assert result.pop_order()[0] == "15"
+    assert result.arrival_order()[0] == "1"
+    assert result.jockey_id()[0] == "01184"
+    assert result.load_weight()[0] == 52.0
+    assert result.track_surface()[0] == "ダ"
+    assert result.track_distance()[0] == 1200
+    assert result.track_condition()[0] == "良"
+    assert result.total_time()[0] == pytest.approx(70.8)
+    assert result.margin()[0] == -0.2
+    assert result.corner_orders()[0] == "3-2"
+    assert result.pace()[0] == "33.5-37.3"
+    assert result.final_push_time()[0] == 37.2
+    assert result.horse_weight()[0] == 484.0
+    assert result.horse_weight_delta()[0] == 6.0
+    assert result.winner_horse_id()[0] == "2017101041"
+    assert result.prize()[0] == 1110000000
+
+
+def test_horse_result_nar():
+    result = horse_result("2018106320")
+    assert result.race_count() == 15
+    assert result.race_date()[0] == datetime.date(2021, 9, 13)
+    assert result.race_name()[0] == "C2六組"
+    assert result.track_condition()[6] == "稍"
+    assert result.corner_orders()[6] == "3-3-3-6"
+    assert result.prize()[0] == 0
+    assert result.arrival_order()[13] == "12"
+    assert result.total_time()[12] == pytest.approx(122.2)
+
+
+def test_as_dataframe():
+    df = horse_result("2018105460").as_dataframe()
+    assert list(df.columns) == COLUMNS
+    assert len(df) == 11
+    assert set(df["horse_id"]) == {"2018105460"}
+
+
+def test_results_as_dataframe():
+    horse_ids = ["2018105460", "2018100299", "2018101711", "2018106320"]
+    results = [horse_result(v) for v in horse_ids]
+    expected = pd.concat([v.as_dataframe() for v in results], ignore_index=True)
+    pd.testing.assert_frame_equal(results_as_dataframe(results), expected)
+
+
+def test_parallel_parse(tmp_path):
+    shutil.copytree(synthetic_dir, tmp_path / "cache/horse/result")
+    horse_ids = ["2018105460", "2018100299", "2018101711", "2018106320"]
+    actual = parallel_parse(
+        HORSE_RESULT, horse_ids, Cache(str(tmp_path / "cache")), max_workers=2
+    )
+    expected = results_as_dataframe([horse_result(v) for v in horse_ids])
+    pd.testing.assert_frame_equal(actual, expected)
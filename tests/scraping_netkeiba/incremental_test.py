@@ -0,0 +1,131 @@
+import os
+import os.path
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from scraping_netkeiba import url
+from scraping_netkeiba.client import Cache
+from scraping_netkeiba.incremental import IncrementalResult, incremental_parse
+from scraping_netkeiba.parse_job import RACE_RESULT, parallel_parse
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data"
+
+race_ids = ["202102011201", "202105010101", "202106050907", "202136123104"]
+
+
+@pytest.fixture
+def cache(tmp_path) -> Cache:
+    shutil.copytree(data_dir / "race", tmp_path / "cache/race")
+    return Cache(str(tmp_path / "cache"))
+
+
+def run(tmp_path, cache, job=RACE_RESULT, ids=race_ids) -> IncrementalResult:
+    return incremental_parse(
+        job,
+        ids,
+        cache,
+        str(tmp_path / "state.sqlite"),
+        str(tmp_path / "out/race_result.pkl"),
+        chunksize=2,
+        max_workers=2,
+    )
+
+
+def read_output(tmp_path) -> pd.DataFrame:
+    return (
+        pd.read_pickle(tmp_path / "out/race_result.pkl")
+        .sort_values(["race_id", "horse_number"])
+        .reset_index(drop=True)
+    )
+
+
+def expected_output(cache) -> pd.DataFrame:
+    return (
+        parallel_parse(RACE_RESULT, race_ids, cache, max_workers=1)
+        .sort_values(["race_id", "horse_number"])
+        .reset_index(drop=True)
+    )
+
+
+def test_incremental_parse_skips_unchanged(tmp_path, cache):
+    assert run(tmp_path, cache) == IncrementalResult(4, 0, 0)
+    pd.testing.assert_frame_equal(read_output(tmp_path), expected_output(cache))
+    assert run(tmp_path, cache) == IncrementalResult(0, 4, 0)
+    pd.testing.assert_frame_equal(read_output(tmp_path), expected_output(cache))
+
+
+def test_incremental_parse_changed_page(tmp_path, cache):
+    run(tmp_path, cache)
+    # 1頭分の行を消したページに差し替える
+    html = cache.read(url.race("202105010101"))
+    html = html.replace("/horse/2018105460/", "/horse/2018105461/")
+    cache.write(url.race("202105010101"), html)
+
+    assert run(tmp_path, cache) == IncrementalResult(1, 3, 0)
+    actual = read_output(tmp_path)
+    assert "2018105461" in set(actual["horse_id"])
+    assert "2018105460" not in set(actual["horse_id"])
+    assert len(actual) == len(expected_output(cache))
+
+
+def test_incremental_parse_parser_version(tmp_path, cache):
+    run(tmp_path, cache)
+    job = RACE_RESULT._replace(parser_version=RACE_RESULT.parser_version + 1)
+    assert run(tmp_path, cache, job) == IncrementalResult(4, 0, 0)
+    assert run(tmp_path, cache, job) == IncrementalResult(0, 4, 0)
+
+
+def test_incremental_parse_new_and_missing_pages(tmp_path, cache):
+    run(tmp_path, cache, ids=race_ids[:2])
+    assert run(tmp_path, cache, ids=[*race_ids, "202105010102"]) == IncrementalResult(
+        2, 2, 1
+    )
+    pd.testing.assert_frame_equal(read_output(tmp_path), expected_output(cache))
+
+
+def test_incremental_parse_without_output(tmp_path, cache):
+    run(tmp_path, cache)
+    (tmp_path / "out/race_result.pkl").unlink()
+    assert run(tmp_path, cache) == IncrementalResult(4, 0, 0)
+
+
+def test_incremental_parse_nothing_parsed_first(tmp_path, cache):
+    shutil.copy(data_dir / "race/2021N2a00905.html", tmp_path / "cache/race")
+    assert run(tmp_path, cache, ids=["2021N2a00905"]) == IncrementalResult(1, 0, 0)
+    assert run(
+        tmp_path, cache, ids=["2021N2a00905", "202105010101"]
+    ) == IncrementalResult(1, 1, 0)
+    assert set(read_output(tmp_path)["race_id"]) == {"202105010101"}
+
+
+def test_incremental_parse_checks_stat_before_reading(tmp_path, cache):
+    run(tmp_path, cache)
+    path = tmp_path / "cache/race/202105010101.html"
+    stat = path.stat()
+    # 更新日時とバイト数が同じなら、内容が変わっていても読まない
+    html = path.read_text().replace("2018105460", "2018105461")
+    path.write_text(html)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert run(tmp_path, cache) == IncrementalResult(0, 4, 0)
+
+    # 更新日時が変わると読んで比べる
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert run(tmp_path, cache) == IncrementalResult(1, 3, 0)
+    assert "2018105461" in set(read_output(tmp_path)["horse_id"])
+
+
+def test_incremental_parse_touched_page(tmp_path, cache):
+    run(tmp_path, cache)
+    path = tmp_path / "cache/race/202105010101.html"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    # 内容が同じならパースし直さず、次回からは新しい更新日時で比べる
+    assert run(tmp_path, cache) == IncrementalResult(0, 4, 0)
+    html = path.read_text().replace("2018105460", "2018105461")
+    path.write_text(html)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert run(tmp_path, cache) == IncrementalResult(0, 4, 0)
@@ -0,0 +1,145 @@
+import locale
+import os.path
+import shutil
+from pathlib import Path
+
+import pytest
+
+from scraping_netkeiba import url
+from scraping_netkeiba.client import Cache
+from scraping_netkeiba.manifest import Manifest, ManifestCache, page_type
+from scraping_netkeiba.parse_job import HORSE, RACE_RESULT, parallel_parse
+from scraping_netkeiba.race import Race
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data"
+
+
+def test_page_type():
+    assert page_type(url.race("202105010101")) == ("race", "202105010101")
+    assert page_type(url.horse("2018105460")) == ("horse", "2018105460")
+    assert page_type(url.horse_ped("2018105460")) == ("horse_ped", "2018105460")
+    assert page_type(url.horse_result("2018105460")) == (
+        "horse_result",
+        "2018105460",
+    )
+    assert page_type(f"{url.BASE_URL}/race/sum/05/20210105/") == (
+        "race_sum",
+        "05/20210105",
+    )
+    assert page_type(f"{url.BASE_URL}/race/list/20210105/") == (
+        "race_list",
+        "20210105",
+    )
+    assert page_type(f"{url.BASE_URL}/unknown/") == (None, None)
+
+
+@pytest.fixture
+def cache_dir(tmp_path) -> Path:
+    shutil.copytree(data_dir / "race", tmp_path / "cache/race")
+    shutil.copytree(data_dir / "horse", tmp_path / "cache/horse")
+    return tmp_path / "cache"
+
+
+def test_manifest_rebuild(tmp_path, cache_dir):
+    with Manifest(str(tmp_path / "manifest.sqlite")) as manifest:
+        manifest.rebuild(str(cache_dir))
+        race_ids = sorted(p.stem for p in (data_dir / "race").glob("*.html"))
+        horse_ids = sorted(
+            p.stem
+            for p in (data_dir / "horse").glob("*.html")
+            if not p.stem.startswith("invalid")
+        )
+        # ページ種別の分からないURLも記録する
+        assert manifest.counts() == {
+            "race": len(race_ids),
+            "horse": len(horse_ids),
+            None: 3,
+        }
+        assert manifest.ids("horse") == horse_ids
+        assert manifest.ids("race") == race_ids
+        assert manifest.ids("race", "2021") == [
+            v for v in race_ids if v.startswith("2021")
+        ]
+
+        entry = manifest.entry(url.race(race_ids[0]))
+        assert entry.page_type == "race"
+        assert entry.page_id == race_ids[0]
+        assert entry.size == (data_dir / "race" / f"{race_ids[0]}.html").stat().st_size
+        assert entry.encoding == locale.getpreferredencoding(False)
+        assert entry.parsed_at is None
+
+
+def test_manifest_parsed(tmp_path, cache_dir):
+    with Manifest(str(tmp_path / "manifest.sqlite")) as manifest:
+        manifest.rebuild(str(cache_dir))
+        race_ids = manifest.ids("race")
+        manifest.mark_parsed([url.race(race_ids[0])])
+        assert manifest.ids("race", parsed=True) == race_ids[:1]
+        assert manifest.ids("race", parsed=False) == race_ids[1:]
+
+        # 変わっていないページは作り直してもパース済みのまま
+        manifest.rebuild(str(cache_dir))
+        assert manifest.ids("race", parsed=True) == race_ids[:1]
+
+        # 取得し直すと未パースに戻る
+        manifest.record(url.race(race_ids[0]), 100)
+        assert manifest.ids("race", parsed=True) == []
+
+
+def test_manifest_missing_references(tmp_path, cache_dir):
+    with Manifest(str(tmp_path / "manifest.sqlite")) as manifest:
+        manifest.rebuild(str(cache_dir))
+        cached: set[str] = set(manifest.ids("horse"))
+        expected: set[str] = set()
+        for race_id in ["202102011201", "202105010101", "202106050907"]:
+            with open(data_dir / "race" / f"{race_id}.html") as f:
+                horse_ids = Race(race_id, f.read()).horse_id()
+            manifest.add_references(url.race(race_id), "horse", horse_ids)
+            expected.update(v for v in horse_ids if v not in cached)
+        assert manifest.missing_references("horse") == sorted(expected)
+
+
+def test_manifest_cache(tmp_path):
+    manifest = Manifest(str(tmp_path / "manifest.sqlite"))
+    cache = ManifestCache(Cache(str(tmp_path / "cache")), manifest)
+    cache.write(url.horse("2018105460"), "<html>馬</html>")
+    assert cache.exists(url.horse("2018105460"))
+    assert cache.read(url.horse("2018105460")) == "<html>馬</html>"
+    entry = manifest.entry(url.horse("2018105460"))
+    assert entry.page_type == "horse"
+    # rebuild と同じくファイルのバイト数
+    assert entry.size == (tmp_path / "cache/horse/2018105460.html").stat().st_size
+    manifest.mark_parsed([url.horse("2018105460")])
+    manifest.rebuild(str(tmp_path / "cache"))
+    assert manifest.entry(url.horse("2018105460"))._replace(
+        parsed_at=None
+    ) == entry._replace(parsed_at=None)
+    assert manifest.ids("horse", parsed=True) == ["2018105460"]
+    manifest.close()
+
+    # 開き直しても残っている
+    with Manifest(str(tmp_path / "manifest.sqlite")) as manifest:
+        assert manifest.ids("horse") == ["2018105460"]
+
+
+def test_manifest_record_parsed(tmp_path, cache_dir):
+    with Manifest(str(tmp_path / "manifest.sqlite")) as manifest:
+        manifest.rebuild(str(cache_dir))
+        race_ids = ["202102011201", "202105010101", "2021N2a00905"]
+        df = parallel_parse(
+            RACE_RESULT, race_ids, Cache(str(cache_dir)), manifest=manifest
+        )
+        # パースに失敗したページはパース済みにならない
+        assert manifest.ids("race", parsed=True) == race_ids[:2]
+        cached: set[str] = set(manifest.ids("horse"))
+        assert manifest.missing_references("horse") == sorted(
+            set(df["horse_id"]) - cached
+        )
+        assert manifest.missing_references("recent_jockey_result") == sorted(
+            set(df["jockey_id"])
+        )
+
+        parallel_parse(HORSE, ["2018105460"], Cache(str(cache_dir)), manifest=manifest)
+        assert manifest.ids("horse", parsed=True) == ["2018105460"]
+        assert manifest.missing_references("trainer") == ["01017"]
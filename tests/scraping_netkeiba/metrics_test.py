@@ -0,0 +1,120 @@
+import os.path
+import shutil
+from pathlib import Path
+
+import pytest
+
+from scraping_netkeiba import metrics
+from scraping_netkeiba.client import Cache, Client, HorsePedParam
+from scraping_netkeiba.metrics import StageStat
+from scraping_netkeiba.race import Race
+from scraping_netkeiba.util import parallel_map
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data"
+
+RACE_IDS = ["202102011201", "202105010101", "202106050907"]
+
+
+@pytest.fixture
+def enabled():
+    metrics.enable()
+    metrics.reset()
+    yield
+    metrics.disable()
+
+
+def _race_info(race_id: str):
+    return Race(
+        race_id, (data_dir / f"race/{race_id}.html").read_text()
+    ).race_info_as_dataframe()
+
+
+def test_disabled_by_default():
+    assert not metrics.enabled()
+    with metrics.timer("fetch") as t:
+        t.add_bytes(10)
+    metrics.count("cache_hit")
+    assert metrics.snapshot() == {}
+    assert metrics.format_summary() == "No metrics"
+
+
+def test_timer(enabled):
+    with metrics.timer("fetch") as t:
+        t.add_bytes(10)
+    with metrics.timer("fetch") as t:
+        t.add_bytes(5)
+    with pytest.raises(ValueError):
+        with metrics.timer("decode"):
+            raise ValueError()
+    actual = metrics.snapshot()
+    assert actual["fetch"].count == 2
+    assert actual["fetch"].bytes == 15
+    assert 0 <= actual["fetch"].max_seconds <= actual["fetch"].seconds
+    # 例外で抜けた場合も記録する
+    assert actual["decode"].count == 1
+
+
+def test_count_and_merge(enabled):
+    metrics.count("cache_hit")
+    metrics.count("cache_hit", 2)
+    metrics.merge({"cache_hit": StageStat(1), "fetch": StageStat(2, 1.5, 1.0, 100)})
+    assert metrics.snapshot() == {
+        "cache_hit": StageStat(4, 0.0, 0.0, 0),
+        "fetch": StageStat(2, 1.5, 1.0, 100),
+    }
+
+
+def test_summary(enabled):
+    metrics.merge(
+        {
+            "fetch": StageStat(2, 1.0, 0.75, 100),
+            "race.soup": StageStat(4, 2.0, 1.0, 0),
+        }
+    )
+    actual = metrics.summary()
+    assert list(actual["stage"]) == ["race.soup", "fetch"]
+    assert list(actual["mean_ms"]) == [500.0, 500.0]
+    assert list(actual["max_ms"]) == [1000.0, 750.0]
+    assert "race.soup" in metrics.format_summary()
+
+
+def test_write_prometheus(enabled, tmp_path):
+    metrics.merge({"fetch": StageStat(2, 1.5, 1.0, 100)})
+    path = tmp_path / "metrics/scraping_netkeiba.prom"
+    metrics.write_prometheus(str(path))
+    actual = path.read_text().splitlines()
+    assert "# TYPE scraping_netkeiba_stage_seconds_total counter" in actual
+    assert 'scraping_netkeiba_stage_count_total{stage="fetch"} 2' in actual
+    assert 'scraping_netkeiba_stage_seconds_total{stage="fetch"} 1.5' in actual
+    assert 'scraping_netkeiba_stage_max_seconds{stage="fetch"} 1.0' in actual
+    assert 'scraping_netkeiba_stage_bytes_total{stage="fetch"} 100' in actual
+    assert not path.with_name(f"{path.name}.tmp").exists()
+
+
+def test_client_cache_hit(enabled, tmp_path):
+    shutil.copytree(data_dir / "horse_ped", tmp_path / "horse/ped")
+    client = Client(Cache(str(tmp_path)))
+    client.horse_ped(HorsePedParam("2018105460"))
+    actual = metrics.snapshot()
+    assert actual["cache_hit"].count == 1
+    assert "cache_miss" not in actual
+    assert (
+        actual["cache_read"].bytes
+        == (data_dir / "horse_ped/2018105460.html").stat().st_size
+    )
+
+
+def test_parsers(enabled):
+    for race_id in RACE_IDS:
+        _race_info(race_id)
+    actual = metrics.snapshot()
+    assert actual["race.soup"].count == len(RACE_IDS)
+    assert actual["race_info.extract"].count == len(RACE_IDS)
+
+
+def test_parallel_map_merges_worker_metrics(enabled):
+    parallel_map(_race_info, RACE_IDS, max_workers=2)
+    actual = metrics.snapshot()
+    assert actual["race.soup"].count == len(RACE_IDS)
+    assert actual["race_info.extract"].count == len(RACE_IDS)
@@ -0,0 +1,170 @@
+import os.path
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import pytest
+
+from scraping_netkeiba import parquet_sink
+from scraping_netkeiba.horse import Horse
+from scraping_netkeiba.parquet_sink import HORSE, RACE_INFO, RACE_RESULT, ParquetSink
+from scraping_netkeiba.race import Race
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data"
+
+race_ids = ["202102011201", "202105010101", "202106050907", "202136123104"]
+
+
+def races() -> list[Race]:
+    return [Race(v, (data_dir / f"race/{v}.html").read_text()) for v in race_ids]
+
+
+def sort(df: pd.DataFrame, by: list[str]) -> pd.DataFrame:
+    return df.sort_values(by).reset_index(drop=True)
+
+
+def test_race_result(tmp_path):
+    expected = pd.concat([v.race_result_as_dataframe() for v in races()])
+    with ParquetSink(str(tmp_path), RACE_RESULT, row_group_size=10) as sink:
+        for race in races():
+            sink(race.race_result_as_dataframe())
+
+    paths = sorted(
+        p.parent.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("*.parquet")
+    )
+    assert paths == [
+        "race_result/year=2021/track=02",
+        "race_result/year=2021/track=05",
+        "race_result/year=2021/track=06",
+        "race_result/year=2021/track=36",
+    ]
+    # row_group_size 行ずつ行グループになる
+    metadata = pq.ParquetFile(next(tmp_path.rglob("track=05/*.parquet"))).metadata
+    assert metadata.num_row_groups == 2
+    assert metadata.row_group(0).num_rows == 10
+
+    actual = parquet_sink.read(str(tmp_path), RACE_RESULT)
+    assert sorted(actual.columns) == sorted([*expected.columns, "year", "track"])
+    # 数値の無いレースがあると None の object 列になっている
+    expected = expected.astype({c: actual[c].dtype for c in expected.columns})
+    pd.testing.assert_frame_equal(
+        sort(actual[expected.columns], ["race_id", "horse_number"]),
+        sort(expected, ["race_id", "horse_number"]),
+        check_dtype=False,
+    )
+
+
+def test_race_info_partitions(tmp_path):
+    with ParquetSink(str(tmp_path), RACE_INFO) as sink:
+        for race in races():
+            sink(race.race_info_as_dataframe())
+
+    actual = parquet_sink.read(
+        str(tmp_path),
+        RACE_INFO,
+        (ds.field("month") == "12") & (ds.field("track") == "06"),
+    )
+    assert list(actual["race_id"]) == ["202106050907"]
+    assert list(actual["year"]) == ["2021"]
+
+
+def test_append_and_compact(tmp_path):
+    for race in races():
+        with ParquetSink(str(tmp_path), RACE_RESULT) as sink:
+            sink(race.race_result_as_dataframe())
+    with ParquetSink(str(tmp_path), RACE_RESULT) as sink:
+        sink(races()[1].race_result_as_dataframe())
+    assert len(list((tmp_path / "race_result/year=2021/track=05").iterdir())) == 2
+    before = parquet_sink.read(str(tmp_path), RACE_RESULT)
+
+    parquet_sink.compact(str(tmp_path), RACE_RESULT)
+    assert len(list((tmp_path / "race_result/year=2021/track=05").iterdir())) == 1
+    after = parquet_sink.read(str(tmp_path), RACE_RESULT)
+    pd.testing.assert_frame_equal(
+        sort(after, ["race_id", "horse_number"]),
+        sort(before, ["race_id", "horse_number"]),
+    )
+
+
+def test_horse(tmp_path):
+    horse_ids = ["2018105460", "2018100299"]
+    expected = pd.concat(
+        [
+            Horse(v, (data_dir / f"horse/{v}.html").read_text()).as_dataframe()
+            for v in horse_ids
+        ]
+    )
+    with ParquetSink(str(tmp_path), HORSE) as sink:
+        sink(expected)
+    assert len(list((tmp_path / "horse").glob("*.parquet"))) == 1
+    actual = parquet_sink.read(str(tmp_path), HORSE)
+    pd.testing.assert_frame_equal(
+        sort(actual, ["horse_id"]), sort(expected, ["horse_id"]), check_dtype=False
+    )
+
+
+def test_dictionary_encoding(tmp_path):
+    with ParquetSink(str(tmp_path), RACE_RESULT) as sink:
+        sink(races()[1].race_result_as_dataframe())
+    metadata = pq.ParquetFile(next(tmp_path.rglob("*.parquet"))).metadata
+    columns = [metadata.row_group(0).column(i) for i in range(metadata.num_columns)]
+    encodings = {c.path_in_schema: c.encodings for c in columns}
+    assert "RLE_DICTIONARY" in encodings["horse_id"]
+    assert "RLE_DICTIONARY" not in encodings["corner_orders"]
+
+
+def test_skips_files_being_written(tmp_path):
+    with ParquetSink(str(tmp_path), RACE_RESULT) as sink:
+        sink(races()[1].race_result_as_dataframe())
+    expected = parquet_sink.read(str(tmp_path), RACE_RESULT)
+    writer = ParquetSink(str(tmp_path), RACE_RESULT)
+    writer(races()[1].race_result_as_dataframe())
+    writer.flush()
+
+    # 書き込み中のファイルは読み込みにも compact にも使わない
+    partition_dir = tmp_path / "race_result/year=2021/track=05"
+    assert len(list(partition_dir.glob("part-*.parquet"))) == 1
+    pd.testing.assert_frame_equal(
+        parquet_sink.read(str(tmp_path), RACE_RESULT), expected
+    )
+    parquet_sink.compact(str(tmp_path), RACE_RESULT)
+    writer.close()
+    assert len(list(partition_dir.glob("part-*.parquet"))) == 2
+    assert len(parquet_sink.read(str(tmp_path), RACE_RESULT)) == len(expected) * 2
+
+
+def _interrupted_compact(tmp_path, monkeypatch, after_replace: bool) -> Path:
+    # 古いファイルを消す前（または置き換える前）に止まった compact を再現する
+    for race in races()[1:2] * 2:
+        with ParquetSink(str(tmp_path), RACE_RESULT) as sink:
+            sink(race.race_result_as_dataframe())
+    replace = os.replace
+
+    def interrupted(src, dst):
+        # まとめたファイルの置き換え
+        if Path(dst).name.startswith("part-") and Path(src).name.startswith("_"):
+            if after_replace:
+                replace(src, dst)
+            raise KeyboardInterrupt()
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        parquet_sink.compact(str(tmp_path), RACE_RESULT)
+    monkeypatch.setattr(os, "replace", replace)
+    return tmp_path / "race_result/year=2021/track=05"
+
+
+@pytest.mark.parametrize("after_replace", [False, True])
+def test_interrupted_compact(tmp_path, monkeypatch, after_replace):
+    expected = len(races()[1].race_result_as_dataframe()) * 2
+    partition_dir = _interrupted_compact(tmp_path, monkeypatch, after_replace)
+    assert len(list(partition_dir.glob("part-*.parquet"))) == 2 + after_replace
+    # 同じ行を2回読まない
+    assert len(parquet_sink.read(str(tmp_path), RACE_RESULT)) == expected
+
+    parquet_sink.compact(str(tmp_path), RACE_RESULT)
+    assert [v.name.startswith("part-") for v in partition_dir.iterdir()] == [True]
+    assert len(parquet_sink.read(str(tmp_path), RACE_RESULT)) == expected
@@ -0,0 +1,90 @@
+import os.path
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from scraping_netkeiba.client import Cache
+from scraping_netkeiba.horse_ped import HorsePed
+from scraping_netkeiba.parse_job import (
+    BREEDER,
+    HORSE_PED,
+    JOCKEY,
+    RACE_RESULT,
+    TRAINER,
+    parallel_parse,
+)
+from scraping_netkeiba.race import Race
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data"
+
+
+@pytest.fixture
+def cache(tmp_path) -> Cache:
+    shutil.copytree(data_dir / "race", tmp_path / "cache/race")
+    shutil.copytree(data_dir / "horse_ped", tmp_path / "cache/horse/ped")
+    entity_dir = data_dir / "entity_synthetic"
+    shutil.copytree(entity_dir / "jockey", tmp_path / "cache/jockey/result/recent")
+    shutil.copytree(entity_dir / "trainer", tmp_path / "cache/trainer")
+    shutil.copytree(entity_dir / "breeder", tmp_path / "cache/breeder")
+    return Cache(str(tmp_path / "cache"))
+
+
+def test_parallel_parse_race_result(tmp_path, cache):
+    race_ids = sorted(p.stem for p in (data_dir / "race").glob("*.html"))
+    actual = parallel_parse(
+        RACE_RESULT,
+        race_ids,
+        cache,
+        shard_dir=str(tmp_path / "shards"),
+        chunksize=3,
+        max_workers=2,
+    )
+    # パースに失敗するページは除かれる
+    expected = pd.concat(
+        [
+            Race(
+                v, (data_dir / f"race/{v}.html").read_text()
+            ).race_result_as_dataframe()
+            for v in race_ids
+            if v not in ["2021N2a00905", "202165122904"]
+        ],
+        ignore_index=True,
+    )
+    pd.testing.assert_frame_equal(actual, expected)
+    # シャードはプロセスごとに1つ
+    assert 1 <= len(list((tmp_path / "shards").glob("*.pkl"))) <= 2
+
+
+def test_parallel_parse_horse_ped(cache):
+    horse_ids = sorted(p.stem for p in (data_dir / "horse_ped").glob("*.html"))
+    actual = parallel_parse(HORSE_PED, horse_ids, cache, chunksize=5)
+    assert actual["horse_id"].tolist() == horse_ids
+    assert actual.loc[actual["horse_id"] == "2018105460", "sire"].item() == (
+        HorsePed(
+            "2018105460", (data_dir / "horse_ped/2018105460.html").read_text()
+        ).sire()
+    )
+
+
+def test_parallel_parse_entity(cache):
+    actual = parallel_parse(TRAINER, ["01017"], cache, max_workers=1)
+    assert actual.to_dict("records") == [
+        {
+            "trainer_id": "01017",
+            "name": "萩原清",
+            "name_kana": "ハギワラキヨシ",
+            "affiliation": "美浦",
+            "birth_date": None,
+            "debut_year": None,
+        }
+    ]
+    assert parallel_parse(JOCKEY, ["05386"], cache)["name"].tolist() == ["戸崎圭太"]
+    actual = parallel_parse(BREEDER, ["301513"], cache)
+    assert actual[["breeder_id", "name"]].values.tolist() == [["301513", "追分ファーム"]]
+
+
+def test_parallel_parse_empty(cache):
+    assert parallel_parse(RACE_RESULT, [], cache).empty
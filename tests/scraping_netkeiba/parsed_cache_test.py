@@ -0,0 +1,118 @@
+import os.path
+import pickle
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from scraping_netkeiba.client import Cache
+from scraping_netkeiba.horse import Horse
+from scraping_netkeiba.horse_ped import HorsePed
+from scraping_netkeiba.parse_job import RACE_RESULT, parallel_parse
+from scraping_netkeiba.parsed_cache import ParsedCache
+from scraping_netkeiba.race import Race
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data"
+
+
+def test_get_or_parse(tmp_path):
+    calls: list[str] = []
+
+    def parse() -> list[str]:
+        calls.append("parse")
+        return ["parsed"]
+
+    with ParsedCache(str(tmp_path / "parsed.sqlite")) as parsed_cache:
+        for _ in range(2):
+            assert parsed_cache.get_or_parse("kind", "url", "html", 1, parse) == [
+                "parsed"
+            ]
+        assert len(calls) == 1
+        # HTMLかパーサーのバージョンが変わるとパースし直す
+        parsed_cache.get_or_parse("kind", "url", "html2", 1, parse)
+        parsed_cache.get_or_parse("kind", "url", "html", 2, parse)
+        assert len(calls) == 3
+
+
+def test_get_or_parse_error_is_not_cached(tmp_path):
+    def parse():
+        raise Exception("error")
+
+    with ParsedCache(str(tmp_path / "parsed.sqlite")) as parsed_cache:
+        with pytest.raises(Exception):
+            parsed_cache.get_or_parse("kind", "url", "html", 1, parse)
+        assert parsed_cache.get_or_parse("kind", "url", "html", 1, lambda: 1) == 1
+
+
+def test_race(tmp_path):
+    race_id = "202105010101"
+    html = (data_dir / f"race/{race_id}.html").read_text()
+    race = Race(race_id, html)
+    for _ in range(2):
+        # 開き直しても同じ結果が返る
+        with ParsedCache(str(tmp_path / "parsed.sqlite")) as parsed_cache:
+            pd.testing.assert_frame_equal(
+                parsed_cache.race_result_as_dataframe(race_id, html),
+                race.race_result_as_dataframe(),
+            )
+            pd.testing.assert_frame_equal(
+                parsed_cache.race_info_as_dataframe(race_id, html),
+                race.race_info_as_dataframe(),
+            )
+            payoff = parsed_cache.payoff(race_id, html)
+            assert payoff["win"] == race.payoff().win()
+            assert payoff["trifecta"] == race.payoff().trifecta()
+
+
+def test_horse(tmp_path):
+    horse_id = "2018105460"
+    html = (data_dir / f"horse/{horse_id}.html").read_text()
+    with ParsedCache(str(tmp_path / "parsed.sqlite")) as parsed_cache:
+        parsed_cache.horse_as_dataframe(horse_id, html)
+        pd.testing.assert_frame_equal(
+            parsed_cache.horse_as_dataframe(horse_id, html),
+            Horse(horse_id, html).as_dataframe(),
+        )
+
+
+def test_horse_ped(tmp_path):
+    horse_id = "2018105460"
+    html = (data_dir / f"horse_ped/{horse_id}.html").read_text()
+    horse_ped = HorsePed(horse_id, html)
+    with ParsedCache(str(tmp_path / "parsed.sqlite")) as parsed_cache:
+        parsed_cache.horse_ped(horse_id, html)
+        record = parsed_cache.horse_ped(horse_id, html)
+        assert record.ped_horse_ids == horse_ped.ped_horse_ids()
+        pd.testing.assert_frame_equal(record.dataframe, horse_ped.as_dataframe())
+
+
+def test_pickle(tmp_path):
+    parsed_cache = ParsedCache(str(tmp_path / "parsed.sqlite"))
+    parsed_cache.get_or_parse("kind", "url", "html", 1, lambda: 1)
+    restored: ParsedCache = pickle.loads(pickle.dumps(parsed_cache))
+    assert restored.get_or_parse("kind", "url", "html", 1, lambda: 2) == 1
+
+
+def _fail(race_id: str, html: str):
+    raise Exception("parsed again")
+
+
+def test_parallel_parse(tmp_path):
+    shutil.copytree(data_dir / "race", tmp_path / "cache/race")
+    cache = Cache(str(tmp_path / "cache"))
+    race_ids = ["202102011201", "202105010101", "202106050907"]
+    parsed_cache = ParsedCache(str(tmp_path / "parsed.sqlite"))
+    expected = parallel_parse(RACE_RESULT, race_ids, cache, max_workers=2)
+    first = parallel_parse(
+        RACE_RESULT, race_ids, cache, max_workers=2, parsed_cache=parsed_cache
+    )
+    pd.testing.assert_frame_equal(first, expected)
+
+    # 2回目はパースせずにキャッシュから返す
+    job = RACE_RESULT._replace(parse=_fail)
+    second = parallel_parse(
+        job, race_ids, cache, max_workers=2, parsed_cache=parsed_cache
+    )
+    pd.testing.assert_frame_equal(second, expected)
@@ -0,0 +1,94 @@
+import os.path
+import shutil
+from pathlib import Path
+
+import pytest
+
+from scraping_netkeiba import url
+from scraping_netkeiba.client import Client
+from scraping_netkeiba.manifest import Manifest
+from scraping_netkeiba.ped_crawler import PedCrawler
+from tests.scraping_netkeiba.conftest import CountingCache
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data/horse_ped"
+
+
+@pytest.fixture
+def cache(tmp_path) -> CountingCache:
+    shutil.copytree(data_dir, tmp_path / "cache/horse/ped")
+    return CountingCache(str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def horse_ids() -> list[str]:
+    return sorted(p.stem for p in data_dir.glob("*.html"))
+
+
+def test_ped_crawler_crawl(cache, horse_ids):
+    crawler = PedCrawler(Client(cache))
+    graph = crawler.crawl(horse_ids, depth=1)
+    assert len(cache.reads) == len(horse_ids)
+    assert all(graph.is_expanded(v) for v in horse_ids)
+    assert crawler.pending() == []
+
+
+def test_ped_crawler_skips_known_horses(cache, horse_ids):
+    crawler = PedCrawler(Client(cache))
+    crawler.crawl(horse_ids, depth=1)
+    crawler.crawl(horse_ids + horse_ids, depth=1)
+    assert len(cache.reads) == len(horse_ids)
+
+
+def test_ped_crawler_resume(tmp_path, cache, horse_ids):
+    state_dir = str(tmp_path / "state")
+    PedCrawler(Client(cache), state_dir=state_dir, batch_size=4).crawl(
+        horse_ids[:8], depth=1
+    )
+    crawler = PedCrawler(Client(cache), state_dir=state_dir)
+    assert all(crawler.graph().is_expanded(v) for v in horse_ids[:8])
+    crawler.crawl(horse_ids, depth=1)
+    assert len(cache.reads) == len(horse_ids)
+
+
+def test_ped_crawler_manifest(tmp_path, cache, horse_ids):
+    with Manifest(str(tmp_path / "manifest.sqlite")) as manifest:
+        manifest.rebuild(str(tmp_path / "cache"))
+        crawler = PedCrawler(Client(cache), manifest=manifest)
+        graph = crawler.crawl(horse_ids, depth=1)
+        assert manifest.ids("horse_ped", parsed=True) == horse_ids
+        # 祖先の血統ページは参照として記録され、キャッシュに無いものが分かる
+        ancestors = {
+            v for h in horse_ids for v in graph.ancestors(h) if v not in horse_ids
+        }
+        assert set(manifest.missing_references("horse_ped")) == ancestors
+
+
+def test_ped_crawler_resume_after_failure(tmp_path, cache, horse_ids):
+    state_dir = str(tmp_path / "state")
+    path = tmp_path / f"cache/horse/ped/{horse_ids[0]}.html"
+    html = path.read_text()
+    path.write_text("<html></html>")
+    crawler = PedCrawler(Client(cache), state_dir=state_dir)
+    crawler.crawl(horse_ids[:2], depth=1)
+    assert crawler.failed() == horse_ids[:1]
+    assert crawler.pending() == []
+
+    # 失敗した馬は再開したときに取得し直す
+    path.write_text(html)
+    crawler = PedCrawler(Client(cache), state_dir=state_dir)
+    assert crawler.failed() == horse_ids[:1]
+    graph = crawler.crawl(depth=1)
+    assert graph.is_expanded(horse_ids[0])
+    assert crawler.failed() == []
+
+
+def test_ped_crawler_max_retries(tmp_path, cache, horse_ids):
+    state_dir = str(tmp_path / "state")
+    (tmp_path / f"cache/horse/ped/{horse_ids[0]}.html").write_text("<html></html>")
+    for _ in range(3):
+        PedCrawler(Client(cache), state_dir=state_dir, max_retries=2).crawl(
+            horse_ids[:1], depth=1
+        )
+    # 起点に指定し直しても max_retries 回より多くは取得しない
+    assert cache.reads == [url.horse_ped(horse_ids[0])] * 2
@@ -0,0 +1,121 @@
+import os.path
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from scraping_netkeiba.horse_ped import HorsePed, Relation, ped_relationships
+from scraping_netkeiba.ped_graph import PedGraph
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data/horse_ped"
+
+
+@pytest.fixture
+def horse_peds() -> list[HorsePed]:
+    return [HorsePed(p.stem, p.read_text()) for p in sorted(data_dir.glob("*.html"))]
+
+
+@pytest.fixture
+def graph(horse_peds) -> PedGraph:
+    graph = PedGraph()
+    graph.add_all(horse_peds)
+    return graph
+
+
+def test_ped_graph_deduplicates_nodes(horse_peds, graph):
+    horse_ids = {p.horse_id() for p in horse_peds} | {
+        v for p in horse_peds for v in p.ped_horse_ids()
+    }
+    assert len(graph) == len(horse_ids)
+    assert len(graph) < len(horse_peds) * 63
+
+
+def test_ped_graph_ancestor(horse_peds, graph):
+    for horse_ped in horse_peds:
+        for relationships in ped_relationships(5):
+            assert graph.ancestor(
+                horse_ped.horse_id(), relationships
+            ) == horse_ped.ped_horse_id(relationships)
+
+
+def test_ped_graph_ancestor_beyond_page():
+    path = data_dir / "2018105460.html"
+    graph = PedGraph()
+    graph.add(HorsePed(path.stem, path.read_text()))
+    assert graph.ancestor("2018105460", [Relation.Sire] * 5) == "000a0012cb"
+    assert graph.ancestor("2018105460", [Relation.Sire] * 6) is None
+
+
+def test_ped_graph_add_keeps_known_parents(horse_peds):
+    class Ped:
+        def __init__(self, horse_id: str, ped_horse_ids: list[Optional[str]]):
+            self.__horse_id = horse_id
+            self.__ped_horse_ids = ped_horse_ids
+
+        def horse_id(self) -> str:
+            return self.__horse_id
+
+        def ped_horse_ids(self) -> list[Optional[str]]:
+            return self.__ped_horse_ids
+
+    horse_ped = horse_peds[0]
+    ped_horse_ids = horse_ped.ped_horse_ids()
+    graph = PedGraph()
+    graph.add(horse_ped)
+    # 空欄の多い血統表を後から登録しても、分かっている父・母は消えない
+    blank = [None, ped_horse_ids[1], None, None] + ped_horse_ids[4:]
+    graph.add(Ped(horse_ped.horse_id(), blank))
+    for relationships in ped_relationships(5):
+        assert graph.ancestor(
+            horse_ped.horse_id(), relationships
+        ) == horse_ped.ped_horse_id(relationships)
+
+
+def test_ped_graph_ancestor_across_pages(graph):
+    # 別の馬の血統表で分かっている祖先も辿れる
+    assert graph.ancestor("2018100299", [Relation.Sire] * 6) == "000a000e46"
+
+
+def test_ped_graph_descendants(graph):
+    # 2018100299 と 2018104480 は同じ父を持つ
+    assert {"2018100299", "2018104480"} <= graph.descendants("000a011c77")
+    assert graph.descendants("000a011c77", generations=1) == {
+        "2018100299",
+        "2018104480",
+    }
+    assert graph.descendants("2018105460") == set()
+
+
+def test_ped_graph_inbreeding_coefficient():
+    graph = PedGraph()
+    # A と B は父 C を共有する半兄妹
+    graph.add_parents("X", "A", "B")
+    graph.add_parents("A", "C", "D")
+    graph.add_parents("B", "C", "E")
+    assert graph.inbreeding_coefficient("X") == pytest.approx(1 / 8)
+    assert graph.kinship("A", "B") == pytest.approx(1 / 8)
+    assert graph.inbreeding_coefficient("A") == 0.0
+
+
+def test_ped_graph_inbreeding_coefficient_fixture(graph):
+    assert 0.0 < graph.inbreeding_coefficient("2018105460") < 0.25
+
+
+def test_ped_graph_is_materialized(horse_peds, graph):
+    for horse_ped in horse_peds:
+        assert graph.is_materialized(horse_ped.horse_id())
+    assert not graph.is_materialized("2011100655")
+    assert graph.missing(["2018105460", "2011100655", "2011100655", "unknown"]) == [
+        "2011100655",
+        "unknown",
+    ]
+
+
+def test_ped_graph_save_load(tmp_path, graph):
+    graph.save(tmp_path / "ped_graph.pkl")
+    loaded = PedGraph.load(tmp_path / "ped_graph.pkl")
+    assert len(loaded) == len(graph)
+    assert loaded.sire("2018105460") == "2011100655"
+    assert loaded.is_expanded("2018105460")
+    assert loaded.descendants("000a011c77") == graph.descendants("000a011c77")
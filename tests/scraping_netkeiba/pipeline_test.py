@@ -0,0 +1,63 @@
+import os.path
+import shutil
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+import pytest
+
+from scraping_netkeiba.client import Cache, Client, RateLimiter
+from scraping_netkeiba.manifest import Manifest
+from scraping_netkeiba.parse_job import RACE_RESULT
+from scraping_netkeiba.pipeline import Pipeline
+from scraping_netkeiba.race import Race
+from tests.scraping_netkeiba.conftest import FakeResponse
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data"
+
+
+@pytest.fixture
+def respond() -> Callable[[str], FakeResponse]:
+    return lambda url: FakeResponse("Not Found", 404)
+
+
+def test_pipeline_run(tmp_path, requested):
+    shutil.copytree(data_dir / "race", tmp_path / "race")
+    race_ids = sorted(p.stem for p in (data_dir / "race").glob("*.html"))
+    frames: list[pd.DataFrame] = []
+    manifest = Manifest(str(tmp_path / "manifest.sqlite"))
+    manifest.rebuild(str(tmp_path))
+    pipeline = Pipeline(
+        Client(Cache(str(tmp_path)), RateLimiter(0)),
+        RACE_RESULT,
+        frames.append,
+        max_parse_workers=2,
+        queue_size=2,
+        manifest=manifest,
+    )
+    # キャッシュに無い 202199999999 は取得に失敗する
+    result = pipeline.run(race_ids + ["202199999999"])
+    assert result.fetched == len(race_ids)
+    # パースに失敗するページが2つある
+    assert result.parsed == len(race_ids) - 2
+    assert result.failed == 2
+    assert result.fetch_failed == 1
+    assert requested == ["https://db.netkeiba.com/race/202199999999/"]
+    actual = pd.concat(frames).sort_values(["race_id", "horse_number"])
+    expected = pd.concat(
+        [
+            Race(
+                v, (data_dir / f"race/{v}.html").read_text()
+            ).race_result_as_dataframe()
+            for v in race_ids
+            if v not in ["2021N2a00905", "202165122904"]
+        ]
+    ).sort_values(["race_id", "horse_number"])
+    pd.testing.assert_frame_equal(
+        actual.reset_index(drop=True), expected.reset_index(drop=True)
+    )
+    # パースできたページだけパース済みになる
+    assert manifest.ids("race", parsed=True) == sorted(set(actual["race_id"]))
+    assert manifest.missing_references("horse") == sorted(set(actual["horse_id"]))
+    manifest.close()
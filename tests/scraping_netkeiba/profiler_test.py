@@ -0,0 +1,87 @@
+import os.path
+import re
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from bs4 import Tag
+
+from scraping_netkeiba.horse import Horse
+from scraping_netkeiba.profiler import Profiler
+from scraping_netkeiba.race import Race
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data"
+
+RACE_IDS = ["202102011201", "202105010101", "202106050907"]
+
+
+def _race_results() -> list[pd.DataFrame]:
+    return [
+        Race(v, (data_dir / f"race/{v}.html").read_text()).race_result_as_dataframe()
+        for v in RACE_IDS
+    ]
+
+
+def test_profiler_restores_methods():
+    horse_id = Race.horse_id
+    select = Tag.select
+    text = Tag.text
+    with Profiler():
+        assert Race.horse_id is not horse_id
+        assert Tag.select is not select
+    assert Race.horse_id is horse_id
+    assert Tag.select is select
+    assert Tag.text is text
+
+
+def test_profiler_does_not_change_results():
+    expected = _race_results()
+    with Profiler():
+        actual = _race_results()
+    for a, e in zip(actual, expected):
+        pd.testing.assert_frame_equal(a, e)
+
+
+def test_profiler_report():
+    with Profiler() as profiler:
+        _race_results()
+    actual = profiler.report().set_index("name")
+    assert actual.loc["Race.__init__", "calls"] == len(RACE_IDS)
+    assert actual.loc["Race.race_result_as_dataframe", "calls"] == len(RACE_IDS)
+    assert actual.loc["BeautifulSoup.__init__", "calls"] == len(RACE_IDS)
+    assert (actual["self_ms"] <= actual["total_ms"] + 1e-6).all()
+    # 自身の時間の長い順
+    assert list(actual["self_ms"]) == sorted(actual["self_ms"], reverse=True)
+
+
+def test_profiler_collapsed(tmp_path):
+    with Profiler() as profiler:
+        _race_results()
+    path = tmp_path / "race.folded"
+    profiler.write_collapsed(str(path))
+    lines = path.read_text().splitlines()
+    assert all(re.fullmatch(r"[^ ]+ [0-9]+", v) for v in lines)
+    stacks = [v.split(" ")[0] for v in lines]
+    assert "Race.__init__;BeautifulSoup.__init__" in stacks
+    assert any(
+        v.startswith("Race.race_result_as_dataframe;Race.horse_id") for v in stacks
+    )
+
+
+def test_profiler_classes():
+    html = (data_dir / "horse/2018105460.html").read_text()
+    with Profiler(classes=[Horse], dom_queries=False) as profiler:
+        Horse("2018105460", html).as_dataframe()
+    actual = set(profiler.report()["name"])
+    assert "Horse.as_dataframe" in actual
+    assert all(v.startswith("Horse.") for v in actual)
+
+
+def test_profiler_is_exclusive():
+    with Profiler():
+        with pytest.raises(Exception):
+            Profiler().start()
+    with Profiler() as profiler:
+        _race_results()
+    assert not profiler.report().empty
@@ -0,0 +1,79 @@
+import datetime
+import os.path
+import shutil
+from pathlib import Path
+
+import pytest
+
+from scraping_netkeiba.client import Client
+from scraping_netkeiba.race_id_enumerator import RaceIdEnumerator
+from tests.scraping_netkeiba.conftest import CountingCache
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data"
+
+
+@pytest.fixture
+def cache(tmp_path) -> CountingCache:
+    cache_dir = tmp_path / "cache"
+    shutil.copytree(data_dir / "race_list", cache_dir / "race/list")
+    # 2010/01/01 はレースが無いため、次の開催日の一覧が返っている
+    shutil.copy(
+        data_dir / "race_list/20100101.html", cache_dir / "race/list/20100105.html"
+    )
+    # 2010/01/05 の競馬場別一覧の代わりに別の日の一覧を置く
+    for track_id, name in [("06", "20100814"), ("08", "20221221"), ("65", "20100814")]:
+        (cache_dir / f"race/sum/{track_id}").mkdir(parents=True)
+        shutil.copy(
+            data_dir / f"race_sum/{name}.html",
+            cache_dir / f"race/sum/{track_id}/20100105.html",
+        )
+    return CountingCache(str(cache_dir))
+
+
+def expected_race_ids() -> list[str]:
+    return [f"2010010101{i:02}" for i in range(1, 13)] + [
+        f"2022431221{i:02}" for i in range(1, 13)
+    ]
+
+
+def test_race_id_enumerator_enumerate(cache):
+    enumerator = RaceIdEnumerator(Client(cache))
+    race_ids = list(
+        enumerator.enumerate(datetime.date(2010, 1, 5), datetime.date(2010, 1, 6))
+    )
+    assert sorted(race_ids) == expected_race_ids()
+    assert len(cache.reads) == 4
+
+
+def test_race_id_enumerator_checkpoint(tmp_path, cache):
+    checkpoint_path = str(tmp_path / "checkpoint.jsonl")
+    enumerator = RaceIdEnumerator(Client(cache), checkpoint_path=checkpoint_path)
+    list(enumerator.enumerate(datetime.date(2010, 1, 5), datetime.date(2010, 1, 6)))
+    reads = len(cache.reads)
+
+    enumerator = RaceIdEnumerator(Client(cache), checkpoint_path=checkpoint_path)
+    race_ids = list(
+        enumerator.enumerate(datetime.date(2010, 1, 5), datetime.date(2010, 1, 6))
+    )
+    assert sorted(race_ids) == expected_race_ids()
+    assert len(cache.reads) == reads
+
+
+def test_race_id_enumerator_no_race_day(tmp_path, cache):
+    checkpoint_path = tmp_path / "checkpoint.jsonl"
+    enumerator = RaceIdEnumerator(Client(cache), checkpoint_path=str(checkpoint_path))
+    race_ids = list(
+        enumerator.enumerate(datetime.date(2010, 1, 1), datetime.date(2010, 1, 2))
+    )
+    assert race_ids == []
+    assert cache.reads == ["https://db.netkeiba.com/race/list/20100101/"]
+    assert checkpoint_path.read_text() == '{"date": "2010-01-01", "race_ids": []}\n'
+
+    # 次回は取得しない
+    enumerator = RaceIdEnumerator(Client(cache), checkpoint_path=str(checkpoint_path))
+    race_ids = list(
+        enumerator.enumerate(datetime.date(2010, 1, 1), datetime.date(2010, 1, 2))
+    )
+    assert race_ids == []
+    assert len(cache.reads) == 1
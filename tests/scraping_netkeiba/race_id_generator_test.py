@@ -0,0 +1,124 @@
+import os.path
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from scraping_netkeiba import url
+from scraping_netkeiba.client import Cache, Client, RateLimiter
+from scraping_netkeiba.race_id_generator import (
+    RaceIdGenerator,
+    cache_probe,
+    remote_probe,
+)
+from tests.scraping_netkeiba.conftest import FakeResponse
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data/race_list"
+
+
+@pytest.fixture
+def race_ids() -> list[str]:
+    return (data_dir / "race_ids_2021_1_2021_1.txt").read_text().split()
+
+
+def test_race_id_generator_generate_jra(race_ids):
+    generator = RaceIdGenerator()
+    generator.learn(race_ids)
+    jra_race_ids = [v for v in race_ids if v[4:6] in ["05", "06", "07", "10"]]
+    probes: list[str] = []
+
+    def probe(race_id: str) -> bool:
+        probes.append(race_id)
+        return race_id in race_ids
+
+    actual = list(generator.generate(2021, ["05", "06", "07", "10"], probe))
+    assert actual == jra_race_ids
+    assert len(probes) < len(jra_race_ids) * 1.5
+
+
+def test_race_id_generator_generate_nar(race_ids):
+    generator = RaceIdGenerator()
+    generator.learn(race_ids)
+    nar_race_ids = [v for v in race_ids if v[4:6] in ["36", "44", "65"]]
+    actual = list(
+        generator.generate(2021, ["36", "44", "65"], set(race_ids).__contains__)
+    )
+    assert actual == nar_race_ids
+
+
+def test_race_id_generator_skips_missing_meeting(race_ids):
+    # 1回が無くても、2回以降は確かめる
+    generator = RaceIdGenerator()
+    expected = [f"2021060201{v:02}" for v in range(1, 13)]
+    probes: list[str] = []
+
+    def probe(race_id: str) -> bool:
+        probes.append(race_id)
+        return race_id in expected
+
+    assert list(generator.generate(2021, ["06"], probe)) == expected
+    # 余分に確かめるのは回ごとに、レースの無い最初の日の1レース目だけ
+    assert len(probes) == len(expected) + 6
+
+
+def test_race_id_generator_limits(race_ids):
+    generator = RaceIdGenerator()
+    assert generator.limits("06") == (6, 12, 12)
+    generator.learn(race_ids)
+    # 学習した値が既定値より小さくても上限は下げない
+    assert generator.limits("06") == (6, 12, 12)
+    generator.learn(["202106071401", "202136010115"])
+    assert generator.limits("06") == (7, 14, 12)
+    assert generator.limits("36") == (6, 12, 15)
+
+
+def test_race_id_generator_generate_held_out(race_ids):
+    # 学習に使っていない日やレース番号のレースも見つける
+    track_ids = ["05", "06", "07", "10", "36", "44", "65"]
+    expected = [v for v in race_ids if v[4:6] in track_ids]
+    generator = RaceIdGenerator()
+    generator.learn(v for v in expected if int(v[8:10]) <= 2 and int(v[10:]) <= 6)
+    actual = list(generator.generate(2021, track_ids, set(race_ids).__contains__))
+    assert actual == expected
+
+
+def test_race_id_generator_candidates(race_ids):
+    generator = RaceIdGenerator()
+    generator.learn(race_ids)
+    candidates = list(generator.candidates(2021, ["06"]))
+    assert len(candidates) == 6 * 12 * 12
+    assert candidates[0] == "202106010101"
+    assert set(v for v in race_ids if v[4:6] == "06") <= set(candidates)
+
+
+def test_cache_probe(tmp_path):
+    (tmp_path / "race").mkdir()
+    (tmp_path / "race/202106010101.html").write_text("")
+    probe = cache_probe(Cache(str(tmp_path)))
+    assert probe("202106010101")
+    assert not probe("202106010102")
+
+
+@pytest.fixture
+def respond_head() -> Callable[[str], FakeResponse]:
+    existing = {url.race("202106010101"), url.race("202106010102")}
+    return lambda page_url: FakeResponse("", 200 if page_url in existing else 404)
+
+
+def test_remote_probe(tmp_path, heads):
+    cache = Cache(str(tmp_path))
+    cache.write(url.race("202106010103"), "")
+    probe = remote_probe(Client(cache, RateLimiter(0)))
+    generator = RaceIdGenerator(max_meeting=1, max_day=1, max_race=4)
+    assert list(generator.generate(2021, ["06"], probe)) == [
+        "202106010101",
+        "202106010102",
+        "202106010103",
+    ]
+    # キャッシュにあるページは確かめない
+    assert heads == [
+        url.race("202106010101"),
+        url.race("202106010102"),
+        url.race("202106010104"),
+    ]
@@ -5,7 +5,7 @@ from pathlib import Path
 import pytest
 
 from scraping_netkeiba.client import RaceSumParam
-from scraping_netkeiba.race_list import RaceList
+from scraping_netkeiba.race_list import RaceList, title_date
 
 script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
 data_dir = script_dir / "data/race_list"
@@ -41,3 +41,28 @@ def test_race_sum_params():
     ]
     # Assert
     assert actual == expected
+
+
+def test_title_date():
+    # Prepare
+    html = (data_dir / "20100101.html").read_text()
+    # Run
+    actual = title_date(html)
+    # Assert
+    assert actual == datetime.date(2010, 1, 5)
+    assert title_date("<title>netkeiba</title>") is None
+
+
+def test_race_sum_params_ignores_links_outside_race_kaisai():
+    # Prepare
+    html = (data_dir / "20100101.html").read_text()
+    # カレンダーの前とフッターに一覧へのリンクがあるページ
+    html = html.replace(
+        "<div class=race_calendar>",
+        "<a href=/race/sum/01/20100105/ >stray</a><div class=race_calendar>",
+    ).replace("<footer>", "<footer><a href=/race/sum/09/20100105/ >stray</a>")
+    race_list = RaceList(datetime.date(2010, 1, 5), html)
+    # Run
+    actual = race_list.race_sum_params()
+    # Assert
+    assert [p.track_id for p in actual] == ["06", "08", "65"]
@@ -63,3 +63,24 @@ def test_race_sum_race_params(case: RaceSumRaceParamsCase):
     race_params = race_sum.race_params()
     # Assert
     assert race_params == case.race_params
+
+
+def test_race_sum_race_params_without_race_table():
+    html = (script_dir / "data/race_list/20100101.html").read_text()
+    with pytest.raises(Exception) as _:
+        RaceSum(html).race_params()
+
+
+def test_race_sum_race_params_ignores_race_table_01_text():
+    # Prepare
+    html = (data_dir / "20100814.html").read_text()
+    # 表より前に race_table_01 という文字列とレースへのリンクがあるページ
+    html = html.replace(
+        "<body",
+        '<!-- race_table_01 --><a href="/race/201001010199/">stray</a><body',
+        1,
+    )
+    # Run
+    race_params = RaceSum(html).race_params()
+    # Assert
+    assert race_params == race_sum_race_params_cases()[0].race_params
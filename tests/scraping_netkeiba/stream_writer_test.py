@@ -0,0 +1,110 @@
+import os.path
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pytest
+
+from scraping_netkeiba import stream_writer
+from scraping_netkeiba.parquet_sink import RACE_INFO
+from scraping_netkeiba.race import Race
+from scraping_netkeiba.stream_writer import StreamWriter
+
+script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
+data_dir = script_dir / "data"
+
+race_ids = ["202102011201", "202105010101", "202106050907", "202136123104"]
+
+
+def races() -> list[Race]:
+    return [Race(v, (data_dir / f"race/{v}.html").read_text()) for v in race_ids]
+
+
+def race_results() -> pd.DataFrame:
+    return pd.concat([v.race_result_as_dataframe() for v in races()], ignore_index=True)
+
+
+def assert_frame_equal(actual: pd.DataFrame, expected: pd.DataFrame):
+    # 数値の無いレースがあると None の object 列になっている
+    expected = expected.astype({c: actual[c].dtype for c in expected.columns})
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_arrow(tmp_path):
+    path = tmp_path / "race_result.arrow"
+    with StreamWriter(str(path), batch_size=10) as writer:
+        for race in races():
+            writer(race.race_result_as_dataframe())
+        # 閉じるまでは作られない
+        assert not path.exists()
+    expected = race_results()
+    assert writer.rows() == len(expected)
+    assert not path.with_name(f"{path.name}.tmp").exists()
+
+    # 最後以外は batch_size 行のレコードバッチになる
+    reader = ipc.open_file(pa.memory_map(str(path)))
+    sizes = [reader.get_batch(i).num_rows for i in range(reader.num_record_batches)]
+    assert sizes == [10] * (len(expected) // 10) + [len(expected) % 10]
+
+    assert_frame_equal(stream_writer.read(str(path)).to_pandas(), expected)
+
+
+def test_arrow_memory_is_bounded(tmp_path):
+    path = tmp_path / "race_result.arrow"
+    df = races()[1].race_result_as_dataframe()
+    peak = 0
+    with StreamWriter(str(path), batch_size=50) as writer:
+        for _ in range(500):
+            writer(df)
+            peak = max(peak, pa.total_allocated_bytes())
+    assert writer.rows() == len(df) * 500
+
+    before = pa.total_allocated_bytes()
+    table = stream_writer.read(str(path))
+    assert table.num_rows == len(df) * 500
+    # 溜めるのは1バッチ分だけで、読み込みはメモリマップなのでコピーしない
+    assert peak < table.nbytes / 10
+    assert pa.total_allocated_bytes() - before < table.nbytes / 10
+
+
+def test_csv(tmp_path):
+    path = tmp_path / "race_result.csv"
+    rows = stream_writer.write_race_results(
+        iter(races()), str(path), batch_size=7, format="csv"
+    )
+    expected = race_results()
+    assert rows == len(expected)
+    actual = stream_writer.read(str(path)).to_pandas()
+    # IDの先頭の0が残る
+    assert_frame_equal(actual, expected)
+
+
+def test_race_info(tmp_path):
+    path = tmp_path / "race_info.csv"
+    expected = pd.concat([v.race_info_as_dataframe() for v in races()])
+    with StreamWriter(str(path), RACE_INFO, format="csv") as writer:
+        writer(expected)
+    actual = stream_writer.read(str(path), RACE_INFO).to_pandas()
+    assert list(actual["race_id"]) == race_ids
+    assert list(actual["race_date"]) == list(expected["race_date"])
+
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(Exception):
+        StreamWriter(str(tmp_path / "race_result.json"), format="json")
+
+
+def test_exception_discards_file(tmp_path):
+    path = tmp_path / "race_result.arrow"
+    with StreamWriter(str(path)) as writer:
+        writer(races()[0].race_result_as_dataframe())
+    expected = stream_writer.read(str(path))
+
+    with pytest.raises(KeyboardInterrupt):
+        with StreamWriter(str(path), batch_size=1) as writer:
+            writer(races()[1].race_result_as_dataframe())
+            raise KeyboardInterrupt()
+    # 書きかけのファイルは消え、前回のファイルが残る
+    assert not path.with_name(f"{path.name}.tmp").exists()
+    assert stream_writer.read(str(path)).equals(expected)
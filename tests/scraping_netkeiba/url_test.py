@@ -3,14 +3,22 @@ import datetime
 import pytest
 
 from scraping_netkeiba.url import (
+    BASE_URL,
     Race,
+    Route,
     breeder,
     horse,
     horse_ped,
+    horse_ped_urls,
     horse_result,
+    horse_result_urls,
+    horse_urls,
     owner,
     race_list,
     race_sum,
+    race_urls,
+    recent_jockey_result,
+    route,
     trainer,
 )
 
@@ -21,6 +29,13 @@ def test_race():
     )
 
 
+def test_race_parse():
+    assert Race.parse("/race/202136123101/").race_id() == "202136123101"
+    assert Race.parse(f"{BASE_URL}/race/202136123101/").race_id() == "202136123101"
+    with pytest.raises(ValueError):
+        Race.parse("/horse/2018105460/")
+
+
 def test_race_invalid():
     with pytest.raises(ValueError) as e:
         Race("0" * 11)
@@ -146,3 +161,72 @@ def test_trainer_invalid_trainer_id_chars():
         trainer("1/345")
         trainer("1-345")
         trainer("1_345")
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        (Race("202136123101").generate(), Route("race", ("202136123101",))),
+        (race_list(datetime.date(2022, 1, 10)), Route("race_list", ("20220110",))),
+        (
+            race_sum("06", datetime.date(2022, 9, 17)),
+            Route("race_sum", ("06", "20220917")),
+        ),
+        (horse("2018105460"), Route("horse", ("2018105460",))),
+        (horse_result("2018105460"), Route("horse_result", ("2018105460",))),
+        (horse_ped("2018105460"), Route("horse_ped", ("2018105460",))),
+        (breeder("123456"), Route("breeder", ("123456",))),
+        (owner("a23456"), Route("owner", ("a23456",))),
+        (trainer("12345"), Route("trainer", ("12345",))),
+        (recent_jockey_result("01167"), Route("recent_jockey_result", ("01167",))),
+        ("/horse/2018105460/", Route("horse", ("2018105460",))),
+        ("/race/list/20220110/?pid=race_list", Route("race_list", ("20220110",))),
+    ],
+)
+def test_route(url: str, expected: Route):
+    assert route(url) == expected
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/horse/201810546/",
+        "/horse/2018105460/extra/",
+        "/race/sum/6/20220917/",
+        "https://example.com/horse/2018105460/",
+        "/jockey/01167/",
+        "",
+    ],
+)
+def test_route_unsupported(url: str):
+    assert route(url) is None
+
+
+def test_race_urls():
+    race_ids = ["202136123101", "2021N2a00905"]
+    assert race_urls(race_ids) == [Race(v).generate() for v in race_ids]
+    assert race_urls([]) == []
+
+
+def test_race_urls_invalid():
+    with pytest.raises(ValueError, match="2021/1010101"):
+        race_urls(["202136123101", "2021/1010101"])
+    with pytest.raises(ValueError):
+        race_urls(["0" * 13])
+    # 改行で繋がった2つのIDは1つのIDとして不正
+    with pytest.raises(ValueError):
+        race_urls(["202105010101\n202105010102"])
+    with pytest.raises(ValueError):
+        horse_ped_urls(["2018105460", "2018105460\n2018100299"])
+
+
+def test_horse_urls():
+    horse_ids = ["2018105460", "000a000e46"]
+    assert horse_urls(horse_ids) == [horse(v) for v in horse_ids]
+    assert horse_result_urls(horse_ids) == [horse_result(v) for v in horse_ids]
+    assert horse_ped_urls(horse_ids) == [horse_ped(v) for v in horse_ids]
+
+
+def test_horse_urls_invalid():
+    with pytest.raises(ValueError, match="2018\\n10546"):
+        horse_urls(["2018105460", "2018\n10546"])
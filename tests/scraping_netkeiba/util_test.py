@@ -1,6 +1,6 @@
 import datetime
 
-from scraping_netkeiba.util import date_range, parallel_map
+from scraping_netkeiba.util import date_range, parallel_imap, parallel_map
 
 
 def test_date_range():
@@ -25,3 +25,40 @@ def test_parallel_map():
         15,
         19,
     ]
+
+
+def square(x: int) -> int:
+    return x * x
+
+
+def test_parallel_imap_ordered():
+    actual = list(
+        parallel_imap(square, (i for i in range(100)), chunksize=7, max_workers=2)
+    )
+    assert actual == [i * i for i in range(100)]
+
+
+def test_parallel_imap_unordered():
+    actual = parallel_imap(
+        square, range(100), chunksize=3, max_in_flight=2, ordered=False
+    )
+    assert sorted(actual) == [i * i for i in range(100)]
+
+
+_offset = 0
+
+
+def _init_offset(offset: int):
+    global _offset
+    _offset = offset
+
+
+def add_offset(x: int) -> int:
+    return x + _offset
+
+
+def test_parallel_map_initializer():
+    actual = parallel_map(
+        add_offset, range(10), chunksize=4, initializer=_init_offset, initargs=(100,)
+    )
+    assert actual == list(range(100, 110))